@@ -0,0 +1,126 @@
+"""
+Стоимость маршрутизации callback_query: перебор фильтров aiogram против
+индекса CallbackRouter (bot/middlewares/callback_router.py).
+
+Запуск из корня репозитория:
+    python -m benchmarks.callback_dispatch --iterations 5000
+
+Подключаются настоящие роутеры бота, но тела хэндлеров заменяются пустыми
+функциями, а нажатие передается сразу в dp.propagate_event - замеряется
+только выбор хэндлера: фильтры роутеров (IsAdmin), состояний и данных
+кнопки. Хранилище - в памяти, запросы к Bot API не выполняются.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("MAIN_ADMIN_ID", "1")
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, User as TelegramUser
+
+from bot.handlers import admin_handlers, fsm_handlers, user_handlers
+from bot.keyboards.callbacks import AdminOrder, MyOrdersPage, OrderAction, OrderFilter, ReferralsPage
+from bot.middlewares.callback_router import CallbackRouter
+from bot.models.data_store import register_user
+
+CLIENT_ID = 2
+ADMIN_ID = 1
+
+# (кто нажимает, callback_data)
+CALLBACKS = [
+    (CLIENT_ID, "back_to_main_menu"),
+    (CLIENT_ID, "menu_my_cases"),
+    (CLIENT_ID, MyOrdersPage(page=2, backward=False, cursor="A4T7B1").pack()),
+    (CLIENT_ID, ReferralsPage(page=2, backward=False, cursor=1024).pack()),
+    (ADMIN_ID, "menu_admin"),
+    (ADMIN_ID, OrderFilter(status="in_progress").pack()),
+    (ADMIN_ID, AdminOrder(action=OrderAction.view, order_id="A4T7B1").pack()),
+]
+
+
+async def noop_handler(*args, **kwargs):
+    return True
+
+
+def build_dispatcher(indexed: bool) -> Dispatcher:
+    dp = Dispatcher(storage=MemoryStorage())
+    for module in (fsm_handlers, admin_handlers, user_handlers):
+        # Роутер - модульный объект, поэтому отвязываем его от предыдущего диспетчера
+        module.router._parent_router = None
+        dp.include_router(module.router)
+    if indexed:
+        dp.callback_query.outer_middleware(CallbackRouter(dp))
+    return dp
+
+
+def make_callback(user_id: int, data: str) -> CallbackQuery:
+    chat = Chat(id=user_id, type="private")
+    message = Message(message_id=1, date=datetime.now(), chat=chat, text="menu")
+    return CallbackQuery(
+        id="1", from_user=TelegramUser(id=user_id, is_bot=False, first_name="user"),
+        chat_instance="1", message=message, data=data
+    )
+
+
+async def measure(dp: Dispatcher, bot: Bot, user_id: int, data: str, iterations: int, repeats: int) -> float:
+    """Лучшее из repeats среднее время выбора хэндлера, мкс."""
+    callback = make_callback(user_id, data)
+    # Данные, которые middleware диспетчера (FSM, контекст пользователя) передают роутерам
+    kwargs = {
+        "bot": bot, "event_from_user": callback.from_user, "event_chat": callback.message.chat,
+        "state": None, "raw_state": None, **dp.workflow_data
+    }
+    handled = await dp.propagate_event(update_type="callback_query", event=callback, **kwargs)
+    assert handled is True, f"callback {data!r} was not handled"
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await dp.propagate_event(update_type="callback_query", event=callback, **kwargs)
+        best = min(best, (time.perf_counter() - started) / iterations)
+    return best * 1e6
+
+
+async def run(iterations: int, repeats: int) -> None:
+    await register_user(ADMIN_ID, "admin")
+    await register_user(CLIENT_ID, "client")
+
+    # Замеряем только маршрутизацию: тела хэндлеров не выполняются
+    for module in (fsm_handlers, admin_handlers, user_handlers):
+        for handler in module.router.callback_query.handlers:
+            handler.callback = noop_handler
+            handler.__post_init__()
+
+    bot = Bot("123456:benchmark")
+    results = {}
+    for indexed in (False, True):
+        dp = build_dispatcher(indexed)
+        results[indexed] = [
+            await measure(dp, bot, user_id, data, iterations, repeats) for user_id, data in CALLBACKS
+        ]
+    await bot.session.close()
+
+    print(f"{'callback_data':<28} {'user':>6} {'aiogram, us':>12} {'index, us':>10}")
+    for (user_id, data), linear, indexed in zip(CALLBACKS, results[False], results[True]):
+        user = "admin" if user_id == ADMIN_ID else "client"
+        print(f"{data:<28} {user:>6} {linear:12.1f} {indexed:10.1f}")
+    linear_avg = sum(results[False]) / len(CALLBACKS)
+    indexed_avg = sum(results[True]) / len(CALLBACKS)
+    print(f"average: {linear_avg:.1f} us -> {indexed_avg:.1f} us ({indexed_avg / linear_avg:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Сравнение памяти: записи-словари против slotted-записей (bot/models/records.py).
+
+Запуск из корня репозитория:
+    python -m benchmarks.memory_records --users 1000000 --orders 1000000
+
+Для каждого варианта строятся словари users/orders того же вида, что в
+MemoryRepository, и замеряется объем выделенной памяти (tracemalloc).
+Анкета заказа (details) общая для всех заказов, чтобы сравнивались
+именно накладные расходы на запись, а не ответы клиентов.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from bot.models.records import User, Order
+
+DETAILS = {
+    "service_category": "👥 Проверка контрагента",
+    "questions_key": "service_due_diligence",
+    "company_name": "Логистическая компания",
+}
+
+
+def build_dicts(users_count: int, orders_count: int) -> tuple[dict, dict]:
+    users = {}
+    for user_id in range(users_count):
+        users[user_id] = {
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "role": "client",
+            "referrer_id": None,
+        }
+    orders = {}
+    for index in range(orders_count):
+        order_id = f"{index:06X}"
+        orders[order_id] = {
+            "order_id": order_id,
+            "user_id": index % max(users_count, 1),
+            "status": "new",
+            "name": None,
+            "details": DETAILS,
+        }
+    return users, orders
+
+
+def build_records(users_count: int, orders_count: int) -> tuple[dict, dict]:
+    users = {}
+    for user_id in range(users_count):
+        users[user_id] = User(user_id=user_id, username=f"user{user_id}", role="client", referrer_id=None)
+    orders = {}
+    for index in range(orders_count):
+        order_id = f"{index:06X}"
+        orders[order_id] = Order(
+            order_id=order_id, user_id=index % max(users_count, 1), status="new", name=None, details=DETAILS
+        )
+    return users, orders
+
+
+def measure(name: str, builder, users_count: int, orders_count: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    data = builder(users_count, orders_count)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    print(f"{name:>8}: {current / 2 ** 20:8.1f} MiB  (build {elapsed:.1f}s)")
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"users={args.users}, orders={args.orders}")
+    dicts = measure("dicts", build_dicts, args.users, args.orders)
+    records = measure("records", build_records, args.users, args.orders)
+    print(f"records use {records / dicts:.0%} of dict memory ({(dicts - records) / 2 ** 20:.1f} MiB saved)")
+
+
+if __name__ == "__main__":
+    main()
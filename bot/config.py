@@ -10,6 +10,74 @@ class Config:
     BOT_TOKEN: str
     MAIN_ADMIN_ID: int
     GROUP_CHAT_ID: int | None # ID чата для уведомлений, может быть не указан
+    STORAGE_BACKEND: str = "memory" # Хранилище данных: memory, journal или sqlite
+    SQLITE_PATH: str = "data/bot.sqlite3" # Путь к файлу БД (для STORAGE_BACKEND=sqlite)
+    SQLITE_POOL_SIZE: int = 4 # Количество соединений для чтения
+    STATE_STORAGE: str = "memory" # Состояния FSM и антифлуд: memory (один процесс) или sqlite (общие для процессов)
+    STATE_SQLITE_PATH: str = "data/state.sqlite3" # Файл состояний (для STATE_STORAGE=sqlite)
+    JOURNAL_DIR: str = "data/journal" # Каталог журнала и снимков (для STORAGE_BACKEND=journal)
+    JOURNAL_FLUSH_INTERVAL: float = 0.02 # Окно группировки записей журнала перед fsync (сек.)
+    SNAPSHOT_INTERVAL: float = 300 # Период сохранения снимков (сек.)
+    UPDATE_CONCURRENCY: int = 32 # Число параллельных обработчиков апдейтов (0 - обработка как в aiogram по умолчанию)
+    UPDATE_QUEUE_LIMIT: int = 10000 # Максимум апдейтов в очередях чатов, дальше прием апдейтов ждет
+    ADMISSION_DELAY_THRESHOLD: float = 2 # Задержка в очереди, после которой отбрасываются нажатия кнопок (сек., 0 - не отбрасывать)
+    METRICS_LOG_INTERVAL: float = 60 # Период записи метрик в лог (сек., 0 - не писать)
+    RUN_MODE: str = "polling" # Способ получения апдейтов: polling или webhook
+    WEBHOOK_URL: str | None = None # Внешний адрес бота, например https://bot.example.com
+    WEBHOOK_PATH: str = "/webhook" # Путь, на который Telegram присылает апдейты
+    WEBHOOK_SECRET: str | None = None # Секрет для заголовка X-Telegram-Bot-Api-Secret-Token
+    WEBAPP_HOST: str = "0.0.0.0" # Адрес, на котором слушает встроенный aiohttp-сервер
+    WEBAPP_PORT: int = 8080
+    WEBAPP_REUSE_PORT: bool = False # SO_REUSEPORT: несколько процессов на одном порту (см. _check_multi_process)
+    OUTBOX_GLOBAL_RATE: float = 30 # Лимит исходящих уведомлений в секунду (на процесс)
+    OUTBOX_MAX_RETRIES: int = 5 # Повторы отправки при сетевых ошибках
+    ORDER_NOTIFY_DELAY: float = 10 # Задержка уведомления клиента об изменении заказа для объединения изменений (сек.)
+    GROUP_DIGEST_WINDOW: float = 0 # Окно объединения заявок в один дайджест для группы (сек., 0 - без дайджеста)
+    BROADCAST_CHECKPOINT: str = "data/broadcast.json" # Файл прогресса рассылки (для продолжения после перезапуска)
+    THROTTLE_RATE: float = 1.5 # Защита от флуда: сколько апдейтов в секунду пропускается от пользователя
+    THROTTLE_BURST: float = 5 # Сколько апдейтов подряд можно отправить без ожидания
+    THROTTLE_NOTIFY: bool = True # Предупреждать пользователя (один раз), что апдейты пропускаются
+    ROLE_CACHE_TTL: float = 10 # Время жизни кеша пользователей для проверки ролей (сек., 0 - без кеша)
+
+# Читает числовую переменную окружения со значением по умолчанию
+def _get_number(name: str, default: int | float, cast: type = int) -> int | float:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"{name} должен быть числом")
+
+# Несколько процессов бота (вебхук с WEBAPP_REUSE_PORT) делят между собой
+# только хранилище данных (STORAGE_BACKEND=sqlite), состояния FSM и лимиты
+# антифлуда (STATE_STORAGE=sqlite); индекс поиска подтягивает чужие заказы
+# из базы. Все остальное живет в памяти каждого процесса, а апдейты одного
+# чата Telegram может доставить в разные процессы. Поэтому в этом режиме
+# запрещены очереди и буферы, которые упорядочивают или объединяют апдейты
+# и уведомления в пределах процесса: очередь чатов (UPDATE_CONCURRENCY),
+# дайджест группы (GROUP_DIGEST_WINDOW) и объединение уведомлений клиента
+# (ORDER_NOTIFY_DELAY). Лимиты outbox тоже действуют на процесс:
+# OUTBOX_GLOBAL_RATE нужно делить на число процессов.
+def _check_multi_process(config: "Config") -> None:
+    problems = []
+    if config.RUN_MODE != "webhook":
+        problems.append("RUN_MODE=webhook")
+    if config.STORAGE_BACKEND != "sqlite":
+        problems.append("STORAGE_BACKEND=sqlite")
+    if config.STATE_STORAGE != "sqlite":
+        problems.append("STATE_STORAGE=sqlite")
+    if config.UPDATE_CONCURRENCY > 0:
+        problems.append("UPDATE_CONCURRENCY=0")
+    if config.GROUP_DIGEST_WINDOW > 0:
+        problems.append("GROUP_DIGEST_WINDOW=0")
+    if config.ORDER_NOTIFY_DELAY > 0:
+        problems.append("ORDER_NOTIFY_DELAY=0")
+    if problems:
+        raise ValueError(
+            "WEBAPP_REUSE_PORT (несколько процессов) поддерживает только общие данные, "
+            f"состояния FSM и антифлуд. Нужно: {', '.join(problems)}"
+        )
 
 # Функция для загрузки и валидации конфигурации
 def load_config() -> Config:
@@ -32,12 +100,65 @@ def load_config() -> Config:
         except ValueError:
             raise ValueError("GROUP_CHAT_ID должен быть числом")
 
+    storage_backend = os.getenv("STORAGE_BACKEND", "memory").lower()
+    if storage_backend not in ("memory", "journal", "sqlite"):
+        raise ValueError("STORAGE_BACKEND должен быть memory, journal или sqlite")
+
+    state_storage = os.getenv("STATE_STORAGE", "memory").lower()
+    if state_storage not in ("memory", "sqlite"):
+        raise ValueError("STATE_STORAGE должен быть memory или sqlite")
+
+    run_mode = os.getenv("RUN_MODE", "polling").lower()
+    if run_mode not in ("polling", "webhook"):
+        raise ValueError("RUN_MODE должен быть polling или webhook")
+
+    webhook_url = os.getenv("WEBHOOK_URL")
+    webhook_secret = os.getenv("WEBHOOK_SECRET")
+    if run_mode == "webhook":
+        if not webhook_url or not webhook_secret:
+            raise ValueError("Для RUN_MODE=webhook нужны WEBHOOK_URL и WEBHOOK_SECRET")
+        webhook_url = webhook_url.rstrip("/")
+
+    webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+    if not webhook_path.startswith("/"):
+        webhook_path = "/" + webhook_path
 
-    return Config(
+    loaded = Config(
         BOT_TOKEN=token,
         MAIN_ADMIN_ID=admin_id,
-        GROUP_CHAT_ID=group_chat_id
+        GROUP_CHAT_ID=group_chat_id,
+        STORAGE_BACKEND=storage_backend,
+        SQLITE_PATH=os.getenv("SQLITE_PATH", "data/bot.sqlite3"),
+        SQLITE_POOL_SIZE=_get_number("SQLITE_POOL_SIZE", 4),
+        STATE_STORAGE=state_storage,
+        STATE_SQLITE_PATH=os.getenv("STATE_SQLITE_PATH", "data/state.sqlite3"),
+        JOURNAL_DIR=os.getenv("JOURNAL_DIR", "data/journal"),
+        JOURNAL_FLUSH_INTERVAL=_get_number("JOURNAL_FLUSH_INTERVAL", 0.02, float),
+        SNAPSHOT_INTERVAL=_get_number("SNAPSHOT_INTERVAL", 300, float),
+        UPDATE_CONCURRENCY=_get_number("UPDATE_CONCURRENCY", 32),
+        UPDATE_QUEUE_LIMIT=_get_number("UPDATE_QUEUE_LIMIT", 10000),
+        ADMISSION_DELAY_THRESHOLD=_get_number("ADMISSION_DELAY_THRESHOLD", 2, float),
+        METRICS_LOG_INTERVAL=_get_number("METRICS_LOG_INTERVAL", 60, float),
+        RUN_MODE=run_mode,
+        WEBHOOK_URL=webhook_url,
+        WEBHOOK_PATH=webhook_path,
+        WEBHOOK_SECRET=webhook_secret,
+        WEBAPP_HOST=os.getenv("WEBAPP_HOST", "0.0.0.0"),
+        WEBAPP_PORT=_get_number("WEBAPP_PORT", 8080),
+        WEBAPP_REUSE_PORT=os.getenv("WEBAPP_REUSE_PORT", "").lower() in ("1", "true", "yes"),
+        OUTBOX_GLOBAL_RATE=_get_number("OUTBOX_GLOBAL_RATE", 30, float),
+        OUTBOX_MAX_RETRIES=_get_number("OUTBOX_MAX_RETRIES", 5),
+        ORDER_NOTIFY_DELAY=_get_number("ORDER_NOTIFY_DELAY", 10, float),
+        GROUP_DIGEST_WINDOW=_get_number("GROUP_DIGEST_WINDOW", 0, float),
+        BROADCAST_CHECKPOINT=os.getenv("BROADCAST_CHECKPOINT", "data/broadcast.json"),
+        THROTTLE_RATE=_get_number("THROTTLE_RATE", 1.5, float),
+        THROTTLE_BURST=_get_number("THROTTLE_BURST", 5, float),
+        THROTTLE_NOTIFY=os.getenv("THROTTLE_NOTIFY", "1").lower() in ("1", "true", "yes"),
+        ROLE_CACHE_TTL=_get_number("ROLE_CACHE_TTL", 10, float)
     )
+    if loaded.WEBAPP_REUSE_PORT:
+        _check_multi_process(loaded)
+    return loaded
 
 # Глобальная переменная конфигурации
 config = load_config()
\ No newline at end of file
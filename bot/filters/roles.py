@@ -1,23 +1,33 @@
+from typing import Optional
+
 from aiogram.filters import Filter
 from aiogram.types import Message, CallbackQuery
 from bot.models.data_store import get_user_role
+from bot.models.records import Role, User
+
+# Роль берется из db_user (загружается UserContextMiddleware один раз на апдейт).
+# Без middleware (например, в отдельном роутере) - из кеша ролей data_store.
+_MISSING = object()
+
+async def _resolve_role(event: Message | CallbackQuery, db_user: Optional[User] | object) -> str:
+    if db_user is _MISSING:
+        return await get_user_role(event.from_user.id)
+    return db_user.role if db_user else Role.client
 
 class IsAdmin(Filter):
     """
     Фильтр проверяет, является ли пользователь администратором
     ИЛИ главным администратором.
     """
-    async def __call__(self, event: Message | CallbackQuery) -> bool:
-        user_id = event.from_user.id
-        role = get_user_role(user_id)
+    async def __call__(self, event: Message | CallbackQuery, db_user: Optional[User] | object = _MISSING) -> bool:
+        role = await _resolve_role(event, db_user)
         return role in ["admin", "main_admin"]
 
 class IsMainAdmin(Filter):
     """
     Фильтр проверяет, является ли пользователь ГЛАВНЫМ администратором.
     """
-    async def __call__(self, event: Message | CallbackQuery) -> bool:
-        user_id = event.from_user.id
-        role = get_user_role(user_id)
+    async def __call__(self, event: Message | CallbackQuery, db_user: Optional[User] | object = _MISSING) -> bool:
+        role = await _resolve_role(event, db_user)
         # Проверка основана на данных из data_store, которые синхронизируются с MAIN_ADMIN_ID
-        return role == "main_admin"
\ No newline at end of file
+        return role == "main_admin"
@@ -1,21 +1,37 @@
 import html
-from aiogram import Router, F, Bot
+import os
+import re
+import tempfile
+from aiogram import Router, F
 from aiogram.filters import Command, StateFilter
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
 
-from bot.lexicon.lexicon_ru import LEXICON, ORDER_STATUSES, FSM_QUESTIONS
+from bot.lexicon.lexicon_ru import LEXICON, ORDER_STATUSES, USER_ROLES
 from bot.models.data_store import (
-    get_all_users, grant_admin_role, users_db, get_all_orders, get_order_by_id,
-    update_order_status, update_order_name, get_user_data
+    get_users_page, grant_admin_role, get_all_orders, get_order_by_id,
+    update_order_status, update_order_name, get_user_data, get_users_by_ids, search_orders,
+    update_orders_status
 )
 from bot.keyboards.menu_keyboards import (
     create_admin_menu_keyboard, create_back_to_admin_keyboard,
     create_grant_admin_keyboard, create_admin_orders_keyboard,
-    create_order_management_keyboard, create_status_selection_keyboard
+    create_order_management_keyboard, create_status_selection_keyboard,
+    create_search_results_keyboard, create_broadcast_confirm_keyboard, create_bulk_actions_keyboard,
+    create_broadcast_progress_keyboard, create_admin_users_keyboard
+)
+from bot.keyboards.callbacks import (
+    AdminOrdersPage, OrderFilter, OrderSelect, BulkStatus, SearchPage, AdminOrder, OrderAction,
+    SetOrderStatus, AdminUsersPage, UserRoleFilter
 )
 from bot.states.states import AdminStates, AdminOrderStates
 from bot.filters.roles import IsAdmin, IsMainAdmin
+from bot.middlewares.throttling import THROTTLING_COST_FLAG
+from bot.services.order_notifications import OrderNotificationDebouncer
+from bot.services.broadcast import Broadcaster
+from bot.services.order_render import get_cached_order_details, render_order_details
+from bot.services.message_edits import edit_text
+from bot.services.user_export import export_users_csv
 
 router = Router()
 router.message.filter(IsAdmin())
@@ -28,7 +44,7 @@ async def show_admin_menu(event: Message | CallbackQuery, state: FSMContext):
     if isinstance(event, Message):
         await event.answer(text, reply_markup=keyboard)
     elif isinstance(event, CallbackQuery):
-        await event.message.edit_text(text, reply_markup=keyboard)
+        await edit_text(event.message, text, reply_markup=keyboard)
         await event.answer()
 
 @router.message(Command("admin"))
@@ -36,18 +52,100 @@ async def show_admin_menu(event: Message | CallbackQuery, state: FSMContext):
 async def admin_menu_handler(event: Message | CallbackQuery, state: FSMContext):
     await show_admin_menu(event, state)
 
+# --- СПИСОК ПОЛЬЗОВАТЕЛЕЙ ---
+
+USERS_PAGE_SIZE = 20
+# Допустимые символы username в Telegram
+USERNAME_PREFIX_RE = re.compile(r"[A-Za-z0-9_]{1,32}")
+
+async def show_users_list(
+    event: Message | CallbackQuery, state: FSMContext, page: int = 1, cursor: int | None = None, backward: bool = False
+):
+    """Отображает страницу списка пользователей с фильтрами по роли и началу ника."""
+    data = await state.get_data()
+    role = data.get('users_role')
+    prefix = data.get('users_prefix')
+    users, total_pages, total_items = await get_users_page(
+        role, prefix, cursor=cursor, backward=backward, page_size=USERS_PAGE_SIZE
+    )
+
+    text_lines = [LEXICON["admin_users_title"].format(role=USER_ROLES.get(role, 'Все') if role else 'Все', count=total_items)]
+    if prefix:
+        text_lines.append(LEXICON["admin_users_prefix_filter"].format(prefix=html.escape(prefix)))
+    text_lines.append("")
+    if not users:
+        text_lines.append(LEXICON["admin_no_users_found"])
+    for i, user in enumerate(users, (page - 1) * USERS_PAGE_SIZE + 1):
+        text_lines.append(LEXICON["admin_user_line"].format(
+            number=i,
+            user_id=user.user_id,
+            username=f"@{html.escape(user.username)}" if user.username else "Без ника",
+            role=USER_ROLES.get(user.role, user.role)
+        ))
+    text = "\n".join(text_lines)
+    keyboard = create_admin_users_keyboard(users, total_pages, page, role, bool(prefix))
+
+    if isinstance(event, Message):
+        await event.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    elif isinstance(event, CallbackQuery):
+        await edit_text(event.message, text, reply_markup=keyboard, parse_mode="HTML")
+        await event.answer()
+
 @router.callback_query(F.data == "admin_list_users")
-async def list_users_handler(callback: CallbackQuery):
-    users = get_all_users()
-    text = LEXICON["admin_list_users_title"].format(count=len(users)) if users else "В базе нет пользователей."
-    if users:
-        for user in users:
-            display_name = f"@{html.escape(user['username'])}" if user.get('username') else "Без ника"
-            text += f"- ID: <code>{user['user_id']}</code>, Ник: {display_name}, Роль: {user['role']}\n"
-    keyboard = create_back_to_admin_keyboard()
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+async def list_users_handler(callback: CallbackQuery, state: FSMContext):
+    await state.update_data(users_role=None, users_prefix=None) # Сбрасываем фильтры
+    await show_users_list(callback, state)
+
+@router.callback_query(UserRoleFilter.filter())
+async def users_role_filter_handler(callback: CallbackQuery, callback_data: UserRoleFilter, state: FSMContext):
+    role = callback_data.role
+    await state.update_data(users_role=role if role in USER_ROLES else None)
+    await show_users_list(callback, state)
+
+@router.callback_query(AdminUsersPage.filter())
+async def users_page_handler(callback: CallbackQuery, callback_data: AdminUsersPage, state: FSMContext):
+    await show_users_list(
+        callback, state, page=callback_data.page, cursor=callback_data.cursor, backward=callback_data.backward
+    )
+
+@router.callback_query(F.data == "admin_users_search")
+async def users_search_handler(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(AdminStates.waiting_for_username_prefix)
+    await edit_text(callback.message, LEXICON["admin_users_search_prompt"], reply_markup=create_back_to_admin_keyboard())
     await callback.answer()
 
+@router.message(AdminStates.waiting_for_username_prefix)
+async def process_username_prefix(message: Message, state: FSMContext):
+    prefix = (message.text or "").strip().lstrip("@")
+    if not USERNAME_PREFIX_RE.fullmatch(prefix):
+        await message.answer(LEXICON["admin_users_search_invalid"])
+        return
+    await state.set_state(None)
+    await state.update_data(users_prefix=prefix)
+    await show_users_list(message, state)
+
+@router.callback_query(F.data == "admin_users_search_reset")
+async def users_search_reset_handler(callback: CallbackQuery, state: FSMContext):
+    await state.update_data(users_prefix=None)
+    await show_users_list(callback, state)
+
+# Выгрузка читает всех пользователей - для антифлуда она дороже обычного нажатия
+@router.callback_query(F.data == "admin_users_export", flags={THROTTLING_COST_FLAG: 3})
+async def users_export_handler(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    await callback.answer(LEXICON["admin_users_export_started"])
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        count = await export_users_csv(path, data.get('users_role'), data.get('users_prefix'))
+        # Файл отправляется с диска по частям, а не собирается в памяти
+        await callback.message.answer_document(
+            FSInputFile(path, filename="users.csv"),
+            caption=LEXICON["admin_users_export_caption"].format(count=count)
+        )
+    finally:
+        os.remove(path)
+
 # --- УПРАВЛЕНИЕ ЗАКАЗАМИ ---
 
 async def get_orders_list_text(orders: list) -> str:
@@ -55,10 +153,12 @@ async def get_orders_list_text(orders: list) -> str:
     if not orders:
         return LEXICON["admin_no_orders_found"]
     
+    # Клиенты всех заказов страницы - одним запросом
+    users = await get_users_by_ids([order['user_id'] for order in orders])
     text_lines = []
     for i, order in enumerate(orders, 1):
         status_display = ORDER_STATUSES.get(order['status'], order['status'])
-        user_info = get_user_data(order['user_id'])
+        user_info = users.get(order['user_id'])
         user_display = f"@{user_info['username']}" if user_info and user_info.get('username') else f"ID: {order['user_id']}"
         order_name = f"<b>{html.escape(order['name'])}</b>" if order.get('name') else f"Заказ <code>{order['order_id']}</code>"
         
@@ -67,46 +167,161 @@ async def get_orders_list_text(orders: list) -> str:
     text_lines.append(f"\n{LEXICON['admin_orders_list_prompt']}")
     return "\n".join(text_lines)
 
-async def show_all_orders(callback: CallbackQuery, state: FSMContext, page: int = 1):
-    """Отображает список всех заказов с фильтрами и пагинацией."""
+async def show_all_orders(
+    callback: CallbackQuery, state: FSMContext, page: int = 1, cursor: str | None = None, backward: bool = False,
+    alert: str | None = None
+):
+    """Отображает список всех заказов с фильтрами и пагинацией по курсору."""
     data = await state.get_data()
     current_filter = data.get('order_filter')
+    selected = set(data.get('selected_orders', []))
     
-    orders, total_pages = get_all_orders(status_filter=current_filter, page=page)
+    orders, total_pages = await get_all_orders(status_filter=current_filter, cursor=cursor, backward=backward)
     
     text_filter = ORDER_STATUSES.get(current_filter, 'Все') if current_filter else 'Все'
     title = LEXICON["admin_all_orders_title"].format(filter=text_filter)
+    if selected:
+        title += "\n" + LEXICON["admin_selected_orders"].format(count=len(selected))
     orders_text = await get_orders_list_text(orders)
     
     full_text = f"{title}\n\n{orders_text}"
     
-    keyboard = create_admin_orders_keyboard(total_pages, page, current_filter)
+    keyboard = create_admin_orders_keyboard(orders, total_pages, page, current_filter, selected)
     
-    await callback.message.edit_text(full_text, reply_markup=keyboard, parse_mode="HTML")
+    await edit_text(callback.message, full_text, reply_markup=keyboard, parse_mode="HTML")
     await state.set_state(AdminOrderStates.selecting_order)
-    await state.update_data(current_orders_on_page=orders)
-    await callback.answer()
+    # В FSM храним только ID: записи заказов не сериализуются в хранилище состояний.
+    # Параметры страницы нужны, чтобы перерисовать ее после отметки заказов.
+    await state.update_data(
+        current_orders_on_page=[order['order_id'] for order in orders],
+        orders_page=[page, cursor, backward]
+    )
+    await callback.answer(alert, show_alert=bool(alert))
+
+async def show_current_orders_page(callback: CallbackQuery, state: FSMContext, alert: str | None = None):
+    """Перерисовывает последнюю открытую страницу списка заказов."""
+    data = await state.get_data()
+    page, cursor, backward = data.get('orders_page', [1, None, False])
+    await show_all_orders(callback, state, page=page, cursor=cursor, backward=backward, alert=alert)
 
 @router.callback_query(F.data == "admin_all_orders")
 async def all_orders_handler(callback: CallbackQuery, state: FSMContext):
     await state.update_data(order_filter=None) # Сбрасываем фильтр
     await show_all_orders(callback, state, page=1)
 
-@router.callback_query(F.data.startswith("admin_orders_page_"))
-async def all_orders_page_handler(callback: CallbackQuery, state: FSMContext):
-    page = int(callback.data.split("_")[-1])
-    await show_all_orders(callback, state, page=page)
+@router.callback_query(F.data == "admin_orders_current")
+async def current_orders_page_handler(callback: CallbackQuery, state: FSMContext):
+    await show_current_orders_page(callback, state)
+
+@router.callback_query(AdminOrdersPage.filter())
+async def all_orders_page_handler(callback: CallbackQuery, callback_data: AdminOrdersPage, state: FSMContext):
+    await show_all_orders(
+        callback, state, page=callback_data.page, cursor=callback_data.cursor, backward=callback_data.backward
+    )
+
+# --- МАССОВЫЕ ДЕЙСТВИЯ С ЗАКАЗАМИ ---
+
+@router.callback_query(OrderSelect.filter())
+async def toggle_order_selection_handler(callback: CallbackQuery, callback_data: OrderSelect, state: FSMContext):
+    order_id = callback_data.order_id
+    data = await state.get_data()
+    selected = data.get('selected_orders', [])
+    if order_id in selected:
+        selected.remove(order_id)
+    else:
+        selected.append(order_id)
+    # Выбор сохраняется при смене страниц и фильтров
+    await state.update_data(selected_orders=selected)
+    await show_current_orders_page(callback, state)
+
+@router.callback_query(F.data == "bulk_actions")
+async def bulk_actions_handler(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    selected = data.get('selected_orders', [])
+    if not selected:
+        await callback.answer(LEXICON["admin_bulk_nothing_selected"], show_alert=True)
+        return
+    await edit_text(
+        callback.message, LEXICON["admin_bulk_prompt"].format(count=len(selected)), reply_markup=create_bulk_actions_keyboard()
+    )
+    await callback.answer()
+
+@router.callback_query(F.data == "bulk_clear")
+async def bulk_clear_handler(callback: CallbackQuery, state: FSMContext):
+    await state.update_data(selected_orders=[])
+    await show_current_orders_page(callback, state)
+
+@router.callback_query(BulkStatus.filter())
+async def bulk_status_handler(
+    callback: CallbackQuery, callback_data: BulkStatus, state: FSMContext, order_notifications: OrderNotificationDebouncer
+):
+    new_status = callback_data.status
+    data = await state.get_data()
+    selected = data.get('selected_orders', [])
+    if not selected:
+        await callback.answer(LEXICON["admin_bulk_nothing_selected"], show_alert=True)
+        return
+
+    # Одна операция хранилища на все заказы и одно сообщение каждому клиенту
+    changes = await update_orders_status(selected, new_status)
+    order_notifications.bulk_status_changed(new_status, changes)
+
+    await state.update_data(selected_orders=[])
+    alert = LEXICON["admin_bulk_status_updated"].format(
+        count=len(changes), status=ORDER_STATUSES.get(new_status, new_status)
+    )
+    await show_current_orders_page(callback, state, alert=alert)
 
-@router.callback_query(F.data.startswith("admin_filter_"))
-async def all_orders_filter_handler(callback: CallbackQuery, state: FSMContext):
-    filter_key = callback.data.split("_")[-1]
-    status_filter = filter_key if filter_key != "all" else None
-    await state.update_data(order_filter=status_filter)
+@router.callback_query(OrderFilter.filter())
+async def all_orders_filter_handler(callback: CallbackQuery, callback_data: OrderFilter, state: FSMContext):
+    await state.update_data(order_filter=callback_data.status)
     await show_all_orders(callback, state, page=1)
 
+# --- ПОИСК ЗАКАЗОВ ---
+
+@router.callback_query(F.data == "admin_search")
+async def search_orders_handler(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(AdminOrderStates.searching)
+    await edit_text(callback.message, LEXICON["admin_search_prompt"], reply_markup=create_back_to_admin_keyboard())
+    await callback.answer()
+
+async def show_search_results(event: Message | CallbackQuery, state: FSMContext, page: int = 1):
+    """Показывает страницу результатов поиска по запросу из FSM."""
+    data = await state.get_data()
+    query = data.get('search_query', '')
+    orders, total_pages, total_items = await search_orders(query, page=page)
+
+    if not orders:
+        # Остаемся в состоянии поиска, чтобы можно было сразу ввести другой запрос
+        await state.set_state(AdminOrderStates.searching)
+        text = LEXICON["admin_search_nothing_found"].format(query=html.escape(query))
+        keyboard = create_back_to_admin_keyboard()
+    else:
+        title = LEXICON["admin_search_results_title"].format(query=html.escape(query), count=total_items)
+        text = f"{title}\n\n{await get_orders_list_text(orders)}"
+        keyboard = create_search_results_keyboard(total_pages, page)
+        # Дальше админ может открыть заказ по номеру в списке или по ID
+        await state.set_state(AdminOrderStates.selecting_order)
+        await state.update_data(current_orders_on_page=[order['order_id'] for order in orders])
+
+    if isinstance(event, Message):
+        await event.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    elif isinstance(event, CallbackQuery):
+        await edit_text(event.message, text, reply_markup=keyboard, parse_mode="HTML")
+        await event.answer()
+
+@router.message(AdminOrderStates.searching, flags={THROTTLING_COST_FLAG: 2})
+async def process_search_query(message: Message, state: FSMContext):
+    await state.update_data(search_query=(message.text or "").strip())
+    await show_search_results(message, state)
+
+@router.callback_query(SearchPage.filter())
+async def search_page_handler(callback: CallbackQuery, callback_data: SearchPage, state: FSMContext):
+    await show_search_results(callback, state, page=callback_data.page)
+
 async def show_single_order(event: Message | CallbackQuery, state: FSMContext, order_id: str):
     """Показывает детали одного заказа и кнопки управления."""
-    order = get_order_by_id(order_id)
+    order = await get_order_by_id(order_id)
     if not order:
         if isinstance(event, Message):
             await event.answer(LEXICON["admin_order_not_found"].format(order_id=order_id), parse_mode="HTML")
@@ -114,37 +329,20 @@ async def show_single_order(event: Message | CallbackQuery, state: FSMContext, o
 
     await state.set_state(AdminOrderStates.viewing_order)
 
-    user_info_db = get_user_data(order['user_id'])
-    user_info = f"@{user_info_db['username']} (<code>{order['user_id']}</code>)" if user_info_db and user_info_db.get('username') else f"ID: <code>{order['user_id']}</code>"
-    
-    details = order.get('details', {})
-    q_and_a = []
-    questions_list = FSM_QUESTIONS.get(details.get('questions_key'), [])
-    for q in questions_list:
-        answer = html.escape(details.get(q['key'], 'N/A'))
-        q_and_a.append(f"<b>{html.escape(q['text'])}</b>\n&gt; {answer}")
-
-    text = LEXICON["admin_order_details"].format(
-        order_id=order['order_id'],
-        name=html.escape(order.get('name') or "Без названия"),
-        status=ORDER_STATUSES.get(order['status'], order['status']),
-        user_info=user_info,
-        service=html.escape(details.get('service_category', 'N/A')),
-        sub_service=html.escape(details.get('sub_service_category', 'N/A')),
-        questions_answers="\n\n".join(q_and_a)
-    )
+    text = get_cached_order_details(order)
+    if text is None:
+        text = render_order_details(order, await get_user_data(order.user_id))
     keyboard = create_order_management_keyboard(order['order_id'])
 
     if isinstance(event, Message):
         await event.answer(text, reply_markup=keyboard, parse_mode="HTML")
     elif isinstance(event, CallbackQuery):
-        await event.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+        await edit_text(event.message, text, reply_markup=keyboard, parse_mode="HTML")
         await event.answer()
 
-@router.callback_query(F.data.startswith("view_order_admin_"))
-async def view_order_admin_handler(callback: CallbackQuery, state: FSMContext):
-    order_id = callback.data.split('_')[-1]
-    await show_single_order(callback, state, order_id)
+@router.callback_query(AdminOrder.filter(F.action == OrderAction.view))
+async def view_order_admin_handler(callback: CallbackQuery, callback_data: AdminOrder, state: FSMContext):
+    await show_single_order(callback, state, callback_data.order_id)
 
 @router.message(AdminOrderStates.selecting_order)
 async def process_order_selection(message: Message, state: FSMContext):
@@ -156,9 +354,9 @@ async def process_order_selection(message: Message, state: FSMContext):
     if selection.isdigit():
         idx = int(selection) - 1
         if 0 <= idx < len(orders_on_page):
-            order_id = orders_on_page[idx]['order_id']
+            order_id = orders_on_page[idx]
     else:
-        order = get_order_by_id(selection)
+        order = await get_order_by_id(selection)
         if order:
             order_id = order['order_id']
 
@@ -167,34 +365,31 @@ async def process_order_selection(message: Message, state: FSMContext):
     else:
         await message.answer(LEXICON["admin_order_not_found"].format(order_id=selection), parse_mode="HTML")
 
-@router.callback_query(AdminOrderStates.viewing_order, F.data.startswith("manage_status_"))
-async def change_status_handler(callback: CallbackQuery, state: FSMContext):
-    order_id = callback.data.split('_')[-1]
+@router.callback_query(AdminOrderStates.viewing_order, AdminOrder.filter(F.action == OrderAction.change_status))
+async def change_status_handler(callback: CallbackQuery, callback_data: AdminOrder, state: FSMContext):
+    order_id = callback_data.order_id
     await state.set_state(AdminOrderStates.changing_status)
     keyboard = create_status_selection_keyboard(order_id)
     text = LEXICON["admin_change_status_prompt"].format(order_id=order_id)
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await edit_text(callback.message, text, reply_markup=keyboard, parse_mode="HTML")
     await callback.answer()
 
-@router.callback_query(AdminOrderStates.changing_status, F.data.startswith("set_status_"))
-async def set_status_handler(callback: CallbackQuery, state: FSMContext, bot: Bot):
-    parts = callback.data.split('_')
-    order_id = parts[2]
-    new_status = "_".join(parts[3:])
-
-    if update_order_status(order_id, new_status):
-        order = get_order_by_id(order_id)
-        client_id = order['user_id']
+@router.callback_query(AdminOrderStates.changing_status, SetOrderStatus.filter())
+async def set_status_handler(
+    callback: CallbackQuery, callback_data: SetOrderStatus, state: FSMContext,
+    order_notifications: OrderNotificationDebouncer
+):
+    order_id = callback_data.order_id
+    new_status = callback_data.status
+
+    order = await get_order_by_id(order_id)
+    old_status = order['status'] if order else None
+    if order and await update_order_status(order_id, new_status):
         status_display = ORDER_STATUSES.get(new_status, new_status)
-        
-        try:
-            await bot.send_message(
-                client_id,
-                LEXICON["notification_status_changed"].format(order_id=order_id, status=status_display),
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            print(f"Failed to notify user {client_id}: {e}")
+
+        # Клиент получит одно уведомление с итоговым состоянием заказа,
+        # даже если админ прощелкает несколько статусов подряд
+        order_notifications.status_changed(order['order_id'], order['user_id'], old_status, new_status, order['name'])
 
         # Создаем текст для всплывающего уведомления без HTML-тегов
         alert_text = LEXICON["admin_status_updated"].format(
@@ -207,36 +402,79 @@ async def set_status_handler(callback: CallbackQuery, state: FSMContext, bot: Bo
         )
     await show_single_order(callback, state, order_id)
 
-@router.callback_query(AdminOrderStates.viewing_order, F.data.startswith("manage_name_"))
-async def set_name_handler(callback: CallbackQuery, state: FSMContext):
-    order_id = callback.data.split('_')[-1]
+@router.callback_query(AdminOrderStates.viewing_order, AdminOrder.filter(F.action == OrderAction.set_name))
+async def set_name_handler(callback: CallbackQuery, callback_data: AdminOrder, state: FSMContext):
+    order_id = callback_data.order_id
     await state.update_data(order_id_to_rename=order_id)
     await state.set_state(AdminOrderStates.setting_name)
     text = LEXICON["admin_set_name_prompt"].format(order_id=order_id)
-    await callback.message.edit_text(text, parse_mode="HTML")
+    await edit_text(callback.message, text, parse_mode="HTML")
     await callback.answer()
 
 @router.message(AdminOrderStates.setting_name)
-async def process_new_name(message: Message, state: FSMContext, bot: Bot):
+async def process_new_name(message: Message, state: FSMContext, order_notifications: OrderNotificationDebouncer):
     data = await state.get_data()
     order_id = data.get('order_id_to_rename')
     new_name = message.text
-    if order_id and update_order_name(order_id, new_name):
-        order = get_order_by_id(order_id)
-        client_id = order['user_id']
-        
-        try:
-            await bot.send_message(
-                client_id,
-                LEXICON["notification_name_changed"].format(order_id=order_id, name=html.escape(new_name)),
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            print(f"Failed to notify user {client_id}: {e}")
-            
+    order = await get_order_by_id(order_id) if order_id else None
+    old_name = order['name'] if order else None
+    if order and await update_order_name(order_id, new_name):
+        order_notifications.name_changed(order['order_id'], order['user_id'], old_name, new_name, order['status'])
+
         await message.answer(LEXICON["admin_name_updated"].format(order_id=order_id))
     await show_single_order(message, state, order_id)
 
+# --- РАССЫЛКА ---
+
+@router.callback_query(F.data == "admin_broadcast")
+async def broadcast_handler(callback: CallbackQuery, state: FSMContext, broadcaster: Broadcaster):
+    if broadcaster.is_running:
+        # Показываем текущий прогресс вместо запуска новой рассылки
+        text = broadcaster.progress_text(LEXICON["broadcast_status_running"])
+        await edit_text(
+            callback.message, text, reply_markup=create_broadcast_progress_keyboard(running=True), parse_mode="HTML"
+        )
+        await callback.answer()
+        return
+    await state.set_state(AdminStates.waiting_for_broadcast_text)
+    await edit_text(callback.message, LEXICON["broadcast_prompt"], reply_markup=create_back_to_admin_keyboard())
+    await callback.answer()
+
+@router.message(AdminStates.waiting_for_broadcast_text)
+async def process_broadcast_text(message: Message, state: FSMContext):
+    if not message.text:
+        await message.answer(LEXICON["broadcast_prompt"], reply_markup=create_back_to_admin_keyboard())
+        return
+    # html_text сохраняет форматирование исходного сообщения
+    await state.update_data(broadcast_text=message.html_text)
+    await state.set_state(AdminStates.confirming_broadcast)
+    await message.answer(
+        LEXICON["broadcast_confirm"].format(text=message.html_text),
+        reply_markup=create_broadcast_confirm_keyboard(),
+        parse_mode="HTML"
+    )
+
+@router.callback_query(AdminStates.confirming_broadcast, F.data == "broadcast_confirm")
+async def confirm_broadcast_handler(callback: CallbackQuery, state: FSMContext, broadcaster: Broadcaster):
+    data = await state.get_data()
+    await state.clear()
+    if not await broadcaster.start(data["broadcast_text"], callback.message.chat.id, callback.message.message_id):
+        await callback.answer(LEXICON["broadcast_already_running"], show_alert=True)
+        return
+    text = broadcaster.progress_text(LEXICON["broadcast_status_running"])
+    await edit_text(
+        callback.message, text, reply_markup=create_broadcast_progress_keyboard(running=True), parse_mode="HTML"
+    )
+    await callback.answer()
+
+@router.callback_query(F.data == "broadcast_cancel")
+async def cancel_broadcast_handler(callback: CallbackQuery, broadcaster: Broadcaster):
+    # Итоговые счетчики выводит сама рассылка в своем сообщении
+    if not await broadcaster.cancel():
+        await callback.answer(LEXICON["broadcast_not_running"], show_alert=True)
+        return
+    await callback.answer()
+
 # --- ВЫДАЧА ПРАВ АДМИНИСТРАТОРА ---
 
 @router.message(Command("grant_admin"), IsMainAdmin())
@@ -255,8 +493,8 @@ async def cmd_grant_admin(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "admin_grant", IsMainAdmin())
 async def grant_admin_button_handler(callback: CallbackQuery, state: FSMContext):
-    await callback.message.edit_text(
-        LEXICON["admin_grant_prompt"],
+    await edit_text(
+        callback.message, LEXICON["admin_grant_prompt"],
         reply_markup=create_grant_admin_keyboard()
     )
     await state.set_state(AdminStates.waiting_for_user_id_to_grant)
@@ -271,10 +509,10 @@ async def process_grant_admin_id(message: Message, state: FSMContext):
         await message.answer(LEXICON["admin_grant_invalid_id"])
 
 async def process_grant(message: Message, user_id_to_grant: int, state: FSMContext):
-    if user_id_to_grant not in users_db:
+    if not await get_user_data(user_id_to_grant):
         await message.answer(LEXICON["admin_user_not_found"].format(user_id=user_id_to_grant))
         return
-    if grant_admin_role(user_id_to_grant):
+    if await grant_admin_role(user_id_to_grant):
         await message.answer(LEXICON["admin_grant_success"].format(user_id=user_id_to_grant))
         await show_admin_menu(message, state)
     else:
@@ -1,6 +1,7 @@
+import html
 import logging
 from typing import Optional
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.filters import Command, StateFilter
 from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove
 from aiogram.fsm.context import FSMContext
@@ -11,7 +12,9 @@ from bot.keyboards.fsm_keyboards import (
 from bot.lexicon.lexicon_ru import LEXICON, FSM_SERVICES, FSM_QUESTIONS
 from bot.models.data_store import add_order
 from bot.states.states import ApplicationStates
-from bot.config import config
+from bot.services.group_digest import GroupDigest
+from bot.services.message_edits import edit_text
+from bot.middlewares.throttling import THROTTLING_COST_FLAG
 
 router = Router()
 
@@ -38,8 +41,8 @@ async def cancel_handler(event: Message | CallbackQuery, state: FSMContext) -> N
         )
     elif isinstance(event, CallbackQuery):
         try:
-            await event.message.edit_text(
-                message_to_send,
+            await edit_text(
+                event.message, message_to_send,
                 reply_markup=None
             )
         except:
@@ -77,18 +80,18 @@ async def process_service_choice(callback: CallbackQuery, state: FSMContext):
     if 'sub_services' in service_info:
         await state.set_state(ApplicationStates.choosing_subservice)
         keyboard = get_subservice_choice_keyboard(service_key)
-        await callback.message.edit_text(LEXICON['sub_service_prompt'], reply_markup=keyboard)
+        await edit_text(callback.message, LEXICON['sub_service_prompt'], reply_markup=keyboard)
     else:
         # Если подуслуг нет, сразу переходим к вопросам
         questions = FSM_QUESTIONS.get(service_key)
         if not questions:
-            await callback.message.edit_text("Ошибка: для данной услуги не найдены вопросы.", reply_markup=None)
+            await edit_text(callback.message, "Ошибка: для данной услуги не найдены вопросы.", reply_markup=None)
             await state.clear()
             return
 
         await state.set_state(ApplicationStates.answering_questions)
         await state.update_data(question_index=0, questions_key=service_key)
-        await callback.message.edit_text(questions[0]['text'])
+        await edit_text(callback.message, questions[0]['text'])
 
     await callback.answer()
 
@@ -106,19 +109,20 @@ async def process_subservice_choice(callback: CallbackQuery, state: FSMContext):
 
     questions = FSM_QUESTIONS.get(sub_service_key)
     if not questions:
-        await callback.message.edit_text("Ошибка: для данной подуслуги не найдены вопросы.", reply_markup=None)
+        await edit_text(callback.message, "Ошибка: для данной подуслуги не найдены вопросы.", reply_markup=None)
         await state.clear()
         return
 
     await state.set_state(ApplicationStates.answering_questions)
     await state.update_data(question_index=0, questions_key=sub_service_key)
-    await callback.message.edit_text(questions[0]['text'])
+    await edit_text(callback.message, questions[0]['text'])
     await callback.answer()
 
 
-# Единый обработчик для всех вопросов из списка FSM_QUESTIONS
-@router.message(ApplicationStates.answering_questions)
-async def process_answer(message: Message, state: FSMContext, bot: Bot):
+# Единый обработчик для всех вопросов из списка FSM_QUESTIONS.
+# Ответы на анкету часто идут подряд, поэтому они дешевле для антифлуда.
+@router.message(ApplicationStates.answering_questions, flags={THROTTLING_COST_FLAG: 0.5})
+async def process_answer(message: Message, state: FSMContext, group_digest: GroupDigest):
     data = await state.get_data()
     question_index = data.get('question_index', 0)
     questions_key = data.get('questions_key')
@@ -137,34 +141,37 @@ async def process_answer(message: Message, state: FSMContext, bot: Bot):
         user_data = await state.get_data()
         await state.clear()
 
-        order_id = add_order(message.from_user.id, user_data)
+        order_id = await add_order(message.from_user.id, user_data)
         
         # --- Формирование и отправка уведомления ---
-        user_info = f"@{message.from_user.username} [`{message.from_user.id}`]" if message.from_user.username else f"[`{message.from_user.id}`]"
-        
+        # Сводка в HTML: ответы и username - пользовательский текст, экранируем
+        user_info = f"[<code>{message.from_user.id}</code>]"
+        if message.from_user.username:
+            user_info = f"@{html.escape(message.from_user.username)} {user_info}"
+
         summary_lines = [
             LEXICON["new_application_header"].format(order_id=order_id),
             LEXICON["new_application_client"].format(user_info=user_info),
             "---",
-            LEXICON["new_application_service"].format(service_category=user_data.get('service_category', 'Н/Д')),
+            LEXICON["new_application_service"].format(
+                service_category=html.escape(user_data.get('service_category', 'Н/Д'))
+            ),
         ]
 
         if 'sub_service_category' in user_data:
-            summary_lines.append(LEXICON["new_application_sub_service"].format(sub_service_category=user_data['sub_service_category']))
+            summary_lines.append(LEXICON["new_application_sub_service"].format(
+                sub_service_category=html.escape(user_data['sub_service_category'])
+            ))
 
         for question in questions:
             key = question['key']
-            answer = user_data.get(key, 'Н/Д')
-            summary_lines.append(f"*{question['text']}*\n> {answer}")
+            answer = user_data.get(key) or 'Н/Д'
+            summary_lines.append(f"<b>{html.escape(question['text'])}</b>\n&gt; {html.escape(answer)}")
 
         summary_text = "\n\n".join(summary_lines)
 
-        # Отправка уведомления только в групповой чат
-        if config.GROUP_CHAT_ID:
-            try:
-                await bot.send_message(config.GROUP_CHAT_ID, summary_text, parse_mode="Markdown")
-            except Exception as e:
-                logging.error(f"Failed to send message to group chat {config.GROUP_CHAT_ID}: {e}")
+        # Отправка уведомления только в групповой чат (при высокой нагрузке - дайджестом)
+        group_digest.add(summary_text)
 
         await message.answer(
             LEXICON["fsm_finish"].format(order_id=order_id)
@@ -3,35 +3,41 @@ from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from math import ceil
+from typing import Optional
 # Импортируем утилиты для работы с реферальными ссылками
 from aiogram.utils.deep_linking import decode_payload, create_start_link
 
 from bot.lexicon.lexicon_ru import LEXICON, USER_ROLES, BUTTONS
 from bot.models.data_store import (
-    register_user, get_user_data, get_orders_count, get_user_role,
+    register_user, get_cached_user, get_orders_count,
     get_referrals, get_user_orders
 )
+from bot.models.records import Role, User
 from bot.keyboards.menu_keyboards import (
     create_main_menu_keyboard, create_referral_menu_keyboard,
     create_my_orders_keyboard, create_referrals_keyboard
 )
+from bot.keyboards.callbacks import MyOrdersPage, ReferralsPage
 from bot.states.states import ApplicationStates
+from bot.services.outbox import Outbox
+from bot.services.message_edits import edit_text
 
 router = Router()
 
 # Вспомогательная функция для отображения главного меню
-async def show_main_menu(event: Message | CallbackQuery, state: FSMContext):
+async def show_main_menu(event: Message | CallbackQuery, state: FSMContext, db_user: Optional[User] = None):
     await state.clear() # Сбрасываем любое текущее состояние FSM
 
     user_id = event.from_user.id
-    # Убедимся, что пользователь зарегистрирован
-    if not get_user_data(user_id):
-        register_user(user_id, event.from_user.username)
+    # db_user загружен middleware; если пользователя нет - регистрируем
+    if db_user is None:
+        await register_user(user_id, event.from_user.username)
+        db_user = await get_cached_user(user_id)
 
     # Получаем данные для отображения в меню
-    role_key = get_user_role(user_id)
+    role_key = db_user.role if db_user else Role.client
     role_display = USER_ROLES.get(role_key, "Неизвестно")
-    orders_count = get_orders_count(user_id)
+    orders_count = await get_orders_count(user_id)
 
     # Формируем текст меню, используя Markdown для форматирования ID
     text = LEXICON["main_menu_text"].format(
@@ -47,23 +53,19 @@ async def show_main_menu(event: Message | CallbackQuery, state: FSMContext):
     if isinstance(event, Message):
         await event.answer(text, reply_markup=keyboard, parse_mode="Markdown")
     elif isinstance(event, CallbackQuery):
-        try:
-            # Указываем parse_mode="Markdown"
-            await event.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
-        except Exception:
-            # Игнорируем ошибку, если сообщение не изменилось
-            pass
+        # Если меню не изменилось, edit_text не отправит запрос
+        await edit_text(event.message, text, reply_markup=keyboard, parse_mode="Markdown")
         await event.answer()
 
 # Хэндлер на команду /start (обрабатывает регистрацию и реферальные ссылки)
 @router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext, bot: Bot):
+async def cmd_start(message: Message, state: FSMContext, outbox: Outbox, db_user: Optional[User] = None):
     args = message.text.split()
     referrer_id = None
     is_new_user = False
 
-    # Проверяем, есть ли пользователь в базе ДО регистрации
-    if not get_user_data(message.from_user.id):
+    # Проверяем, есть ли пользователь в базе ДО регистрации (db_user загружен middleware)
+    if db_user is None:
         is_new_user = True
         # Проверяем наличие аргументов (для реферальной ссылки)
         if len(args) > 1:
@@ -77,34 +79,31 @@ async def cmd_start(message: Message, state: FSMContext, bot: Bot):
                 pass
 
     # Регистрируем пользователя. Функция вернет ID реферера, если он был присвоен.
-    assigned_referrer_id = register_user(message.from_user.id, message.from_user.username, referrer_id if is_new_user else None)
+    assigned_referrer_id = await register_user(message.from_user.id, message.from_user.username, referrer_id if is_new_user else None)
 
     # Если пользователь новый и ему был присвоен реферер, отправляем уведомление
     if is_new_user and assigned_referrer_id:
-        try:
-            new_ref_username = f"@{message.from_user.username}" if message.from_user.username else f"ID: `{message.from_user.id}`"
-            await bot.send_message(
-                assigned_referrer_id,
-                LEXICON["new_referral_notification"].format(new_referral_info=new_ref_username),
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            # Логируем ошибку, если не смогли уведомить
-            print(f"Failed to notify referrer {assigned_referrer_id}: {e}")
+        new_ref_username = f"@{message.from_user.username}" if message.from_user.username else f"ID: `{message.from_user.id}`"
+        # Ошибки доставки логирует очередь отправки
+        outbox.send_message(
+            assigned_referrer_id,
+            LEXICON["new_referral_notification"].format(new_referral_info=new_ref_username),
+            parse_mode="Markdown"
+        )
 
 
-    # Показываем главное меню
-    await show_main_menu(message, state)
+    # Показываем главное меню (register_user сбрасывает кеш, если что-то изменил)
+    await show_main_menu(message, state, await get_cached_user(message.from_user.id))
 
 # Хэндлер на команду /menu и кнопку "Главное меню" (если бы она была не Inline)
 @router.message(Command("menu"))
-async def cmd_menu(message: Message, state: FSMContext):
-    await show_main_menu(message, state)
+async def cmd_menu(message: Message, state: FSMContext, db_user: Optional[User] = None):
+    await show_main_menu(message, state, db_user)
 
 # Хэндлер для кнопки "Назад в главное меню"
 @router.callback_query(F.data == "back_to_main_menu")
-async def back_to_main_menu(callback: CallbackQuery, state: FSMContext):
-    await show_main_menu(callback, state)
+async def back_to_main_menu(callback: CallbackQuery, state: FSMContext, db_user: Optional[User] = None):
+    await show_main_menu(callback, state, db_user)
 
 # Хэндлер для кнопки "Создать заявку" (/task)
 @router.message(Command("task"))
@@ -121,7 +120,7 @@ async def create_task_handler(event: Message | CallbackQuery, state: FSMContext)
     if isinstance(event, Message):
         await event.answer(text, reply_markup=keyboard)
     elif isinstance(event, CallbackQuery):
-        await event.message.edit_text(text, reply_markup=keyboard)
+        await edit_text(event.message, text, reply_markup=keyboard)
         await event.answer()
 
 # --- Логика раздела "Мои заказы" ---
@@ -130,7 +129,7 @@ async def create_task_handler(event: Message | CallbackQuery, state: FSMContext)
 @router.callback_query(F.data == "menu_my_cases")
 async def my_cases_handler(event: Message | CallbackQuery):
     user_id = event.from_user.id
-    orders, total_pages = get_user_orders(user_id, page=1)
+    orders, total_pages = await get_user_orders(user_id)
 
     text = LEXICON["my_cases_title"]
     keyboard = create_my_orders_keyboard(orders, total_pages, current_page=1)
@@ -138,19 +137,19 @@ async def my_cases_handler(event: Message | CallbackQuery):
     if isinstance(event, Message):
         await event.answer(text, reply_markup=keyboard)
     elif isinstance(event, CallbackQuery):
-        await event.message.edit_text(text, reply_markup=keyboard)
+        await edit_text(event.message, text, reply_markup=keyboard)
         await event.answer()
 
-@router.callback_query(F.data.startswith("orders_page_"))
-async def process_orders_pagination(callback: CallbackQuery):
-    page = int(callback.data.split("_")[-1])
+@router.callback_query(MyOrdersPage.filter())
+async def process_orders_pagination(callback: CallbackQuery, callback_data: MyOrdersPage):
+    page = callback_data.page
     user_id = callback.from_user.id
-    orders, total_pages = get_user_orders(user_id, page=page)
+    orders, total_pages = await get_user_orders(user_id, cursor=callback_data.cursor, backward=callback_data.backward)
 
     text = LEXICON["my_cases_title"]
     keyboard = create_my_orders_keyboard(orders, total_pages, current_page=page)
 
-    await callback.message.edit_text(text, reply_markup=keyboard)
+    await edit_text(callback.message, text, reply_markup=keyboard)
     await callback.answer()
 
 
@@ -173,7 +172,7 @@ async def referral_handler(event: Message | CallbackQuery, bot: Bot):
         await event.answer(text, reply_markup=keyboard, parse_mode="Markdown")
     elif isinstance(event, CallbackQuery):
         # Указываем parse_mode="Markdown"
-        await event.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
+        await edit_text(event.message, text, reply_markup=keyboard, parse_mode="Markdown")
         await event.answer()
 
 # --- Логика раздела "Мои рефералы" ---
@@ -181,7 +180,7 @@ async def referral_handler(event: Message | CallbackQuery, bot: Bot):
 @router.callback_query(F.data == "referral_my_referrals")
 async def my_referrals_handler(callback: CallbackQuery):
     user_id = callback.from_user.id
-    referrals, total_pages = get_referrals(user_id, page=1)
+    referrals, total_pages = await get_referrals(user_id)
 
     if not referrals:
         await callback.answer(LEXICON["no_referrals_yet"], show_alert=True)
@@ -193,18 +192,18 @@ async def my_referrals_handler(callback: CallbackQuery):
         text_lines.append(f"{i}. {display_name}")
 
     text = "\n".join(text_lines)
-    keyboard = create_referrals_keyboard(current_page=1, total_pages=total_pages)
+    keyboard = create_referrals_keyboard(referrals, total_pages, current_page=1)
     
     # Отправляем сообщение в чат вместо alert
-    await callback.message.edit_text(text, reply_markup=keyboard)
+    await edit_text(callback.message, text, reply_markup=keyboard)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("ref_page_"))
-async def process_referrals_pagination(callback: CallbackQuery):
-    page = int(callback.data.split("_")[-1])
+@router.callback_query(ReferralsPage.filter())
+async def process_referrals_pagination(callback: CallbackQuery, callback_data: ReferralsPage):
+    page = callback_data.page
     user_id = callback.from_user.id
-    referrals, total_pages = get_referrals(user_id, page=page)
+    referrals, total_pages = await get_referrals(user_id, callback_data.cursor, callback_data.backward)
 
     text_lines = [LEXICON["my_referrals_title"]]
     start_index = (page - 1) * 10 + 1 # 10 рефералов на странице
@@ -213,7 +212,7 @@ async def process_referrals_pagination(callback: CallbackQuery):
         text_lines.append(f"{i}. {display_name}")
 
     text = "\n".join(text_lines)
-    keyboard = create_referrals_keyboard(current_page=page, total_pages=total_pages)
+    keyboard = create_referrals_keyboard(referrals, total_pages, current_page=page)
     
-    await callback.message.edit_text(text, reply_markup=keyboard)
+    await edit_text(callback.message, text, reply_markup=keyboard)
     await callback.answer()
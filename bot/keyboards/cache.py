@@ -0,0 +1,66 @@
+from functools import wraps
+from typing import Callable
+
+from aiogram.types import InlineKeyboardMarkup
+from cachetools import LRUCache
+
+# Кеш готовых клавиатур.
+#
+# Сборка InlineKeyboardMarkup через InlineKeyboardBuilder создает десятки
+# pydantic-моделей, а клавиатуры меню одинаковы для всех пользователей.
+# - @static_keyboard: клавиатура без параметров, собирается один раз
+#   (при старте бота в warm_keyboard_cache() или при первом запросе);
+# - @cached_keyboard: клавиатура с хешируемыми параметрами (роль, страница,
+#   ID заказа...), хранится в общем LRU-кеше ограниченного размера.
+# Клавиатуры со списками заказов зависят от данных и не кешируются.
+#
+# Закешированная разметка общая для всех запросов - изменять ее нельзя.
+# Тексты и списки, из которых собираются клавиатуры (FSM_SERVICES,
+# ORDER_STATUSES, BUTTONS в bot/lexicon/lexicon_ru.py), - константы модуля:
+# они задаются при импорте и обычно во время работы не меняются. Если их
+# все же изменить на ходу, нужно вызвать invalidate_keyboard_cache() -
+# иначе пользователи продолжат получать клавиатуры со старыми текстами.
+
+KEYBOARD_CACHE_SIZE = 1024
+
+_static_builders: list[Callable[[], InlineKeyboardMarkup]] = []
+_static_markups: dict[Callable, InlineKeyboardMarkup] = {}
+_markups: LRUCache = LRUCache(maxsize=KEYBOARD_CACHE_SIZE)
+
+
+def static_keyboard(builder: Callable[[], InlineKeyboardMarkup]) -> Callable[[], InlineKeyboardMarkup]:
+    _static_builders.append(builder)
+
+    @wraps(builder)
+    def wrapper() -> InlineKeyboardMarkup:
+        markup = _static_markups.get(builder)
+        if markup is None:
+            markup = _static_markups[builder] = builder()
+        return markup
+
+    return wrapper
+
+
+def cached_keyboard(builder: Callable[..., InlineKeyboardMarkup]) -> Callable[..., InlineKeyboardMarkup]:
+    @wraps(builder)
+    def wrapper(*args, **kwargs) -> InlineKeyboardMarkup:
+        key = (builder, args, tuple(sorted(kwargs.items()))) if kwargs else (builder, args)
+        markup = _markups.get(key)
+        if markup is None:
+            markup = _markups[key] = builder(*args, **kwargs)
+        return markup
+
+    return wrapper
+
+
+def warm_keyboard_cache() -> None:
+    """Собирает все статические клавиатуры заранее (вызывается при старте бота)."""
+    for builder in _static_builders:
+        _static_markups[builder] = builder()
+
+
+def invalidate_keyboard_cache() -> None:
+    """Сбрасывает кеш клавиатур и пересобирает статические клавиатуры."""
+    _static_markups.clear()
+    _markups.clear()
+    warm_keyboard_cache()
@@ -0,0 +1,101 @@
+from enum import IntEnum
+from typing import Optional
+
+from aiogram.filters.callback_data import CallbackData
+
+# Схема callback_data inline-кнопок с параметрами.
+#
+# Кнопки с ID заказа, страницей, курсором или статусом упаковываются
+# фабриками CallbackData в строку "<код>:<поле>:<поле>..." (bool - "0"/"1",
+# None - пустая строка). Код действия - короткое число, поэтому в лимите
+# Telegram в 64 байта остается место для курсоров и состояния выбора.
+# Хэндлеры регистрируются через <Фабрика>.filter() и получают уже разобранный
+# объект в параметре callback_data - без split("_") и магических индексов.
+#
+# Коды не меняются и не переиспользуются: на отправленных ранее сообщениях
+# остаются кнопки со старыми кодами. Кнопки без параметров ("menu_admin",
+# "bulk_clear", ...) остаются обычными строками.
+# Выведенные из употребления коды: "3" (страница рефералов по номеру).
+
+
+class OrderAction(IntEnum):
+    """Действия с заказом в админ-панели."""
+    view = 1
+    change_status = 2
+    set_name = 3
+
+
+# --- Клиент ---
+
+class MyOrdersPage(CallbackData, prefix="1"):
+    """Страница "Мои заказы". cursor - ID граничного заказа текущей страницы."""
+    page: int
+    backward: bool
+    cursor: str
+
+
+class ClientOrder(CallbackData, prefix="2"):
+    """Заказ в списке "Мои заказы"."""
+    order_id: str
+
+
+class ReferralsPage(CallbackData, prefix="13"):
+    """Страница списка рефералов. cursor - ID граничного реферала текущей страницы."""
+    page: int
+    backward: bool
+    cursor: int
+
+
+# --- Админ-панель: заказы ---
+
+class AdminOrdersPage(CallbackData, prefix="4"):
+    """Страница списка всех заказов. cursor - как в MyOrdersPage."""
+    page: int
+    backward: bool
+    cursor: str
+
+
+class OrderFilter(CallbackData, prefix="5"):
+    """Фильтр списка заказов по статусу (None - все заказы)."""
+    status: Optional[str] = None
+
+
+class OrderSelect(CallbackData, prefix="6"):
+    """Отметка заказа для массовых действий."""
+    order_id: str
+
+
+class BulkStatus(CallbackData, prefix="7"):
+    """Новый статус для отмеченных заказов."""
+    status: str
+
+
+class SearchPage(CallbackData, prefix="8"):
+    """Страница результатов поиска заказов."""
+    page: int
+
+
+class AdminOrder(CallbackData, prefix="9"):
+    """Просмотр заказа и переход к изменению статуса или названия."""
+    action: OrderAction
+    order_id: str
+
+
+class SetOrderStatus(CallbackData, prefix="10"):
+    """Выбор нового статуса заказа."""
+    order_id: str
+    status: str
+
+
+# --- Админ-панель: пользователи ---
+
+class AdminUsersPage(CallbackData, prefix="11"):
+    """Страница списка пользователей. cursor - ID граничного пользователя."""
+    page: int
+    backward: bool
+    cursor: int
+
+
+class UserRoleFilter(CallbackData, prefix="12"):
+    """Фильтр списка пользователей по роли (None - все роли)."""
+    role: Optional[str] = None
@@ -2,9 +2,11 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardMarkup
 # Импортируем FSM_SERVICES для динамического создания кнопок
 from bot.lexicon.lexicon_ru import BUTTONS, FSM_SERVICES
+from bot.keyboards.cache import static_keyboard, cached_keyboard
 
 # Клавиатуры, используемые в FSM для создания заявки.
 
+@static_keyboard
 def get_service_choice_keyboard() -> InlineKeyboardMarkup:
     """Динамически создает клавиатуру выбора основной услуги."""
     builder = InlineKeyboardBuilder()
@@ -18,6 +20,7 @@ def get_service_choice_keyboard() -> InlineKeyboardMarkup:
     builder.adjust(1) # По одной кнопке в ряд
     return builder.as_markup()
 
+@cached_keyboard
 def get_subservice_choice_keyboard(service_key: str) -> InlineKeyboardMarkup:
     """Динамически создает клавиатуру выбора подуслуги для конкретной услуги."""
     builder = InlineKeyboardBuilder()
@@ -1,8 +1,15 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder, InlineKeyboardButton
 from aiogram.types import InlineKeyboardMarkup
-from bot.lexicon.lexicon_ru import BUTTONS, LEXICON, ORDER_STATUSES
+from aiogram.filters.callback_data import CallbackData
+from bot.lexicon.lexicon_ru import BUTTONS, LEXICON, ORDER_STATUSES, USER_ROLES
+from bot.keyboards.cache import static_keyboard, cached_keyboard
+from bot.keyboards.callbacks import (
+    MyOrdersPage, ClientOrder, ReferralsPage, AdminOrdersPage, OrderFilter, OrderSelect, BulkStatus,
+    SearchPage, AdminOrder, OrderAction, SetOrderStatus, AdminUsersPage, UserRoleFilter
+)
 from math import ceil
 
+@cached_keyboard
 def create_main_menu_keyboard(user_role: str) -> InlineKeyboardMarkup:
     """Создает клавиатуру главного меню."""
     builder = InlineKeyboardBuilder()
@@ -25,6 +32,7 @@ def create_main_menu_keyboard(user_role: str) -> InlineKeyboardMarkup:
 
     return builder.as_markup()
 
+@static_keyboard
 def create_referral_menu_keyboard() -> InlineKeyboardMarkup:
     """Создает клавиатуру реферального меню."""
     builder = InlineKeyboardBuilder()
@@ -33,29 +41,84 @@ def create_referral_menu_keyboard() -> InlineKeyboardMarkup:
     builder.adjust(1)
     return builder.as_markup()
 
+@static_keyboard
 def create_admin_menu_keyboard() -> InlineKeyboardMarkup:
     """Создает клавиатуру админ-панели."""
     builder = InlineKeyboardBuilder()
     builder.button(text=BUTTONS["admin_list_users"], callback_data="admin_list_users")
     builder.button(text=BUTTONS["admin_all_orders"], callback_data="admin_all_orders")
+    builder.button(text=BUTTONS["admin_search_orders"], callback_data="admin_search")
+    builder.button(text=BUTTONS["admin_broadcast"], callback_data="admin_broadcast")
     # Кнопка выдачи прав (доступ контролируется фильтром в хэндлере)
     builder.button(text=BUTTONS["admin_grant"], callback_data="admin_grant")
     builder.button(text=BUTTONS["back_to_main_menu"], callback_data="back_to_main_menu")
     builder.adjust(1)
     return builder.as_markup()
 
+@static_keyboard
 def create_back_to_admin_keyboard() -> InlineKeyboardMarkup:
     """Кнопка назад в админ-меню."""
     builder = InlineKeyboardBuilder()
     builder.button(text=BUTTONS["back"], callback_data="menu_admin")
     return builder.as_markup()
 
+@static_keyboard
 def create_grant_admin_keyboard() -> InlineKeyboardMarkup:
     """Кнопка назад в админ-меню для процесса выдачи прав."""
     builder = InlineKeyboardBuilder()
     builder.button(text=BUTTONS["back_to_admin_menu"], callback_data="menu_admin")
     return builder.as_markup()
 
+@static_keyboard
+def create_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Подтверждение запуска рассылки."""
+    builder = InlineKeyboardBuilder()
+    builder.button(text=BUTTONS["broadcast_send"], callback_data="broadcast_confirm")
+    builder.button(text=BUTTONS["back_to_admin_menu"], callback_data="menu_admin")
+    builder.adjust(1)
+    return builder.as_markup()
+
+@cached_keyboard
+def create_broadcast_progress_keyboard(running: bool) -> InlineKeyboardMarkup:
+    """Клавиатура сообщения с прогрессом рассылки."""
+    builder = InlineKeyboardBuilder()
+    if running:
+        builder.button(text=BUTTONS["broadcast_refresh"], callback_data="admin_broadcast")
+        builder.button(text=BUTTONS["broadcast_cancel"], callback_data="broadcast_cancel")
+    builder.button(text=BUTTONS["back_to_admin_menu"], callback_data="menu_admin")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+def create_cursor_pagination_buttons(
+    page_callback: type[CallbackData], orders: list, total_pages: int, current_page: int, key: str = "order_id"
+) -> list[InlineKeyboardButton]:
+    """
+    Кнопки пагинации по курсору.
+    page_callback - фабрика с полями page, backward и cursor (ID граничной записи текущей страницы).
+    """
+    pagination_buttons = []
+    if current_page > 1 and orders:
+        pagination_buttons.append(
+            InlineKeyboardButton(
+                text=BUTTONS["prev_page"],
+                callback_data=page_callback(page=current_page - 1, backward=True, cursor=orders[0][key]).pack()
+            )
+        )
+
+    pagination_buttons.append(
+        InlineKeyboardButton(text=f"{current_page}/{total_pages}", callback_data="dummy_page_display")
+    )
+
+    if current_page < total_pages and orders:
+        pagination_buttons.append(
+            InlineKeyboardButton(
+                text=BUTTONS["next_page"],
+                callback_data=page_callback(page=current_page + 1, backward=False, cursor=orders[-1][key]).pack()
+            )
+        )
+    return pagination_buttons
+
 
 def create_my_orders_keyboard(orders: list, total_pages: int, current_page: int = 1) -> InlineKeyboardMarkup:
     """Создает клавиатуру для списка заказов с пагинацией."""
@@ -67,51 +130,23 @@ def create_my_orders_keyboard(orders: list, total_pages: int, current_page: int
             status_display = ORDER_STATUSES.get(order['status'], order['status'])
             order_name = order.get('name') or f"Заказ #{order['order_id']}"
             order_text = f"{order_name} - {status_display}"
-            builder.button(text=order_text, callback_data=f"view_order_{order['order_id']}")
+            builder.button(text=order_text, callback_data=ClientOrder(order_id=order['order_id']))
         builder.adjust(1)
 
     # Логика пагинации
     if total_pages > 1:
-        pagination_buttons = []
-        if current_page > 1:
-            pagination_buttons.append(
-                InlineKeyboardButton(text=BUTTONS["prev_page"], callback_data=f"orders_page_{current_page - 1}")
-            )
-        
-        pagination_buttons.append(
-            InlineKeyboardButton(text=f"{current_page}/{total_pages}", callback_data="dummy_page_display")
-        )
-
-        if current_page < total_pages:
-            pagination_buttons.append(
-                InlineKeyboardButton(text=BUTTONS["next_page"], callback_data=f"orders_page_{current_page + 1}")
-            )
-        builder.row(*pagination_buttons)
+        builder.row(*create_cursor_pagination_buttons(MyOrdersPage, orders, total_pages, current_page))
 
     builder.row(InlineKeyboardButton(text=BUTTONS["back_to_main_menu"], callback_data="back_to_main_menu"))
     return builder.as_markup()
 
-def create_referrals_keyboard(current_page: int, total_pages: int) -> InlineKeyboardMarkup:
+def create_referrals_keyboard(referrals: list, total_pages: int, current_page: int = 1) -> InlineKeyboardMarkup:
     """Создает клавиатуру для пагинации списка рефералов."""
     builder = InlineKeyboardBuilder()
 
     if total_pages > 1:
-        pagination_buttons = []
-        if current_page > 1:
-            pagination_buttons.append(
-                InlineKeyboardButton(text=BUTTONS["prev_page"], callback_data=f"ref_page_{current_page - 1}")
-            )
-        
-        pagination_buttons.append(
-            InlineKeyboardButton(text=f"{current_page}/{total_pages}", callback_data="dummy_page_display")
-        )
+        builder.row(*create_cursor_pagination_buttons(ReferralsPage, referrals, total_pages, current_page, key="user_id"))
 
-        if current_page < total_pages:
-            pagination_buttons.append(
-                InlineKeyboardButton(text=BUTTONS["next_page"], callback_data=f"ref_page_{current_page + 1}")
-            )
-        builder.row(*pagination_buttons)
-    
     # Кнопка назад в реферальное меню
     builder.row(InlineKeyboardButton(text=BUTTONS["back"], callback_data="menu_referral"))
     return builder.as_markup()
@@ -119,60 +154,142 @@ def create_referrals_keyboard(current_page: int, total_pages: int) -> InlineKeyb
 
 # --- Новые клавиатуры для управления заказами ---
 
-def create_admin_orders_keyboard(total_pages: int, current_page: int, current_filter: str) -> InlineKeyboardMarkup:
-    """Создает клавиатуру для списка всех заказов с фильтрами и пагинацией."""
+def create_admin_orders_keyboard(
+    orders: list, total_pages: int, current_page: int, current_filter: str, selected: set[str] | None = None
+) -> InlineKeyboardMarkup:
+    """Создает клавиатуру для списка всех заказов с фильтрами, выбором заказов и пагинацией."""
     builder = InlineKeyboardBuilder()
-    
+    selected = selected or set()
+
+    # Отметки для массовых действий: номер кнопки совпадает с номером в списке
+    select_buttons = [
+        InlineKeyboardButton(
+            text=f"{'☑' if order['order_id'] in selected else '☐'} {i}",
+            callback_data=OrderSelect(order_id=order['order_id']).pack()
+        )
+        for i, order in enumerate(orders, 1)
+    ]
+    if select_buttons:
+        builder.row(*select_buttons, width=5)
+    if selected:
+        builder.row(InlineKeyboardButton(
+            text=BUTTONS["bulk_actions"].format(count=len(selected)), callback_data="bulk_actions"
+        ))
+
     # Кнопки фильтров
     filter_buttons = [
         InlineKeyboardButton(
             text=f"*{BUTTONS['filter_all']}*" if not current_filter else BUTTONS['filter_all'],
-            callback_data="admin_filter_all"
+            callback_data=OrderFilter().pack()
         )
     ]
     for status_key, status_name in ORDER_STATUSES.items():
         filter_buttons.append(
             InlineKeyboardButton(
                 text=f"*{status_name}*" if current_filter == status_key else status_name,
-                callback_data=f"admin_filter_{status_key}"
+                callback_data=OrderFilter(status=status_key).pack()
             )
         )
     builder.row(*filter_buttons, width=2)
 
     # Кнопки пагинации
+    if total_pages > 1:
+        builder.row(*create_cursor_pagination_buttons(AdminOrdersPage, orders, total_pages, current_page))
+    
+    builder.row(InlineKeyboardButton(text=BUTTONS["back_to_admin_menu"], callback_data="menu_admin"))
+    return builder.as_markup()
+
+
+def create_admin_users_keyboard(
+    users: list, total_pages: int, current_page: int, current_role: str | None, has_prefix: bool
+) -> InlineKeyboardMarkup:
+    """Создает клавиатуру списка пользователей с фильтрами, поиском, выгрузкой и пагинацией."""
+    builder = InlineKeyboardBuilder()
+
+    filter_buttons = [
+        InlineKeyboardButton(
+            text=f"*{BUTTONS['filter_all']}*" if not current_role else BUTTONS['filter_all'],
+            callback_data=UserRoleFilter().pack()
+        )
+    ]
+    for role_key, role_name in USER_ROLES.items():
+        filter_buttons.append(
+            InlineKeyboardButton(
+                text=f"*{role_name}*" if current_role == role_key else role_name,
+                callback_data=UserRoleFilter(role=role_key).pack()
+            )
+        )
+    builder.row(*filter_buttons, width=2)
+
+    search_buttons = [InlineKeyboardButton(text=BUTTONS["users_search"], callback_data="admin_users_search")]
+    if has_prefix:
+        search_buttons.append(
+            InlineKeyboardButton(text=BUTTONS["users_search_reset"], callback_data="admin_users_search_reset")
+        )
+    builder.row(*search_buttons)
+    builder.row(InlineKeyboardButton(text=BUTTONS["users_export"], callback_data="admin_users_export"))
+
+    if total_pages > 1:
+        builder.row(*create_cursor_pagination_buttons(AdminUsersPage, users, total_pages, current_page, key="user_id"))
+
+    builder.row(InlineKeyboardButton(text=BUTTONS["back_to_admin_menu"], callback_data="menu_admin"))
+    return builder.as_markup()
+
+
+@static_keyboard
+def create_bulk_actions_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура массовых действий с выбранными заказами."""
+    builder = InlineKeyboardBuilder()
+    for status_key, status_name in ORDER_STATUSES.items():
+        if status_key != "archived":
+            builder.button(text=status_name, callback_data=BulkStatus(status=status_key))
+    builder.button(text=BUTTONS["bulk_archive"], callback_data=BulkStatus(status="archived"))
+    builder.button(text=BUTTONS["bulk_clear"], callback_data="bulk_clear")
+    builder.button(text=BUTTONS["back_to_orders_list"], callback_data="admin_orders_current")
+    builder.adjust(2)
+    return builder.as_markup()
+
+
+@cached_keyboard
+def create_search_results_keyboard(total_pages: int, current_page: int) -> InlineKeyboardMarkup:
+    """Клавиатура для результатов поиска заказов с пагинацией."""
+    builder = InlineKeyboardBuilder()
     if total_pages > 1:
         pagination_buttons = []
         if current_page > 1:
             pagination_buttons.append(
-                InlineKeyboardButton(text=BUTTONS["prev_page"], callback_data=f"admin_orders_page_{current_page - 1}")
+                InlineKeyboardButton(text=BUTTONS["prev_page"], callback_data=SearchPage(page=current_page - 1).pack())
             )
         pagination_buttons.append(
             InlineKeyboardButton(text=f"{current_page}/{total_pages}", callback_data="dummy_page_display")
         )
         if current_page < total_pages:
             pagination_buttons.append(
-                InlineKeyboardButton(text=BUTTONS["next_page"], callback_data=f"admin_orders_page_{current_page + 1}")
+                InlineKeyboardButton(text=BUTTONS["next_page"], callback_data=SearchPage(page=current_page + 1).pack())
             )
         builder.row(*pagination_buttons)
-    
+
+    builder.row(InlineKeyboardButton(text=BUTTONS["admin_search_orders"], callback_data="admin_search"))
     builder.row(InlineKeyboardButton(text=BUTTONS["back_to_admin_menu"], callback_data="menu_admin"))
     return builder.as_markup()
 
 
+@cached_keyboard
 def create_order_management_keyboard(order_id: str) -> InlineKeyboardMarkup:
     """Клавиатура для управления конкретным заказом."""
     builder = InlineKeyboardBuilder()
-    builder.button(text=BUTTONS["change_status"], callback_data=f"manage_status_{order_id}")
-    builder.button(text=BUTTONS["set_name"], callback_data=f"manage_name_{order_id}")
+    builder.button(text=BUTTONS["change_status"], callback_data=AdminOrder(action=OrderAction.change_status, order_id=order_id))
+    builder.button(text=BUTTONS["set_name"], callback_data=AdminOrder(action=OrderAction.set_name, order_id=order_id))
     builder.button(text=BUTTONS["back_to_orders_list"], callback_data="admin_all_orders")
     builder.adjust(1)
     return builder.as_markup()
 
+@cached_keyboard
 def create_status_selection_keyboard(order_id: str) -> InlineKeyboardMarkup:
     """Клавиатура для выбора нового статуса заказа."""
     builder = InlineKeyboardBuilder()
     for status_key, status_name in ORDER_STATUSES.items():
-        builder.button(text=status_name, callback_data=f"set_status_{order_id}_{status_key}")
-    builder.button(text=BUTTONS["back"], callback_data=f"view_order_admin_{order_id}")
+        builder.button(text=status_name, callback_data=SetOrderStatus(order_id=order_id, status=status_key))
+    builder.button(text=BUTTONS["back"], callback_data=AdminOrder(action=OrderAction.view, order_id=order_id))
     builder.adjust(2)
     return builder.as_markup()
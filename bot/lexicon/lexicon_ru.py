@@ -11,7 +11,8 @@ ORDER_STATUSES: dict[str, str] = {
     "new": "Новый 🔵",
     "in_progress": "В работе 🔄",
     "completed": "Завершен ✅",
-    "cancelled": "Отменен ❌"
+    "cancelled": "Отменен ❌",
+    "archived": "В архиве 🗄️"
 }
 
 
@@ -121,16 +122,24 @@ LEXICON: dict[str, str] = {
     "fsm_finish": "✅ Спасибо! Ваша заявка #{order_id} принята. Мы скоро с вами свяжемся. Введите /menu для возврата.",
 
     # Шаблон уведомления о новой заявке
-    "new_application_header": "✅ *Новая заявка!* ID: `{order_id}`",
-    "new_application_client": "👤 *Клиент:* {user_info}",
-    "new_application_service": "▶️ *Услуга:* {service_category}",
-    "new_application_sub_service": "➡️ *Подуслуга:* {sub_service_category}",
+    "new_application_header": "✅ <b>Новая заявка!</b> ID: <code>{order_id}</code>",
+    "new_application_client": "👤 <b>Клиент:</b> {user_info}",
+    "new_application_service": "▶️ <b>Услуга:</b> {service_category}",
+    "new_application_sub_service": "➡️ <b>Подуслуга:</b> {sub_service_category}",
+    "new_applications_digest_header": "📬 <b>Новые заявки: {count}</b>",
 
 
     # Админ-панель
     "admin_menu_title": "🛠️ Админ. опции",
     "admin_only_main_can_grant": "Только Главный администратор может выдавать права.",
-    "admin_list_users_title": "👥 Список пользователей (Всего: {count}):\n\n",
+    "admin_users_title": "👥 Пользователи (Роль: {role}, найдено: {count})",
+    "admin_users_prefix_filter": "🔎 Ник начинается с: @{prefix}",
+    "admin_user_line": "{number}. ID: <code>{user_id}</code>, Ник: {username}, Роль: {role}",
+    "admin_no_users_found": "Пользователи не найдены.",
+    "admin_users_search_prompt": "Введите начало ника (username) пользователя:",
+    "admin_users_search_invalid": "❌ Ник может содержать только латинские буквы, цифры и _ (до 32 символов). Попробуйте еще раз:",
+    "admin_users_export_started": "⏳ Готовлю файл со списком пользователей...",
+    "admin_users_export_caption": "📄 Пользователи: {count}",
     "admin_grant_prompt": "Введите ID пользователя, которому хотите выдать права администратора:",
     "admin_grant_success": "✅ Пользователю {user_id} успешно выданы права администратора.",
     "admin_grant_invalid_id": "❌ Некорректный ID. Пожалуйста, введите число.",
@@ -158,6 +167,36 @@ LEXICON: dict[str, str] = {
     "admin_set_name_prompt": "Введите новое название для заказа <code>{order_id}</code>:",
     "admin_name_updated": "✅ Название заказа <code>{order_id}</code> изменено. Клиент уведомлен.",
     "notification_name_changed": "🔔 Вашему заказу <code>{order_id}</code> присвоено название: <b>{name}</b>.",
+    "notification_orders_updated": "🔔 Изменения по вашим заказам:",
+    "notification_order_line": "• <code>{order_id}</code>: <b>{status}</b>",
+    "notification_order_line_name": " (название: <b>{name}</b>)",
+    "notification_order_updated": "🔔 Ваш заказ <code>{order_id}</code> обновлен.\nНазвание: <b>{name}</b>\nСтатус: <b>{status}</b>",
+    "admin_selected_orders": "☑️ Выбрано заказов: {count}",
+    "admin_bulk_prompt": "⚙️ Выбрано заказов: {count}. Выберите новый статус или отправьте заказы в архив:",
+    "admin_bulk_nothing_selected": "Сначала отметьте заказы в списке.",
+    "admin_bulk_status_updated": "✅ Статус изменен у заказов: {count} → {status}. Клиенты уведомлены.",
+    "admin_search_prompt": "Введите слова для поиска по названиям, услугам и ответам анкет:",
+    "admin_search_results_title": "🔍 Результаты поиска «{query}» (найдено: {count})",
+    "admin_search_nothing_found": "🔍 По запросу «{query}» ничего не найдено. Попробуйте другие слова:",
+
+    # --- Рассылка (Админка) ---
+    "broadcast_prompt": "📣 Отправьте текст рассылки. Сообщение получат все пользователи бота (форматирование сохранится).",
+    "broadcast_confirm": "📣 <b>Предпросмотр рассылки</b>\n\n{text}\n\n--------------------\nОтправить это сообщение всем пользователям?",
+    "broadcast_already_running": "Рассылка уже идет. Дождитесь окончания или отмените ее.",
+    "broadcast_not_running": "Сейчас нет активной рассылки.",
+    "broadcast_progress": (
+        "📣 <b>Рассылка: {status}</b>\n\n"
+        "Обработано: {processed} из {total}\n"
+        "✅ Доставлено: {delivered}\n"
+        "🚫 Заблокировали бота: {blocked}\n"
+        "⚠️ Ошибки: {failed}"
+    ),
+    "broadcast_status_running": "идет",
+    "broadcast_status_finished": "завершена",
+    "broadcast_status_cancelled": "отменена",
+
+    # Защита от флуда
+    "throttling_warning": "⏳ Слишком много запросов. Подождите пару секунд.",
 
     # Внешние ссылки
     "faq_url": "https://telegra.ph/FAQ-Example-09-16",
@@ -178,12 +217,23 @@ BUTTONS: dict[str, str] = {
     "my_referrals": "Мои рефералы 📊",
     "admin_list_users": "Список пользователей 👥",
     "admin_all_orders": "Все заказы 📦",
+    "admin_search_orders": "Поиск заказов 🔍",
+    "admin_broadcast": "Рассылка 📣",
     "admin_grant": "Выдать админку 🛠️",
+    "broadcast_send": "Отправить всем ✅",
+    "broadcast_cancel": "Отменить рассылку ⛔",
+    "broadcast_refresh": "Обновить 🔄",
     "next_page": "Вперед ➡️",
     "prev_page": "⬅️ Назад",
     "filter_all": "Все",
     "change_status": "Изменить статус ✏️",
     "set_name": "Задать название 📝",
     "back_to_orders_list": "⬅️ К списку заказов",
+    "bulk_actions": "Действия с выбранными ({count}) ⚙️",
+    "bulk_archive": "В архив 🗄️",
+    "bulk_clear": "Снять выбор ✖️",
+    "users_search": "Поиск по нику 🔎",
+    "users_search_reset": "Сбросить поиск ✖️",
+    "users_export": "Выгрузить CSV 📄",
 
 }
@@ -1,14 +1,29 @@
 import asyncio
 import logging
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher, F
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import ErrorEvent
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from bot.config import config
 from bot.handlers import user_handlers, admin_handlers, fsm_handlers
+from bot.models.data_store import init_storage, close_storage
+from bot.keyboards.cache import warm_keyboard_cache
 # Импортируем наш новый middleware
 from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.middlewares.callback_router import CallbackRouter
+from bot.middlewares.user_context import UserContextMiddleware
+from bot.models.fsm_storage import SQLiteStorage
+from bot.services.throttle_store import MemoryThrottleStore, SQLiteThrottleStore
+from bot.services.metrics import metrics, log_metrics_periodically
+from bot.services.outbox import Outbox
+from bot.services.broadcast import Broadcaster
+from bot.services.group_digest import GroupDigest
+from bot.services.order_notifications import OrderNotificationDebouncer
+from bot.services.update_queue import ChatOrderedUpdateProcessor
+from bot.services.admission import AdmissionController
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,25 +37,158 @@ async def on_error(event: ErrorEvent, bot: Bot):
     # Можно добавить уведомление администратору о критической ошибке
     # await bot.send_message(config.MAIN_ADMIN_ID, "Произошла критическая ошибка в боте!")
 
+# Отдает метрики процесса в формате Prometheus (только в режиме вебхука)
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+async def run_polling(bot: Bot, dp: Dispatcher, processor: ChatOrderedUpdateProcessor | None):
+    await bot.delete_webhook(drop_pending_updates=True)
+    # С очередью апдейты уже обрабатываются воркерами, отдельные задачи не нужны
+    await dp.start_polling(bot, handle_as_tasks=processor is None)
+
+async def run_webhook(bot: Bot, dp: Dispatcher, processor: ChatOrderedUpdateProcessor | None):
+    async def on_startup(bot: Bot):
+        await bot.set_webhook(
+            url=config.WEBHOOK_URL + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True,
+        )
+        logger.info(f"Webhook set to {config.WEBHOOK_URL}{config.WEBHOOK_PATH}")
+
+    dp.startup.register(on_startup)
+
+    app = web.Application()
+    # Без очереди чатов Telegram сразу получает 200, апдейт обрабатывается в фоне.
+    # С очередью апдейт ставится в нее прямо в запросе - так сохраняется порядок
+    # апдейтов, - и 200 уходит после постановки. Обычно это быстро, но запрос
+    # может ждать: классификация апдейта (AdmissionController) читает роль
+    # пользователя (из кеша, при промахе - из хранилища), а при
+    # UPDATE_QUEUE_LIMIT апдейтах в очереди запрос ждет освобождения места.
+    # Это намеренное обратное давление: Telegram держит не больше
+    # max_connections запросов к вебхуку и не шлет новые, пока бот не
+    # разгрузится. Если ожидание дольше таймаута Telegram, апдейт будет
+    # доставлен повторно, поэтому лимит очереди нужно выбирать так, чтобы
+    # очередь разбиралась за секунды (лишние нажатия при перегрузке
+    # отбрасываются до ожидания, см. bot/services/admission.py).
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.WEBHOOK_SECRET,
+        handle_in_background=processor is None,
+    ).register(app, path=config.WEBHOOK_PATH)
+    app.router.add_get("/metrics", metrics_handler)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBAPP_HOST, config.WEBAPP_PORT, reuse_port=config.WEBAPP_REUSE_PORT or None)
+    await site.start()
+    logger.info(f"Webhook server listening on {config.WEBAPP_HOST}:{config.WEBAPP_PORT}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # Вебхук не снимаем: его могут обслуживать другие процессы
+        await runner.cleanup()
+        await bot.session.close()
+
 async def main():
     logger.info("Starting bot...")
 
+    # Подключаем хранилище данных (память или SQLite, см. config.STORAGE_BACKEND)
+    await init_storage()
+
     bot = Bot(token=config.BOT_TOKEN)
-    storage = MemoryStorage()
+    # Состояния FSM и лимиты антифлуда. В SQLite они общие для нескольких
+    # процессов бота (например, вебхук с WEBAPP_REUSE_PORT)
+    if config.STATE_STORAGE == "sqlite":
+        storage = SQLiteStorage(config.STATE_SQLITE_PATH)
+        throttle_store = SQLiteThrottleStore(config.STATE_SQLITE_PATH)
+        await storage.connect()
+        await throttle_store.connect()
+    else:
+        storage = MemoryStorage()
+        throttle_store = MemoryThrottleStore()
     dp = Dispatcher(storage=storage)
 
     # Регистрируем глобальный обработчик ошибок
     dp.errors.register(on_error, F.exception)
 
-    # Регистрируем middleware для защиты от флуда на все сообщения
-    dp.message.middleware(ThrottlingMiddleware())
+    # Регистрируем middleware для защиты от флуда на сообщения и нажатия кнопок
+    # (один экземпляр - общий лимит пользователя)
+    throttling = ThrottlingMiddleware(
+        config.THROTTLE_RATE, config.THROTTLE_BURST, config.THROTTLE_NOTIFY, store=throttle_store
+    )
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+
+    # Запись пользователя (роль) загружается один раз на апдейт и передается
+    # фильтрам и хэндлерам аргументом db_user. Должен стоять раньше CallbackRouter.
+    dp.message.outer_middleware(UserContextMiddleware())
+    dp.callback_query.outer_middleware(UserContextMiddleware())
 
     dp.include_router(fsm_handlers.router)
     dp.include_router(admin_handlers.router)
     dp.include_router(user_handlers.router)
 
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    # Нажатия на inline-кнопки направляются в хэндлер по индексу, без перебора
+    # фильтров всех роутеров (индекс строится по уже подключенным роутерам)
+    dp.callback_query.outer_middleware(CallbackRouter(dp))
+
+    # Статические клавиатуры собираем один раз, до первого апдейта
+    warm_keyboard_cache()
+
+    # Параллельная обработка апдейтов разных чатов с сохранением порядка внутри чата.
+    # При перегрузке апдейты обрабатываются по приоритету (админы, анкеты,
+    # новые сессии, навигация), а нажатия кнопок отбрасываются первыми.
+    processor = None
+    if config.UPDATE_CONCURRENCY > 0:
+        processor = ChatOrderedUpdateProcessor(
+            dp, config.UPDATE_CONCURRENCY, config.UPDATE_QUEUE_LIMIT,
+            admission=AdmissionController(config.ADMISSION_DELAY_THRESHOLD)
+        )
+        dp.update.outer_middleware(processor)
+        dp.startup.register(processor.start)
+        dp.shutdown.register(processor.stop)
+
+    # Очередь исходящих уведомлений; хэндлеры получают ее аргументом outbox.
+    # Останавливается после очереди апдейтов, чтобы отправить их уведомления.
+    outbox = Outbox(bot, global_rate=config.OUTBOX_GLOBAL_RATE, max_retries=config.OUTBOX_MAX_RETRIES)
+    dp["outbox"] = outbox
+    dp.startup.register(outbox.start)
+
+    # Сводки о новых заявках для группового чата
+    group_digest = GroupDigest(outbox, config.GROUP_CHAT_ID, config.GROUP_DIGEST_WINDOW, parse_mode="HTML")
+    dp["group_digest"] = group_digest
+
+    # Уведомления клиентов об изменении заказов (с объединением частых изменений)
+    order_notifications = OrderNotificationDebouncer(outbox, config.ORDER_NOTIFY_DELAY)
+    dp["order_notifications"] = order_notifications
+
+    # Рассылка: незавершенная рассылка продолжается после перезапуска
+    broadcaster = Broadcaster(bot, outbox, config.BROADCAST_CHECKPOINT)
+    dp["broadcaster"] = broadcaster
+    dp.startup.register(broadcaster.resume)
+    dp.shutdown.register(broadcaster.stop)
+    dp.shutdown.register(group_digest.stop)
+    dp.shutdown.register(order_notifications.stop)
+    dp.shutdown.register(outbox.stop)
+
+    metrics_task = None
+    if config.METRICS_LOG_INTERVAL > 0:
+        metrics_task = asyncio.create_task(log_metrics_periodically(config.METRICS_LOG_INTERVAL))
+
+    try:
+        if config.RUN_MODE == "webhook":
+            await run_webhook(bot, dp, processor)
+        else:
+            await run_polling(bot, dp, processor)
+    finally:
+        if metrics_task:
+            metrics_task.cancel()
+        await storage.close()
+        await throttle_store.close()
+        await close_storage()
 
 if __name__ == "__main__":
     try:
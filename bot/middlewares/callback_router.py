@@ -0,0 +1,168 @@
+import logging
+import operator
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Dispatcher, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.middlewares.manager import MiddlewareManager
+from aiogram.filters.callback_data import CallbackQueryFilter
+from aiogram.types import CallbackQuery
+from magic_filter.operations import CallOperation, ComparatorOperation, GetAttributeOperation
+
+logger = logging.getLogger(__name__)
+
+# Маршрутизация callback_query по индексу вместо перебора фильтров.
+#
+# aiogram проверяет хэндлеры по очереди во всех роутерах (fsm -> admin ->
+# user): нажатие обычного пользователя на "Мои заказы" проходит через фильтр
+# IsAdmin админ-роутера (запрос роли в хранилище) и все его F.data == ....
+#
+# Индекс строится по фильтрам уже зарегистрированных хэндлеров:
+# - F.data == "menu_admin"          -> точное совпадение;
+# - <Фабрика>.filter() (CallbackData) -> код действия до ":";
+# - F.data.startswith("service_")   -> префикс (словари по длинам префиксов);
+# - остальные хэндлеры проверяются для любого нажатия.
+# Кандидаты находятся несколькими поисками в словарях, и только для них
+# проверяются фильтры роутера (IsAdmin), состояния и самого хэндлера - в том
+# же порядке, что у aiogram, поэтому выбранный хэндлер не меняется.
+#
+# Middleware регистрируется на dp.callback_query.outer_middleware после всех
+# dp.include_router(). Если у вложенного роутера есть outer middleware для
+# callback_query, индекс отключается и работает обычная маршрутизация aiogram.
+
+CALLBACK_SEPARATOR = ":"
+
+
+@dataclass(slots=True)
+class CallbackRoute:
+    position: int  # Порядок проверки хэндлера в aiogram
+    router: Router
+    handler: HandlerObject
+    middlewares: list  # Inner middleware роутеров цепочки (как в TelegramEventObserver)
+
+
+def route_key(handler: HandlerObject) -> Optional[tuple[str, str]]:
+    """Определяет по фильтрам хэндлера, какие нажатия он может обработать: (вид, ключ) или None."""
+    for filter_object in handler.filters or ():
+        if isinstance(filter_object.callback, CallbackQueryFilter):
+            factory = filter_object.callback.callback_data
+            if factory.__separator__ == CALLBACK_SEPARATOR:
+                return "code", factory.__prefix__
+            continue
+        if filter_object.magic is None:
+            continue
+        operations = getattr(filter_object.magic, "_operations", ())
+        if not operations or not isinstance(operations[0], GetAttributeOperation) or operations[0].name != "data":
+            continue
+        if (
+            len(operations) == 2 and isinstance(operations[1], ComparatorOperation)
+            and operations[1].comparator is operator.eq and isinstance(operations[1].right, str)
+        ):
+            return "exact", operations[1].right
+        if (
+            len(operations) == 3 and isinstance(operations[1], GetAttributeOperation)
+            and operations[1].name == "startswith" and isinstance(operations[2], CallOperation)
+            and len(operations[2].args) == 1 and isinstance(operations[2].args[0], str) and not operations[2].kwargs
+        ):
+            return "prefix", operations[2].args[0]
+    return None
+
+
+class CallbackRouter(BaseMiddleware):
+    def __init__(self, dispatcher: Dispatcher):
+        self.dispatcher = dispatcher
+        self.enabled = True
+        self.exact: dict[str, list[CallbackRoute]] = {}
+        self.codes: dict[str, list[CallbackRoute]] = {}
+        # длина префикса -> префикс -> хэндлеры
+        self.prefixes: dict[int, dict[str, list[CallbackRoute]]] = {}
+        self.always: list[CallbackRoute] = []
+        self.build()
+
+    def build(self) -> None:
+        """(Пере)строит индекс по текущим роутерам диспетчера."""
+        self.exact, self.codes, self.prefixes, self.always = {}, {}, {}, []
+        position = 0
+        # chain_tail - роутеры в порядке обхода aiogram (сам диспетчер, затем вложенные в глубину)
+        for router in self.dispatcher.chain_tail:
+            if router is not self.dispatcher and len(router.callback_query.outer_middleware):
+                logger.warning(f"Callback index disabled: router {router.name} has outer middleware")
+                self.enabled = False
+                return
+            middlewares = []
+            for parent in reversed(tuple(router.chain_head)):
+                middlewares.extend(parent.callback_query.middleware)
+            for handler in router.callback_query.handlers:
+                route = CallbackRoute(position, router, handler, middlewares)
+                position += 1
+                key = route_key(handler)
+                if key is None:
+                    self.always.append(route)
+                elif key[0] == "exact":
+                    self.exact.setdefault(key[1], []).append(route)
+                elif key[0] == "code":
+                    self.codes.setdefault(key[1], []).append(route)
+                else:
+                    self.prefixes.setdefault(len(key[1]), {}).setdefault(key[1], []).append(route)
+        self.enabled = True
+        logger.info(
+            f"Callback index: {sum(map(len, self.exact.values()))} exact, {sum(map(len, self.codes.values()))} "
+            f"callback data, {sum(len(routes) for by_prefix in self.prefixes.values() for routes in by_prefix.values())} "
+            f"prefix, {len(self.always)} unindexed handlers"
+        )
+
+    def candidates(self, data: str) -> list[CallbackRoute]:
+        """Хэндлеры, которые могут обработать нажатие, в порядке проверки aiogram."""
+        routes = [
+            *self.exact.get(data, ()),
+            *self.codes.get(data.partition(CALLBACK_SEPARATOR)[0], ()),
+            *self.always
+        ]
+        for length, by_prefix in self.prefixes.items():
+            routes.extend(by_prefix.get(data[:length], ()))
+        if len(routes) > 1:
+            routes.sort(key=lambda route: route.position)
+        return routes
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: dict[str, Any],
+    ) -> Any:
+        if not self.enabled or event.data is None:
+            return await handler(event, data)
+
+        # Результаты фильтров роутеров считаются один раз на нажатие
+        router_kwargs: dict[Router, Optional[dict[str, Any]]] = {}
+        for route in self.candidates(event.data):
+            kwargs = await self._check_router(route.router, event, data, router_kwargs)
+            if kwargs is None:
+                continue
+            kwargs = {**kwargs, "handler": route.handler}
+            result, kwargs = await route.handler.check(event, **kwargs)
+            if not result:
+                continue
+            try:
+                wrapped = MiddlewareManager.wrap_middlewares(route.middlewares, route.handler.call)
+                return await wrapped(event, kwargs)
+            except SkipHandler:
+                continue
+        return UNHANDLED
+
+    async def _check_router(
+        self, router: Router, event: CallbackQuery, data: dict[str, Any], cache: dict[Router, Optional[dict[str, Any]]]
+    ) -> Optional[dict[str, Any]]:
+        """Проверяет фильтры роутера и его родителей. Возвращает данные для хэндлера или None."""
+        if router in cache:
+            return cache[router]
+        parent = router.parent_router
+        kwargs = data if parent is None else await self._check_router(parent, event, data, cache)
+        if kwargs is not None:
+            result, kwargs = await router.callback_query.check_root_filters(event, **{**kwargs, "event_router": router})
+            if not result:
+                kwargs = None
+        cache[router] = kwargs
+        return kwargs
@@ -1,30 +1,94 @@
+import logging
+import time
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
-from aiogram.types import Message
-from cachetools import TTLCache
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from bot.lexicon.lexicon_ru import LEXICON
+from bot.services.metrics import metrics
+from bot.services.throttle_store import MemoryThrottleStore, ThrottleStore
+
+logger = logging.getLogger(__name__)
+
+# Защита от флуда: у каждого пользователя token bucket на burst токенов,
+# которые восполняются со скоростью rate в секунду. Сообщения и нажатия
+# кнопок тратят токены из одного бакета; стоимость хэндлера задается флагом:
+#     @router.message(..., flags={THROTTLING_COST_FLAG: 0.5})
+# (по умолчанию 1, больше burst не бывает). Частые короткие ответы проходят,
+# пока не кончится запас, а затем - со скоростью rate.
+#
+# Полный бакет ничего не помнит, поэтому раз в SWEEP_INTERVAL такие бакеты
+# удаляются: хранятся только пользователи, писавшие за последние
+# burst / rate секунд, и флуд не пропускается из-за вытеснения из кеша.
+# Бакеты хранятся в ThrottleStore: в памяти процесса или в SQLite, общем
+# для нескольких процессов бота (bot/services/throttle_store.py).
+#
+# Сообщения в состоянии FSM (ответы анкеты, ввод админа) не отбрасываются:
+# потерянный ответ сбил бы анкету, а пользователь не понял бы, что его нет.
+# Они тратят токены, но проходят и при пустом бакете; флудить ими долго
+# нельзя - каждый ответ продвигает анкету к концу. Отброшенное нажатие кнопки
+# всегда получает ответ (хотя бы пустой), иначе кнопка "висит" с часиками.
+#
+# Middleware регистрируется как inner (dp.message.middleware и
+# dp.callback_query.middleware) одним экземпляром - флаги хэндлера доступны
+# только после выбора хэндлера, а бакет общий для сообщений и кнопок.
+
+THROTTLING_COST_FLAG = "throttling_cost"
+SWEEP_INTERVAL = 60
+
 
-# Используем TTLCache для хранения истории запросов с временем жизни (TTL)
-# Ключ - user_id, значение - количество запросов
-# cachetools - легковесная библиотека, добавьте ее в requirements.txt
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, rate_limit: float = 0.7):
-        # rate_limit - минимально допустимый интервал между сообщениями (в секундах)
-        self.cache = TTLCache(maxsize=10_000, ttl=rate_limit)
+    def __init__(self, rate: float = 1.5, burst: float = 5, notify: bool = True, store: ThrottleStore | None = None):
+        self.rate = rate
+        self.burst = burst
+        # Один раз предупредить пользователя, что он слишком торопится
+        self.notify = notify
+        self.store = store or MemoryThrottleStore()
+        # Пользователи, уже получившие предупреждение (до первого обработанного апдейта)
+        self._warned: set[int] = set()
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL
 
     async def __call__(
         self,
-        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-        event: Message,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        # Проверяем, есть ли пользователь в кеше
-        if event.chat.id in self.cache:
-            # Если есть, значит, он отправляет сообщения слишком часто
-            # Игнорируем это сообщение и не передаем его дальше
-            return
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + SWEEP_INTERVAL
+            await self.store.sweep(self.rate, self.burst)
+            self._warned.clear()
+
+        cost = min(get_flag(data, THROTTLING_COST_FLAG, default=1), self.burst)
+        if await self.store.consume(user.id, cost, self.rate, self.burst):
+            self._warned.discard(user.id)
+            return await handler(event, data)
+
+        if isinstance(event, Message) and data.get("raw_state") is not None:
+            metrics.inc("throttling_exempt_total")
+            return await handler(event, data)
 
-        # Если пользователя нет в кеше, добавляем его
-        self.cache[event.chat.id] = None
+        # Пользователь отправляет сообщения слишком часто - апдейт не обрабатываем
+        metrics.inc("throttled_updates_total")
+        if self.notify and user.id not in self._warned:
+            self._warned.add(user.id)
+            await self._answer(event, LEXICON["throttling_warning"])
+        elif isinstance(event, CallbackQuery):
+            await self._answer(event)
 
-        # Передаем управление следующему обработчику
-        return await handler(event, data)
+    async def _answer(self, event: TelegramObject, text: str | None = None) -> None:
+        try:
+            # Для кнопки - всплывающее уведомление (или пустой ответ), для сообщения - ответ в чат
+            if isinstance(event, CallbackQuery):
+                await event.answer(text)
+            elif isinstance(event, Message) and text:
+                await event.answer(text)
+        except TelegramAPIError as e:
+            logger.warning(f"Failed to answer throttled update: {e}")
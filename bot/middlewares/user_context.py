@@ -0,0 +1,28 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User as TelegramUser
+
+from bot.models.data_store import get_cached_user
+
+# Запись пользователя из хранилища загружается один раз на апдейт и
+# передается фильтрам (IsAdmin, IsMainAdmin) и хэндлерам аргументом db_user.
+# Раньше роль запрашивалась каждым фильтром отдельно: нажатие кнопки
+# проверялось IsAdmin админ-роутера, потом IsMainAdmin и т.д.
+# db_user = None, если пользователь еще не зарегистрирован.
+#
+# Регистрируется как outer middleware для message и callback_query раньше
+# CallbackRouter: тот вызывает хэндлеры сам, и db_user уже должен быть в данных.
+
+
+class UserContextMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user: TelegramUser | None = data.get("event_from_user")
+        if from_user is not None and "db_user" not in data:
+            data["db_user"] = await get_cached_user(from_user.id)
+        return await handler(event, data)
@@ -1,168 +1,326 @@
-from typing import Optional, Any
+from typing import Optional, AsyncIterator
 from math import ceil
-import random
-import string
+import secrets
+from cachetools import TTLCache
 from bot.config import config
 from bot.lexicon.lexicon_ru import ORDER_STATUSES
+from bot.models.repository import BaseRepository
+from bot.models.memory_repository import MemoryRepository
+from bot.models.order_ids import OrderIdAllocator
+from bot.models.records import User, Order, Role, OrderStatus
+from bot.models.search import OrderSearchIndex
+from bot.services.order_render import invalidate_order, invalidate_user
 
-# Временные хранилища данных в памяти
-# TODO: Replace with DB logic (e.g., SQLAlchemy/TortoiseORM models)
+# Текущее хранилище данных. По умолчанию - в памяти (данные теряются при перезапуске).
+# Для сохранности данных - журнал со снимками (journal) или SQLite (sqlite).
+# Настоящее хранилище выбирается в init_storage() по config.STORAGE_BACKEND.
+repository: BaseRepository = MemoryRepository()
+# Генератор ID заказов; ключ перестановки хранится в хранилище вместе со счетчиком
+_order_id_allocator: Optional[OrderIdAllocator] = None
+# Полнотекстовый индекс заказов (в памяти процесса, строится при запуске).
+# Изменения этого процесса вносятся в индекс сразу, а заказы, добавленные или
+# переименованные другими процессами (общая база SQLite), подтягиваются перед
+# каждым поиском по номеру последнего учтенного изменения.
+search_index = OrderSearchIndex()
+_search_mark = 0
+SEARCH_REFRESH_BATCH = 1000
+# Короткий кеш записей пользователей для проверки ролей (middleware, фильтры IsAdmin).
+# Сбрасывается при изменении роли или username в этом процессе; изменения из
+# других процессов видны не позже чем через config.ROLE_CACHE_TTL секунд.
+USER_CACHE_SIZE = 10_000
+_user_cache: TTLCache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=config.ROLE_CACHE_TTL)
 
-# Структура пользователя: {user_id: {"username": str, "role": str, "referrer_id": int}}
-users_db: dict[int, dict[str, Any]] = {}
-# Структура заказа: {order_id: {"user_id": int, "status": str, "name": str|None, "details": dict}}
-orders_db: dict[str, dict[str, Any]] = {}
 
+async def init_storage() -> None:
+    """Создает и подключает хранилище, выбранное в конфигурации."""
+    global repository, _order_id_allocator
+    _order_id_allocator = None
+    if config.STORAGE_BACKEND == "sqlite":
+        from bot.models.sqlite_repository import SQLiteRepository
+        repository = SQLiteRepository(config.SQLITE_PATH, pool_size=config.SQLITE_POOL_SIZE)
+    elif config.STORAGE_BACKEND == "journal":
+        from bot.models.journal_repository import JournaledMemoryRepository
+        repository = JournaledMemoryRepository(
+            config.JOURNAL_DIR,
+            flush_interval=config.JOURNAL_FLUSH_INTERVAL,
+            snapshot_interval=config.SNAPSHOT_INTERVAL
+        )
+    await repository.connect()
+    await _get_order_id_allocator()
 
-# --- Функции управления данными (Имитация запросов к БД) ---
+    global _search_mark
+    search_index.clear()
+    # Номер берется до обхода: изменения во время обхода будут перечитаны,
+    # а повторное добавление заказа в индекс просто переиндексирует его
+    _search_mark = await repository.get_change_mark()
+    async for orders in repository.iter_orders():
+        for order in orders:
+            search_index.add(order)
 
-def generate_unique_order_id(length: int = 6) -> str:
-    """Генерирует уникальный 6-значный ID для заказа."""
+async def _refresh_search_index() -> None:
+    """Добавляет в индекс поиска изменения заказов из других процессов."""
+    global _search_mark
     while True:
-        order_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
-        if order_id not in orders_db:
-            return order_id
+        changes = await repository.get_changed_orders(_search_mark, SEARCH_REFRESH_BATCH)
+        for change_seq, order in changes:
+            search_index.add(order)
+            _search_mark = change_seq
+        if len(changes) < SEARCH_REFRESH_BATCH:
+            return
 
-def register_user(user_id: int, username: Optional[str], referrer_id: Optional[int] = None) -> int | None:
+async def close_storage() -> None:
+    """Закрывает соединения хранилища."""
+    await repository.close()
+
+
+# --- Функции управления данными ---
+
+async def _get_order_id_allocator() -> OrderIdAllocator:
+    """Возвращает генератор ID, создавая секретный ключ при первом запуске."""
+    global _order_id_allocator
+    if _order_id_allocator is None:
+        key = await repository.init_meta("order_id_key", secrets.token_hex(16))
+        _order_id_allocator = OrderIdAllocator(bytes.fromhex(key))
+    return _order_id_allocator
+
+async def generate_unique_order_id() -> str:
+    """Выдает уникальный 6-значный ID для заказа (без перебора случайных значений)."""
+    allocator = await _get_order_id_allocator()
+    return allocator.encode(await repository.next_sequence("order_id"))
+
+async def register_user(user_id: int, username: Optional[str], referrer_id: Optional[int] = None) -> int | None:
     """
     Регистрирует нового пользователя.
     Возвращает ID реферера, если пользователь новый и пришел по ссылке.
     """
     assigned_referrer_id = None
-    if user_id not in users_db:
+    user = await repository.get_user(user_id)
+    if not user:
         # Определяем роль. Если это главный админ, присваиваем соответствующую роль.
-        role = "main_admin" if user_id == config.MAIN_ADMIN_ID else "client"
+        role = Role.main_admin if user_id == config.MAIN_ADMIN_ID else Role.client
 
         # Убедимся, что пользователь не является своим же рефералом
         if referrer_id and referrer_id != user_id:
             assigned_referrer_id = referrer_id
 
-        users_db[user_id] = {
-            "user_id": user_id,
-            "username": username,
-            "role": role,
-            "referrer_id": assigned_referrer_id
-        }
+        await repository.add_user(User(
+            user_id=user_id,
+            username=username,
+            role=role,
+            referrer_id=assigned_referrer_id
+        ))
+        invalidate_cached_user(user_id)
         return assigned_referrer_id
 
     # Обновляем username, если он изменился
-    users_db[user_id]["username"] = username
+    if user.username != username:
+        await repository.set_username(user_id, username)
+        invalidate_user(user_id)
+        invalidate_cached_user(user_id)
     # Убедимся, что роль главного админа актуальна (важно при перезапуске MemoryStorage)
-    if user_id == config.MAIN_ADMIN_ID and users_db[user_id]["role"] != "main_admin":
-        users_db[user_id]["role"] = "main_admin"
+    if user_id == config.MAIN_ADMIN_ID and user.role != Role.main_admin:
+        await repository.set_role(user_id, Role.main_admin)
+        invalidate_cached_user(user_id)
     return None
 
-def get_user_data(user_id: int) -> Optional[dict[str, Any]]:
+async def get_user_data(user_id: int) -> Optional[User]:
     """Получает данные пользователя."""
-    return users_db.get(user_id)
+    return await repository.get_user(user_id)
+
+async def get_users_by_ids(user_ids: list[int]) -> dict[int, User]:
+    """Получает пользователей по списку ID одним запросом к хранилищу: {user_id: пользователь}."""
+    users = await repository.get_users_by_ids(list(dict.fromkeys(user_ids)))
+    return {user.user_id: user for user in users}
 
-def get_user_role(user_id: int) -> str:
+async def get_cached_user(user_id: int) -> Optional[User]:
+    """Получает данные пользователя через кеш ролей (None - пользователь не зарегистрирован)."""
+    if user_id in _user_cache:
+        return _user_cache[user_id]
+    user = await repository.get_user(user_id)
+    _user_cache[user_id] = user
+    return user
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Удаляет пользователя из кеша ролей."""
+    _user_cache.pop(user_id, None)
+
+async def get_user_role(user_id: int) -> str:
     """Получает ключ роли пользователя (client, admin, main_admin)."""
-    user_data = get_user_data(user_id)
-    return user_data.get("role", "client") if user_data else "client"
+    user_data = await get_cached_user(user_id)
+    return user_data.role if user_data else Role.client
 
-def get_orders_count(user_id: int) -> int:
+async def get_orders_count(user_id: int) -> int:
     """Считает количество заказов пользователя."""
-    # TODO: Replace with DB query (COUNT(*))
-    return len([order for order in orders_db.values() if order["user_id"] == user_id])
+    return await repository.count_user_orders(user_id)
 
-def add_order(user_id: int, details: dict) -> str:
+async def add_order(user_id: int, details: dict) -> str:
     """Добавляет новый заказ с уникальным ID."""
-    order_id = generate_unique_order_id()
-    orders_db[order_id] = {
-        "order_id": order_id,
-        "user_id": user_id,
-        "status": "new", # Статус по умолчанию (ключ из ORDER_STATUSES)
-        "name": None, # Название по умолчанию
-        "details": details
-    }
+    order_id = await generate_unique_order_id()
+    order = Order(
+        order_id=order_id,
+        user_id=user_id,
+        status=OrderStatus.new, # Статус по умолчанию (ключ из ORDER_STATUSES)
+        name=None, # Название по умолчанию
+        details=details
+    )
+    await repository.add_order(order)
+    search_index.add(order)
     return order_id
 
-def get_user_orders(user_id: int, page: int = 1, page_size: int = 3) -> tuple[list, int]:
-    """Получает список заказов пользователя с пагинацией."""
-    user_orders = sorted(
-        [order for order in orders_db.values() if order["user_id"] == user_id],
-        key=lambda x: x['order_id']
-    )
-    
-    total_items = len(user_orders)
+async def get_user_orders(
+    user_id: int, cursor: Optional[str] = None, backward: bool = False, page_size: int = 3
+) -> tuple[list, int]:
+    """
+    Получает страницу заказов пользователя и общее число страниц.
+    Пагинация по курсору: cursor - ID последнего (или первого при backward=True)
+    заказа на текущей странице.
+    """
+    total_items = await repository.count_user_orders(user_id)
     if total_items == 0:
         return [], 0
-        
-    total_pages = ceil(total_items / page_size)
-    
-    start_index = (page - 1) * page_size
-    end_index = start_index + page_size
-    
-    return user_orders[start_index:end_index], total_pages
+
+    user_orders = await repository.get_user_orders(user_id, cursor, backward, page_size)
+    return user_orders, ceil(total_items / page_size)
 
 
-def get_referrals(user_id: int, page: int = 1, page_size: int = 10) -> tuple[list, int]:
-    """Получает список рефералов пользователя с пагинацией."""
-    referrals = [user for user in users_db.values() if user.get("referrer_id") == user_id]
-    
-    total_items = len(referrals)
+async def get_referrals(
+    user_id: int, cursor: Optional[int] = None, backward: bool = False, page_size: int = 10
+) -> tuple[list, int]:
+    """
+    Получает страницу рефералов пользователя (в порядке регистрации) и общее число страниц.
+    Курсор - ID граничного реферала текущей страницы, как в get_user_orders.
+    """
+    total_items = await repository.count_referrals(user_id)
     if total_items == 0:
         return [], 0
 
-    total_pages = ceil(total_items / page_size)
-
-    start_index = (page - 1) * page_size
-    end_index = start_index + page_size
-    
-    return referrals[start_index:end_index], total_pages
+    referrals = await repository.get_referrals(user_id, cursor, backward, page_size)
+    return referrals, ceil(total_items / page_size)
 
 
-def grant_admin_role(user_id: int) -> bool:
+async def grant_admin_role(user_id: int) -> bool:
     """Выдает права администратора пользователю."""
-    if user_id in users_db:
+    user = await repository.get_user(user_id)
+    if user:
         # Нельзя изменить роль главного администратора
-        if users_db[user_id]["role"] != "main_admin":
-            users_db[user_id]["role"] = "admin"
+        if user.role != Role.main_admin:
+            await repository.set_role(user_id, Role.admin)
+            invalidate_cached_user(user_id)
             return True
     return False
 
-def get_all_users() -> list[dict[str, Any]]:
-    """Получает список всех пользователей."""
-    return list(users_db.values())
+async def count_users() -> int:
+    """Считает всех пользователей."""
+    return await repository.count_users()
+
+async def get_users_page(
+    role: Optional[str] = None, username_prefix: Optional[str] = None,
+    cursor: Optional[int] = None, backward: bool = False, page_size: int = 20
+) -> tuple[list[User], int, int]:
+    """
+    Получает страницу пользователей (по возрастанию ID) с фильтрами по роли и началу username.
+    Возвращает пользователей, число страниц и число найденных.
+    """
+    username_prefix = username_prefix.lower() if username_prefix else None
+    total_items = await repository.count_users(role, username_prefix)
+    if total_items == 0:
+        return [], 0, 0
+
+    users = await repository.get_users(role, username_prefix, cursor, backward, page_size)
+    return users, ceil(total_items / page_size), total_items
+
+async def iter_users(
+    role: Optional[str] = None, username_prefix: Optional[str] = None, batch_size: int = 500
+) -> AsyncIterator[list[User]]:
+    """Отдает пользователей (с фильтрами, как в get_users_page) пачками по возрастанию ID."""
+    username_prefix = username_prefix.lower() if username_prefix else None
+    cursor = None
+    while True:
+        users = await repository.get_users(role, username_prefix, cursor, False, batch_size)
+        if not users:
+            return
+        yield users
+        cursor = users[-1].user_id
+
+async def iter_user_ids(after: Optional[int] = None, batch_size: int = 500) -> AsyncIterator[list[int]]:
+    """
+    Отдает ID всех пользователей пачками по возрастанию, начиная после after.
+    В памяти одновременно только одна пачка - подходит для рассылок.
+    """
+    while True:
+        user_ids = await repository.get_user_ids(after, batch_size)
+        if not user_ids:
+            return
+        yield user_ids
+        after = user_ids[-1]
 
 # --- Новые функции для управления заказами ---
 
-def get_all_orders(status_filter: Optional[str] = None, page: int = 1, page_size: int = 10) -> tuple[list, int]:
-    """Получает список всех заказов с фильтрацией и пагинацией."""
-    all_orders = sorted(orders_db.values(), key=lambda x: x['order_id'], reverse=True)
-    
-    if status_filter:
-        filtered_orders = [order for order in all_orders if order["status"] == status_filter]
-    else:
-        filtered_orders = all_orders
-        
-    total_items = len(filtered_orders)
+async def get_all_orders(
+    status_filter: Optional[str] = None, cursor: Optional[str] = None, backward: bool = False, page_size: int = 10
+) -> tuple[list, int]:
+    """Получает страницу всех заказов (с фильтрацией по статусу) и общее число страниц."""
+    total_items = await repository.count_orders(status_filter)
     if total_items == 0:
         return [], 0
 
-    total_pages = ceil(total_items / page_size)
-    start_index = (page - 1) * page_size
-    end_index = start_index + page_size
-    
-    return filtered_orders[start_index:end_index], total_pages
+    orders = await repository.get_orders(status_filter, cursor, backward, page_size)
+    return orders, ceil(total_items / page_size)
 
-def get_order_by_id(order_id: str) -> Optional[dict[str, Any]]:
+async def get_order_by_id(order_id: str) -> Optional[Order]:
     """Получает заказ по его ID."""
-    return orders_db.get(order_id.upper())
+    return await repository.get_order(order_id.upper())
 
-def update_order_status(order_id: str, new_status: str) -> bool:
+async def update_order_status(order_id: str, new_status: str) -> bool:
     """Обновляет статус заказа."""
-    order = get_order_by_id(order_id)
-    if order and new_status in ORDER_STATUSES:
-        order["status"] = new_status
-        return True
-    return False
+    if new_status not in ORDER_STATUSES:
+        return False
+    if not await repository.set_order_status(order_id.upper(), new_status):
+        return False
+    invalidate_order(order_id.upper())
+    return True
 
-def update_order_name(order_id: str, new_name: str) -> bool:
+async def update_orders_status(order_ids: list[str], new_status: str) -> list[tuple[Order, str]]:
+    """
+    Меняет статус нескольких заказов одной операцией хранилища.
+    Возвращает пары (заказ, прежний статус) для заказов, статус которых изменился.
+    """
+    if new_status not in ORDER_STATUSES:
+        return []
+    order_ids = list(dict.fromkeys(order_id.upper() for order_id in order_ids))
+    orders = await repository.get_orders_by_ids(order_ids)
+    # Прежний статус запоминаем до обновления: заказы в памяти изменяются на месте
+    changes = {order.order_id: (order, str(order.status)) for order in orders if order.status != new_status}
+    updated = await repository.set_orders_status(list(changes), new_status)
+    for order_id in updated:
+        invalidate_order(order_id)
+    return [changes[order_id] for order_id in updated]
+
+async def update_order_name(order_id: str, new_name: str) -> bool:
     """Обновляет название заказа."""
-    order = get_order_by_id(order_id)
+    if not await repository.set_order_name(order_id.upper(), new_name):
+        return False
+    invalidate_order(order_id.upper())
+    order = await repository.get_order(order_id.upper())
     if order:
-        order["name"] = new_name
-        return True
-    return False
+        search_index.add(order)
+    return True
+
+async def search_orders(query: str, page: int = 1, page_size: int = 10) -> tuple[list, int, int]:
+    """
+    Ищет заказы по названию, услуге и ответам анкеты.
+    Возвращает страницу заказов (по релевантности), число страниц и число найденных.
+    """
+    await _refresh_search_index()
+    order_ids = search_index.search(query)
+    total_items = len(order_ids)
+    if total_items == 0:
+        return [], 0, 0
+
+    start_index = (page - 1) * page_size
+    orders = []
+    for order_id in order_ids[start_index:start_index + page_size]:
+        order = await repository.get_order(order_id)
+        if order:
+            orders.append(order)
+    return orders, ceil(total_items / page_size), total_items
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from bot.models.sqlite_repository import PRAGMAS
+
+# Хранилище состояний FSM в SQLite - общее для нескольких процессов бота.
+#
+# MemoryStorage живет в памяти процесса: если апдейты одного пользователя
+# обрабатывают разные процессы (вебхук с WEBAPP_REUSE_PORT), каждый видит свое
+# состояние. Здесь состояние и данные хранятся в отдельном файле SQLite в
+# WAL-режиме: чтения не блокируют запись, а запись одного процесса сразу видна
+# остальным. update_data выполняется в транзакции BEGIN IMMEDIATE, поэтому
+# параллельные обновления из разных процессов не теряются.
+#
+# Данные FSM сериализуются в JSON - хэндлеры хранят в них только ID, строки и числа.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key        TEXT PRIMARY KEY,
+    state      TEXT,
+    data       TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, path: str, key_builder: Optional[KeyBuilder] = None):
+        self.path = path
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._conn: Optional[aiosqlite.Connection] = None
+        # Одно соединение на процесс: запросы к нему идут по очереди
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = await aiosqlite.connect(self.path, isolation_level=None)
+        for pragma in PRAGMAS:
+            await self._conn.execute(pragma)
+        await self._conn.executescript(SCHEMA)
+
+    async def close(self) -> None:
+        if self._conn:
+            await self._conn.close()
+            self._conn = None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        async with self._lock:
+            await self._conn.execute(
+                "INSERT INTO fsm (key, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (self.key_builder.build(key), state, time.time())
+            )
+            if state is None:
+                await self._delete_if_empty(self.key_builder.build(key))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with self._lock:
+            async with self._conn.execute("SELECT state FROM fsm WHERE key = ?", (self.key_builder.build(key),)) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        async with self._lock:
+            await self._write_data(self.key_builder.build(key), data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with self._lock:
+            return await self._read_data(self.key_builder.build(key))
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        storage_key = self.key_builder.build(key)
+        async with self._lock:
+            # Блокировка записи берется сразу: между чтением и записью данные
+            # не изменит другой процесс
+            await self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current_data = await self._read_data(storage_key)
+                current_data.update(data)
+                await self._write_data(storage_key, current_data)
+            except BaseException:
+                await self._conn.execute("ROLLBACK")
+                raise
+            await self._conn.execute("COMMIT")
+        return current_data.copy()
+
+    async def _read_data(self, storage_key: str) -> Dict[str, Any]:
+        async with self._conn.execute("SELECT data FROM fsm WHERE key = ?", (storage_key,)) as cursor:
+            row = await cursor.fetchone()
+        return json.loads(row[0]) if row else {}
+
+    async def _write_data(self, storage_key: str, data: Dict[str, Any]) -> None:
+        await self._conn.execute(
+            "INSERT INTO fsm (key, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (storage_key, json.dumps(data, ensure_ascii=False), time.time())
+        )
+        if not data:
+            await self._delete_if_empty(storage_key)
+
+    async def _delete_if_empty(self, storage_key: str) -> None:
+        # Пустые записи (после state.clear()) удаляются, чтобы таблица не росла
+        await self._conn.execute("DELETE FROM fsm WHERE key = ? AND state IS NULL AND data = '{}'", (storage_key,))
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Журнал изменений (append-only) для хранилища в памяти.
+# Каждая запись - одна строка компактного JSON: [seq, "операция", аргументы...].
+# Записи копятся в буфере и сбрасываются на диск пачкой с одним fsync
+# (group commit): вызывающий код ждет, пока его запись не станет надежной.
+# Журнал разбит на сегменты journal-<номер первой записи>.log, чтобы после
+# снимка (snapshot) старые сегменты можно было просто удалить.
+
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".log"
+
+
+def _dumps(record: Any) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+class Journal:
+    def __init__(self, directory: str, flush_interval: float = 0.02):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.seq = 0  # Номер последней записи
+        self.segment_start = 1  # Номер первой записи текущего сегмента
+        self._file = None
+        self._buffer: list[str] = []
+        self._waiters: list[asyncio.Future] = []
+        self._has_data = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._writing: asyncio.Future | None = None
+
+    # --- Сегменты ---
+
+    def segments(self) -> list[tuple[int, str]]:
+        """Возвращает сегменты журнала (номер первой записи, путь) по порядку."""
+        result = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                start = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                result.append((start, os.path.join(self.directory, name)))
+        return sorted(result)
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{start:012d}{SEGMENT_SUFFIX}")
+
+    def read(self, from_seq: int) -> Iterator[list]:
+        """Читает записи журнала с номером >= from_seq (для восстановления после перезапуска)."""
+        segments = self.segments()
+        for index, (start, path) in enumerate(segments):
+            self.seq = max(self.seq, start - 1)
+            # Сегмент целиком до from_seq, если следующий начинается не позже from_seq
+            if index + 1 < len(segments) and segments[index + 1][0] <= from_seq:
+                continue
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка в конце сегмента (сбой во время записи)
+                        logger.warning(f"Skipping torn journal record in {path}")
+                        break
+                    self.seq = max(self.seq, record[0])
+                    if record[0] >= from_seq:
+                        yield record
+
+    def remove_segments_before(self, start: int) -> None:
+        """Удаляет сегменты, все записи которых попали в снимок."""
+        for segment_start, path in self.segments():
+            if segment_start < start:
+                os.remove(path)
+
+    # --- Запись ---
+
+    def open(self) -> None:
+        """Открывает новый сегмент для записи и запускает фоновый сброс буфера."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.segment_start = self.seq + 1
+        self._file = open(self._segment_path(self.segment_start), "a", encoding="utf-8")
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def append(self, *record: Any) -> None:
+        """Добавляет запись и ждет, пока она не будет записана на диск."""
+        self.seq += 1
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append(_dumps([self.seq, *record]) + "\n")
+        self._waiters.append(future)
+        self._has_data.set()
+        await future
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._has_data.wait()
+            # Небольшая пауза, чтобы собрать в один fsync записи от разных апдейтов
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush journal: {e}", exc_info=True)
+
+    async def flush(self) -> None:
+        """Записывает буфер в текущий сегмент и делает fsync."""
+        async with self._flush_lock:
+            await self._flush_buffer()
+
+    async def _flush_buffer(self) -> None:
+        if self._writing and not self._writing.done():
+            # Предыдущий сброс отменили, но его запись в потоке еще идет
+            await asyncio.wait([self._writing])
+        self._has_data.clear()
+        if not self._buffer:
+            return
+        data, waiters = "".join(self._buffer), self._waiters
+        self._buffer, self._waiters = [], []
+        # Ожидающие мутации получают результат записи из колбэка: даже если
+        # сброс отменят (close, остановка цикла), запись в потоке дойдет до
+        # конца, и ни одна мутация не останется ждать вечно
+        write = self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, data))
+        write.add_done_callback(lambda task: _resolve(waiters, task))
+        await asyncio.shield(write)
+
+    def _write(self, data: str) -> None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def rotate(self) -> int:
+        """Начинает новый сегмент. Возвращает номер его первой записи."""
+        async with self._flush_lock:
+            # Все, что уже в буфере, относится к старому сегменту
+            await self._flush_buffer()
+            self._file.close()
+            self.segment_start = self.seq + 1
+            self._file = open(self._segment_path(self.segment_start), "a", encoding="utf-8")
+            return self.segment_start
+
+    async def close(self) -> None:
+        if self._flush_task:
+            # Фоновый сброс останавливается между пачками, а не посреди записи
+            async with self._flush_lock:
+                self._flush_task.cancel()
+            self._flush_task = None
+        if self._file:
+            try:
+                await self.flush()
+            finally:
+                self._file.close()
+                self._file = None
+                # Записи, которые так и не попали на диск (сброс прерван)
+                _fail(self._waiters, RuntimeError("Journal is closed"))
+                self._buffer, self._waiters = [], []
+
+
+def _resolve(waiters: list[asyncio.Future], write: asyncio.Future) -> None:
+    if write.cancelled():
+        error = RuntimeError("Journal write was cancelled")
+    else:
+        error = write.exception()
+    if error is not None:
+        # Ожидающие мутации получат ошибку записи
+        _fail(waiters, error)
+        return
+    for future in waiters:
+        if not future.done():
+            future.set_result(None)
+
+
+def _fail(waiters: list[asyncio.Future], error: BaseException) -> None:
+    for future in waiters:
+        if not future.done():
+            future.set_exception(error)
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+from bot.models.journal import Journal
+from bot.models.memory_repository import MemoryRepository
+from bot.models.records import User, Order, to_role, to_status
+
+logger = logging.getLogger(__name__)
+
+# Хранилище в памяти с журналом изменений и периодическими снимками.
+# Чтение - обычные обращения к словарям, а каждое изменение дописывается
+# в журнал (см. journal.py). Фоновая задача периодически сохраняет снимок
+# всего состояния и удаляет журнал до него. При старте загружается последний
+# снимок и проигрывается хвост журнала.
+#
+# Снимок "нечеткий": он пишется, пока бот продолжает работать, и может
+# содержать часть изменений, сделанных после начала снимка. Это безопасно,
+# потому что все операции журнала идемпотентны (присваивания и вставки
+# "если нет"), а журнал проигрывается с момента начала снимка. Поэтому
+# изменения заказа записывают итоговую версию заказа, а не ее увеличение.
+
+SNAPSHOT_FILE = "snapshot.jsonl"
+
+
+class JournaledMemoryRepository(MemoryRepository):
+    def __init__(self, directory: str, flush_interval: float = 0.02, snapshot_interval: float = 300):
+        super().__init__()
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.journal = Journal(directory, flush_interval)
+        self._snapshot_lock = asyncio.Lock()
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    async def connect(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+        start = self._load_snapshot()
+        replayed = 0
+        for record in self.journal.read(start):
+            self._apply(record[1], record[2:])
+            replayed += 1
+        self.journal.seq = max(self.journal.seq, start - 1)
+        self.rebuild_indexes()
+        logger.info(
+            f"Storage restored: {len(self.users)} users, {len(self.orders)} orders, "
+            f"{replayed} journal records replayed"
+        )
+
+        self.journal.open()
+        self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+
+    async def close(self) -> None:
+        if self._snapshot_task:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        # Финальный снимок ускоряет следующий запуск
+        await self.snapshot()
+        await self.journal.close()
+
+    # --- Восстановление ---
+
+    def _apply(self, op: str, args: list) -> None:
+        """Применяет запись журнала к словарям (индексы перестраиваются после)."""
+        if op == "user":
+            self.users.setdefault(args[0]["user_id"], User.from_dict(args[0]))
+        elif op == "username":
+            self.users[args[0]].username = args[1]
+        elif op == "role":
+            self.users[args[0]].role = to_role(args[1])
+        elif op == "order":
+            self.orders.setdefault(args[0]["order_id"], Order.from_dict(args[0]))
+        elif op == "status":
+            self._apply_status(args[0], args[1], args[2])
+        elif op == "statuses":
+            for order_id, version in args[0]:
+                self._apply_status(order_id, args[1], version)
+        elif op == "name":
+            order = self.orders[args[0]]
+            order.name = args[1]
+            order.version = args[2]
+        elif op == "meta":
+            self.meta.setdefault(args[0], args[1])
+        elif op == "seq":
+            self.sequences[args[0]] = max(self.sequences.get(args[0], 0), args[1])
+        else:
+            logger.warning(f"Unknown journal operation: {op}")
+
+    def _apply_status(self, order_id: str, status: str, version: int) -> None:
+        order = self.orders[order_id]
+        order.status = to_status(status)
+        order.version = version
+
+    def _load_snapshot(self) -> int:
+        """Загружает снимок. Возвращает номер первой записи журнала после него."""
+        if not os.path.exists(self.snapshot_path):
+            return 1
+
+        with open(self.snapshot_path, encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            for line in file:
+                kind, item = json.loads(line)
+                if kind == "u":
+                    self.users[item["user_id"]] = User.from_dict(item)
+                elif kind == "o":
+                    self.orders[item["order_id"]] = Order.from_dict(item)
+        self.meta.update(header["meta"])
+        self.sequences.update(header["sequences"])
+        return header["journal_seq"]
+
+    # --- Снимки ---
+
+    async def _snapshot_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.error(f"Failed to write snapshot: {e}", exc_info=True)
+
+    async def snapshot(self) -> None:
+        """Сохраняет снимок состояния и удаляет ставшие ненужными сегменты журнала."""
+        async with self._snapshot_lock:
+            start = await self.journal.rotate()
+            header = {"journal_seq": start, "meta": dict(self.meta), "sequences": dict(self.sequences)}
+            users = list(self.users.values())
+            orders = list(self.orders.values())
+            await asyncio.to_thread(self._write_snapshot, header, users, orders)
+            self.journal.remove_segments_before(start)
+            logger.info(f"Snapshot written: {len(users)} users, {len(orders)} orders")
+
+    def _write_snapshot(self, header: dict, users: list, orders: list) -> None:
+        # Пишем построчно: так другие потоки (и цикл событий) не ждут сериализацию целиком
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for user in users:
+                file.write(json.dumps(["u", user.to_dict()], ensure_ascii=False, separators=(",", ":")) + "\n")
+            for order in orders:
+                file.write(json.dumps(["o", order.to_dict()], ensure_ascii=False, separators=(",", ":")) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    # --- Изменения (с записью в журнал) ---
+
+    async def init_meta(self, key: str, value: str) -> str:
+        is_new = key not in self.meta
+        value = await super().init_meta(key, value)
+        if is_new:
+            await self.journal.append("meta", key, value)
+        return value
+
+    async def next_sequence(self, name: str) -> int:
+        value = await super().next_sequence(name)
+        await self.journal.append("seq", name, value)
+        return value
+
+    async def add_user(self, user: User) -> None:
+        await super().add_user(user)
+        await self.journal.append("user", user.to_dict())
+
+    async def set_username(self, user_id: int, username: Optional[str]) -> None:
+        await super().set_username(user_id, username)
+        await self.journal.append("username", user_id, username)
+
+    async def set_role(self, user_id: int, role: str) -> None:
+        await super().set_role(user_id, role)
+        await self.journal.append("role", user_id, role)
+
+    async def add_order(self, order: Order) -> None:
+        await super().add_order(order)
+        await self.journal.append("order", order.to_dict())
+
+    async def set_order_status(self, order_id: str, status: str) -> bool:
+        if not await super().set_order_status(order_id, status):
+            return False
+        await self.journal.append("status", order_id, status, self.orders[order_id].version)
+        return True
+
+    async def set_orders_status(self, order_ids: list[str], status: str) -> list[str]:
+        updated = await super().set_orders_status(order_ids, status)
+        if updated:
+            # Одна запись журнала (и один fsync) на всю пачку
+            versions = [[order_id, self.orders[order_id].version] for order_id in updated]
+            await self.journal.append("statuses", versions, status)
+        return updated
+
+    async def set_order_name(self, order_id: str, name: str) -> bool:
+        if not await super().set_order_name(order_id, name):
+            return False
+        await self.journal.append("name", order_id, name, self.orders[order_id].version)
+        return True
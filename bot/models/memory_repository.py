@@ -0,0 +1,244 @@
+from typing import Optional, AsyncIterator
+from bisect import insort, bisect_left, bisect_right
+
+from bot.models.repository import BaseRepository
+from bot.models.records import User, Order, to_role, to_status
+
+# Хранилище в памяти процесса. Используется по умолчанию (и для тестов):
+# данные теряются при перезапуске.
+
+
+def keyset_page(ids: list[str], cursor: Optional[str], backward: bool, limit: int, descending: bool) -> list[str]:
+    """
+    Вырезает страницу из отсортированного по возрастанию списка ID за O(log n + limit).
+    Страница возвращается в порядке отображения (descending - по убыванию).
+    """
+    if cursor is None:
+        chunk = ids[:limit] if not descending else ids[-limit:]
+    elif backward == descending:
+        # Двигаемся в сторону больших ID
+        start = bisect_right(ids, cursor)
+        chunk = ids[start:start + limit]
+    else:
+        # Двигаемся в сторону меньших ID
+        end = bisect_left(ids, cursor)
+        chunk = ids[max(0, end - limit):end]
+    return chunk[::-1] if descending else chunk
+
+
+def _remove_sorted(ids: list[str], value: str) -> None:
+    """Удаляет значение из отсортированного списка."""
+    index = bisect_left(ids, value)
+    if index < len(ids) and ids[index] == value:
+        del ids[index]
+
+
+class MemoryRepository(BaseRepository):
+    def __init__(self):
+        self.users: dict[int, User] = {}
+        self.orders: dict[str, Order] = {}
+        # Все ID пользователей по возрастанию (для потокового обхода и списка в админ-панели)
+        self.user_ids: list[int] = []
+        # Все ID заказов по возрастанию (для постраничного вывода по курсору)
+        self.order_ids: list[str] = []
+
+        # --- Вторичные индексы (поддерживаются методами записи ниже) ---
+        # role -> отсортированный список ID пользователей с этой ролью
+        self.users_by_role: dict[str, list[int]] = {}
+        # Отсортированные пары (username в нижнем регистре, user_id) для поиска по началу ника
+        self.usernames: list[tuple[str, int]] = []
+        # user_id -> отсортированный список ID заказов пользователя
+        self.orders_by_user: dict[int, list[str]] = {}
+        # referrer_id -> ID приглашенных пользователей (в порядке регистрации)
+        self.referrals_by_user: dict[int, list[int]] = {}
+        # user_id реферала -> его позиция в списке реферера (курсор страниц рефералов)
+        self.referral_positions: dict[int, int] = {}
+        # status -> отсортированный список ID заказов с этим статусом
+        self.orders_by_status: dict[str, list[str]] = {}
+
+        # Служебные данные (ключи, счетчики)
+        self.meta: dict[str, str] = {}
+        self.sequences: dict[str, int] = {}
+
+    def rebuild_indexes(self) -> None:
+        """Перестраивает вторичные индексы целиком (после массовой загрузки данных)."""
+        self.user_ids = sorted(self.users)
+        self.referrals_by_user = {}
+        self.referral_positions = {}
+        self.users_by_role = {}
+        for user_id in self.user_ids:
+            user = self.users[user_id]
+            self.users_by_role.setdefault(user.role, []).append(user_id)
+        # Рефералы - в порядке регистрации (порядок вставки в словарь)
+        for user in self.users.values():
+            if user.referrer_id:
+                self._index_referral(user)
+        self.usernames = sorted((user.username.lower(), user.user_id) for user in self.users.values() if user.username)
+
+        self.order_ids = sorted(self.orders)
+        self.orders_by_user = {}
+        self.orders_by_status = {}
+        # order_ids уже отсортирован, поэтому списки в индексах получаются отсортированными
+        for order_id in self.order_ids:
+            order = self.orders[order_id]
+            self.orders_by_user.setdefault(order.user_id, []).append(order_id)
+            self.orders_by_status.setdefault(order.status, []).append(order_id)
+
+    # --- Служебные данные ---
+
+    async def init_meta(self, key: str, value: str) -> str:
+        return self.meta.setdefault(key, value)
+
+    async def next_sequence(self, name: str) -> int:
+        value = self.sequences.get(name, 0) + 1
+        self.sequences[name] = value
+        return value
+
+    # --- Пользователи ---
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        return self.users.get(user_id)
+
+    async def add_user(self, user: User) -> None:
+        old = self.users.get(user.user_id)
+        if old is None:
+            insort(self.user_ids, user.user_id)
+        else:
+            self._unindex_user(old)
+        self.users[user.user_id] = user
+        insort(self.users_by_role.setdefault(user.role, []), user.user_id)
+        if user.username:
+            insort(self.usernames, (user.username.lower(), user.user_id))
+        if user.referrer_id and user.user_id not in self.referral_positions:
+            self._index_referral(user)
+
+    def _index_referral(self, user: User) -> None:
+        referrals = self.referrals_by_user.setdefault(user.referrer_id, [])
+        self.referral_positions[user.user_id] = len(referrals)
+        referrals.append(user.user_id)
+
+    def _unindex_user(self, user: User) -> None:
+        """Удаляет пользователя из индексов по роли и username."""
+        _remove_sorted(self.users_by_role.get(user.role, []), user.user_id)
+        if user.username:
+            _remove_sorted(self.usernames, (user.username.lower(), user.user_id))
+
+    async def set_username(self, user_id: int, username: Optional[str]) -> None:
+        user = self.users[user_id]
+        if user.username:
+            _remove_sorted(self.usernames, (user.username.lower(), user_id))
+        user.username = username
+        if username:
+            insort(self.usernames, (username.lower(), user_id))
+
+    async def set_role(self, user_id: int, role: str) -> None:
+        user = self.users[user_id]
+        _remove_sorted(self.users_by_role.get(user.role, []), user_id)
+        user.role = to_role(role)
+        insort(self.users_by_role.setdefault(user.role, []), user_id)
+
+    async def get_users_by_ids(self, user_ids: list[int]) -> list[User]:
+        return [self.users[user_id] for user_id in user_ids if user_id in self.users]
+
+    async def count_referrals(self, referrer_id: int) -> int:
+        return len(self.referrals_by_user.get(referrer_id, ()))
+
+    async def get_referrals(self, referrer_id: int, cursor: Optional[int], backward: bool, limit: int) -> list[User]:
+        referrals = self.referrals_by_user.get(referrer_id, [])
+        position = self.referral_positions.get(cursor) if cursor is not None else None
+        if position is None:
+            page = referrals[:limit]
+        elif backward:
+            page = referrals[max(0, position - limit):position]
+        else:
+            page = referrals[position + 1:position + 1 + limit]
+        return [self.users[user_id] for user_id in page]
+
+    async def count_users(self, role: Optional[str] = None, username_prefix: Optional[str] = None) -> int:
+        return len(self._filtered_user_ids(role, username_prefix))
+
+    async def get_users(
+        self, role: Optional[str], username_prefix: Optional[str], cursor: Optional[int], backward: bool, limit: int
+    ) -> list[User]:
+        page = keyset_page(self._filtered_user_ids(role, username_prefix), cursor, backward, limit, descending=False)
+        return [self.users[user_id] for user_id in page]
+
+    def _filtered_user_ids(self, role: Optional[str], username_prefix: Optional[str]) -> list[int]:
+        """Отсортированные ID пользователей, подходящих под фильтры."""
+        if not username_prefix:
+            return self.user_ids if role is None else self.users_by_role.get(role, [])
+        # Символы username Telegram меньше "~", поэтому все ники с этим началом
+        # лежат в диапазоне [prefix, prefix + "~")
+        start = bisect_left(self.usernames, (username_prefix,))
+        end = bisect_left(self.usernames, (username_prefix + "~",))
+        return sorted(
+            user_id for _, user_id in self.usernames[start:end]
+            if role is None or self.users[user_id].role == role
+        )
+
+    async def get_user_ids(self, after: Optional[int], limit: int) -> list[int]:
+        start = bisect_right(self.user_ids, after) if after is not None else 0
+        return self.user_ids[start:start + limit]
+
+    # --- Заказы ---
+
+    async def add_order(self, order: Order) -> None:
+        order_id = order.order_id
+        self.orders[order_id] = order
+        insort(self.order_ids, order_id)
+        insort(self.orders_by_user.setdefault(order.user_id, []), order_id)
+        insort(self.orders_by_status.setdefault(order.status, []), order_id)
+
+    async def get_order(self, order_id: str) -> Optional[Order]:
+        return self.orders.get(order_id)
+
+    async def get_orders_by_ids(self, order_ids: list[str]) -> list[Order]:
+        return [self.orders[order_id] for order_id in order_ids if order_id in self.orders]
+
+    async def count_user_orders(self, user_id: int) -> int:
+        return len(self.orders_by_user.get(user_id, ()))
+
+    async def get_user_orders(self, user_id: int, cursor: Optional[str], backward: bool, limit: int) -> list:
+        page_ids = keyset_page(self.orders_by_user.get(user_id, []), cursor, backward, limit, descending=False)
+        return [self.orders[order_id] for order_id in page_ids]
+
+    def _order_ids(self, status: Optional[str]) -> list[str]:
+        return self.orders_by_status.get(status, []) if status else self.order_ids
+
+    async def count_orders(self, status: Optional[str]) -> int:
+        return len(self._order_ids(status))
+
+    async def get_orders(self, status: Optional[str], cursor: Optional[str], backward: bool, limit: int) -> list:
+        page_ids = keyset_page(self._order_ids(status), cursor, backward, limit, descending=True)
+        return [self.orders[order_id] for order_id in page_ids]
+
+    async def iter_orders(self, batch_size: int = 1000) -> AsyncIterator[list[Order]]:
+        orders = list(self.orders.values())
+        for start in range(0, len(orders), batch_size):
+            yield orders[start:start + batch_size]
+
+    async def set_order_status(self, order_id: str, status: str) -> bool:
+        return self._set_status(order_id, status)
+
+    async def set_orders_status(self, order_ids: list[str], status: str) -> list[str]:
+        return [order_id for order_id in order_ids if self._set_status(order_id, status)]
+
+    def _set_status(self, order_id: str, status: str) -> bool:
+        order = self.orders.get(order_id)
+        if not order:
+            return False
+        old_status = order.status
+        if old_status != status:
+            _remove_sorted(self.orders_by_status.get(old_status, []), order_id)
+            insort(self.orders_by_status.setdefault(status, []), order_id)
+        order.status = to_status(status)
+        order.version += 1
+        return True
+
+    async def set_order_name(self, order_id: str, name: str) -> bool:
+        order = self.orders.get(order_id)
+        if not order:
+            return False
+        order.name = name
+        order.version += 1
+        return True
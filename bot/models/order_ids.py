@@ -0,0 +1,54 @@
+import hashlib
+import string
+
+# Генератор ID заказов без коллизий.
+# Порядковый номер заказа (монотонный счетчик из хранилища) переводится в ID
+# через секретную перестановку (сеть Фейстеля с ключом), поэтому:
+# - разные номера всегда дают разные ID (коллизий нет, повторы не нужны);
+# - по ID нельзя угадать соседние ID или количество заказов;
+# - стоимость выдачи ID не зависит от числа уже созданных заказов.
+
+ALPHABET = string.digits + string.ascii_uppercase
+ID_LENGTH = 6
+ID_SPACE = len(ALPHABET) ** ID_LENGTH  # 36^6 ~ 2.18 млрд
+
+_HALF_BITS = 16
+_HALF_MASK = (1 << _HALF_BITS) - 1
+
+
+class OrderIdAllocator:
+    """Биективно отображает номера 0..ID_SPACE-1 в 6-символьные ID."""
+
+    def __init__(self, key: bytes, rounds: int = 4):
+        self.key = key
+        self.rounds = rounds
+
+    def _round(self, value: int, round_index: int) -> int:
+        digest = hashlib.blake2b(
+            value.to_bytes(2, "big") + bytes((round_index,)), key=self.key, digest_size=2
+        ).digest()
+        return int.from_bytes(digest, "big")
+
+    def _permute(self, value: int) -> int:
+        """Перестановка 32-битного числа (сеть Фейстеля)."""
+        left, right = value >> _HALF_BITS, value & _HALF_MASK
+        for round_index in range(self.rounds):
+            left, right = right, left ^ self._round(right, round_index)
+        return (left << _HALF_BITS) | right
+
+    def encode(self, seq: int) -> str:
+        """Возвращает ID заказа для порядкового номера seq."""
+        if not 0 <= seq < ID_SPACE:
+            raise ValueError("Исчерпано пространство ID заказов")
+
+        # Cycle walking: применяем перестановку, пока результат не попадет в ID_SPACE.
+        # Это сохраняет биективность; в среднем нужно ~2 итерации (2^32 / 36^6).
+        value = self._permute(seq)
+        while value >= ID_SPACE:
+            value = self._permute(value)
+
+        chars = []
+        for _ in range(ID_LENGTH):
+            value, index = divmod(value, len(ALPHABET))
+            chars.append(ALPHABET[index])
+        return "".join(reversed(chars))
@@ -0,0 +1,88 @@
+import sys
+from dataclasses import dataclass, fields
+from enum import Enum
+from typing import Optional, Any
+
+from bot.lexicon.lexicon_ru import USER_ROLES, ORDER_STATUSES
+
+# Компактные записи пользователей и заказов.
+# Вместо словаря на каждую запись (с повторяющимися ключами) используются
+# dataclass со __slots__, а роль и статус хранятся как члены enum - по одному
+# объекту на значение для всех записей.
+
+
+class StrEnum(str, Enum):
+    """Строковый enum: сравнивается, хэшируется и форматируется как обычная строка."""
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+# Роли и статусы строятся из словарей лексикона, чтобы их по-прежнему
+# можно было редактировать в одном месте.
+Role = StrEnum("Role", {key: key for key in USER_ROLES})
+OrderStatus = StrEnum("OrderStatus", {key: key for key in ORDER_STATUSES})
+
+
+def to_role(value: str) -> Role | str:
+    """Переводит строку в Role (неизвестные значения остаются интернированной строкой)."""
+    try:
+        return Role(value)
+    except ValueError:
+        return sys.intern(value)
+
+
+def to_status(value: str) -> OrderStatus | str:
+    """Переводит строку в OrderStatus (неизвестные значения остаются интернированной строкой)."""
+    try:
+        return OrderStatus(value)
+    except ValueError:
+        return sys.intern(value)
+
+
+class RecordMixin:
+    """
+    Совместимость со старым форматом записей-словарей:
+    record["username"] и record.get("name") работают как раньше.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]):
+        return cls(**data)
+
+
+@dataclass(slots=True)
+class User(RecordMixin):
+    user_id: int
+    username: Optional[str]
+    role: Role | str
+    referrer_id: Optional[int]
+
+    def __post_init__(self):
+        self.role = to_role(self.role)
+
+
+@dataclass(slots=True)
+class Order(RecordMixin):
+    order_id: str
+    user_id: int
+    status: OrderStatus | str
+    name: Optional[str]
+    details: dict[str, Any]
+    # Растет при каждом изменении заказа (ключ кеша отображения)
+    version: int = 0
+
+    def __post_init__(self):
+        self.status = to_status(self.status)
@@ -0,0 +1,145 @@
+from abc import ABC, abstractmethod
+from typing import Optional, AsyncIterator
+
+from bot.models.records import User, Order
+
+# Абстрактный слой хранения данных.
+# data_store работает только через этот интерфейс, поэтому хранилище можно
+# заменить (память, SQLite, ...) без изменения хэндлеров.
+
+
+class BaseRepository(ABC):
+    """Базовый класс хранилища пользователей и заказов."""
+
+    async def connect(self) -> None:
+        """Открывает соединения с хранилищем (если нужно)."""
+
+    async def close(self) -> None:
+        """Закрывает соединения с хранилищем (если нужно)."""
+
+    # --- Служебные данные ---
+
+    @abstractmethod
+    async def init_meta(self, key: str, value: str) -> str:
+        """Сохраняет значение, если ключа еще нет. Возвращает сохраненное значение."""
+
+    @abstractmethod
+    async def next_sequence(self, name: str) -> int:
+        """Атомарно увеличивает счетчик и возвращает новое значение (первое - 1)."""
+
+    # --- Пользователи ---
+
+    @abstractmethod
+    async def get_user(self, user_id: int) -> Optional[User]:
+        """Возвращает пользователя или None."""
+
+    @abstractmethod
+    async def add_user(self, user: User) -> None:
+        """Сохраняет нового пользователя."""
+
+    @abstractmethod
+    async def set_username(self, user_id: int, username: Optional[str]) -> None:
+        """Обновляет username пользователя."""
+
+    @abstractmethod
+    async def set_role(self, user_id: int, role: str) -> None:
+        """Обновляет роль пользователя."""
+
+    @abstractmethod
+    async def get_users_by_ids(self, user_ids: list[int]) -> list[User]:
+        """Возвращает существующих пользователей из списка ID (порядок не гарантируется)."""
+
+    @abstractmethod
+    async def count_referrals(self, referrer_id: int) -> int:
+        """Считает рефералов пользователя."""
+
+    @abstractmethod
+    async def get_referrals(self, referrer_id: int, cursor: Optional[int], backward: bool, limit: int) -> list[User]:
+        """
+        Возвращает страницу рефералов (в порядке регистрации).
+        cursor - ID граничного реферала соседней страницы, как в get_user_orders.
+        """
+
+    @abstractmethod
+    async def count_users(self, role: Optional[str] = None, username_prefix: Optional[str] = None) -> int:
+        """Считает пользователей (с фильтрами - как в get_users)."""
+
+    @abstractmethod
+    async def get_users(
+        self, role: Optional[str], username_prefix: Optional[str], cursor: Optional[int], backward: bool, limit: int
+    ) -> list[User]:
+        """
+        Возвращает страницу пользователей (по возрастанию ID).
+        Фильтры: роль и начало username (в нижнем регистре, символы username Telegram).
+        Курсор - как в get_user_orders.
+        """
+
+    @abstractmethod
+    async def get_user_ids(self, after: Optional[int], limit: int) -> list[int]:
+        """Возвращает до limit ID пользователей по возрастанию, начиная после after."""
+
+    # --- Заказы ---
+
+    @abstractmethod
+    async def add_order(self, order: Order) -> None:
+        """Сохраняет новый заказ."""
+
+    @abstractmethod
+    async def get_order(self, order_id: str) -> Optional[Order]:
+        """Возвращает заказ или None."""
+
+    @abstractmethod
+    async def get_orders_by_ids(self, order_ids: list[str]) -> list[Order]:
+        """Возвращает существующие заказы из списка ID (порядок не гарантируется)."""
+
+    @abstractmethod
+    async def count_user_orders(self, user_id: int) -> int:
+        """Считает заказы пользователя."""
+
+    @abstractmethod
+    async def get_user_orders(self, user_id: int, cursor: Optional[str], backward: bool, limit: int) -> list:
+        """
+        Возвращает страницу заказов пользователя (по возрастанию ID).
+        cursor - граничный ID соседней страницы: следующая страница начинается
+        сразу после него, предыдущая (backward=True) заканчивается перед ним.
+        """
+
+    @abstractmethod
+    async def count_orders(self, status: Optional[str]) -> int:
+        """Считает все заказы (или заказы с указанным статусом)."""
+
+    @abstractmethod
+    async def get_orders(self, status: Optional[str], cursor: Optional[str], backward: bool, limit: int) -> list:
+        """Возвращает страницу всех заказов (по убыванию ID). Курсор - как в get_user_orders."""
+
+    @abstractmethod
+    def iter_orders(self, batch_size: int = 1000) -> AsyncIterator[list[Order]]:
+        """Перебирает все заказы пачками (для построения индексов)."""
+
+    async def get_change_mark(self) -> int:
+        """
+        Возвращает номер последнего изменения заказов, видимого в get_changed_orders.
+        Хранилища в памяти принадлежат одному процессу: все их изменения
+        проходят через data_store, поэтому отслеживать нечего.
+        """
+        return 0
+
+    async def get_changed_orders(self, after: int, limit: int) -> list[tuple[int, Order]]:
+        """
+        Возвращает заказы, добавленные или переименованные после изменения after,
+        с номерами изменений по возрастанию (для обновления индекса поиска
+        изменениями других процессов).
+        """
+        return []
+
+    @abstractmethod
+    async def set_order_status(self, order_id: str, status: str) -> bool:
+        """Обновляет статус заказа. Возвращает False, если заказа нет."""
+
+    @abstractmethod
+    async def set_orders_status(self, order_ids: list[str], status: str) -> list[str]:
+        """Обновляет статус нескольких заказов одной операцией. Возвращает ID обновленных."""
+
+    @abstractmethod
+    async def set_order_name(self, order_id: str, name: str) -> bool:
+        """Обновляет название заказа. Возвращает False, если заказа нет."""
@@ -0,0 +1,117 @@
+import math
+import re
+from typing import Iterable
+
+from bot.lexicon.lexicon_ru import FSM_QUESTIONS
+from bot.models.records import Order
+
+# Полнотекстовый поиск по заказам для админ-панели.
+# Инвертированный индекс: токен -> {order_id: взвешенная частота}.
+# Индексируются название заказа, услуга/подуслуга и ответы анкеты;
+# результаты ранжируются по BM25.
+
+TOKEN_RE = re.compile(r"\w+")
+# Грубый стемминг: обрезаем длинные слова, чтобы "логистика",
+# "логистической" и "логистику" давали один токен.
+STEM_LENGTH = 6
+MIN_TOKEN_LENGTH = 2
+
+# Вес совпадения в зависимости от поля
+NAME_WEIGHT = 3
+SERVICE_WEIGHT = 2
+ANSWER_WEIGHT = 1
+
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    """Разбивает текст на нормализованные токены."""
+    tokens = []
+    for word in TOKEN_RE.findall(text.lower().replace("ё", "е")):
+        if len(word) >= MIN_TOKEN_LENGTH:
+            tokens.append(word[:STEM_LENGTH])
+    return tokens
+
+
+def _order_fields(order: Order) -> Iterable[tuple[str, int]]:
+    """Возвращает индексируемые тексты заказа с их весами."""
+    details = order.details or {}
+    if order.name:
+        yield order.name, NAME_WEIGHT
+    for key in ("service_category", "sub_service_category"):
+        if details.get(key):
+            yield details[key], SERVICE_WEIGHT
+    # Ключ услуги (например, service_due_diligence) - чтобы находить и по латинице
+    if details.get("questions_key"):
+        yield details["questions_key"].replace("_", " "), SERVICE_WEIGHT
+    for question in FSM_QUESTIONS.get(details.get("questions_key"), []):
+        answer = details.get(question["key"])
+        if isinstance(answer, str):
+            yield answer, ANSWER_WEIGHT
+
+
+class OrderSearchIndex:
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.postings: dict[str, dict[str, int]] = {}
+        # order_id -> {токен: вес} (нужно для удаления/обновления документа)
+        self.documents: dict[str, dict[str, int]] = {}
+        # order_id -> суммарный вес токенов документа (длина для BM25)
+        self.lengths: dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, order: Order) -> None:
+        """Добавляет заказ в индекс (или переиндексирует, если он уже есть)."""
+        if order.order_id in self.documents:
+            self.remove(order.order_id)
+
+        terms: dict[str, int] = {}
+        for text, weight in _order_fields(order):
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + weight
+
+        self.documents[order.order_id] = terms
+        self.lengths[order.order_id] = sum(terms.values())
+        self.total_length += self.lengths[order.order_id]
+        for token, weight in terms.items():
+            self.postings.setdefault(token, {})[order.order_id] = weight
+
+    def remove(self, order_id: str) -> None:
+        terms = self.documents.pop(order_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.lengths.pop(order_id)
+        for token in terms:
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(order_id, None)
+                if not posting:
+                    del self.postings[token]
+
+    def search(self, query: str) -> list[str]:
+        """Возвращает ID заказов, отсортированные по релевантности (BM25)."""
+        tokens = set(tokenize(query))
+        if not tokens or not self.documents:
+            return []
+
+        documents_count = len(self.documents)
+        average_length = self.total_length / documents_count or 1
+        scores: dict[str, float] = {}
+        for token in tokens:
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (documents_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for order_id, frequency in posting.items():
+                norm = frequency + BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[order_id] / average_length)
+                scores[order_id] = scores.get(order_id, 0.0) + idf * frequency * (BM25_K1 + 1) / norm
+
+        # При равной релевантности порядок детерминирован по ID
+        return sorted(scores, key=lambda order_id: (-scores[order_id], order_id))
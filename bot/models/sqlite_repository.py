@@ -0,0 +1,432 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, AsyncIterator
+
+import aiosqlite
+from cachetools import TTLCache
+
+from bot.models.repository import BaseRepository
+from bot.models.records import User, Order
+
+# Хранилище в SQLite (через aiosqlite).
+# - WAL-режим: читатели не блокируют писателя и наоборот.
+# - Пул соединений: несколько соединений для чтения + одно для записи
+#   (SQLite в любом случае допускает только одного писателя).
+# - Все запросы - константные SQL-строки с параметрами, поэтому sqlite3
+#   кэширует подготовленные выражения на каждом соединении (cached_statements).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id     INTEGER PRIMARY KEY,
+    username    TEXT,
+    role        TEXT    NOT NULL DEFAULT 'client',
+    referrer_id INTEGER,
+    created_at  REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_referrer ON users (referrer_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_users_role ON users (role, user_id);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users (username COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT    PRIMARY KEY,
+    user_id  INTEGER NOT NULL,
+    status   TEXT    NOT NULL,
+    name     TEXT,
+    details  TEXT    NOT NULL,
+    version  INTEGER NOT NULL DEFAULT 0,
+    -- Номер последнего изменения индексируемых полей (для индекса поиска)
+    change_seq INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, order_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sequences (
+    name  TEXT    PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+USER_COLUMNS = "user_id, username, role, referrer_id"
+ORDER_COLUMNS = "order_id, user_id, status, name, details, version"
+# Максимум параметров в одном IN (...) - с запасом до лимита SQLite
+IN_CHUNK_SIZE = 500
+# COUNT(*) проходит весь диапазон индекса - O(n), а число страниц нужно при
+# каждом листании. Счетчики кешируются и сбрасываются записями этого процесса;
+# записи других процессов видны в числе страниц не позже чем через COUNT_CACHE_TTL секунд.
+COUNT_CACHE_SIZE = 4096
+COUNT_CACHE_TTL = 30
+# Счетчик изменений заказов в таблице sequences. Номер выдается в транзакции
+# записи, а писатель в SQLite один, поэтому изменения фиксируются строго по
+# возрастанию номеров, и номер последнего прочитанного изменения (high-water
+# mark) не пропускает чужие записи.
+CHANGE_SEQUENCE = "order_changes"
+
+
+def _user_from_row(row: aiosqlite.Row) -> User:
+    return User(user_id=row[0], username=row[1], role=row[2], referrer_id=row[3])
+
+
+def _order_from_row(row: aiosqlite.Row) -> Order:
+    return Order(
+        order_id=row[0], user_id=row[1], status=row[2], name=row[3], details=json.loads(row[4]), version=row[5]
+    )
+
+
+def _user_filter(role: Optional[str], username_prefix: Optional[str]) -> tuple[str, tuple]:
+    """Условие WHERE для фильтров списка пользователей."""
+    conditions, params = [], []
+    if role is not None:
+        conditions.append("role = ?")
+        params.append(role)
+    if username_prefix:
+        # Диапазон по индексу idx_users_username: символы username Telegram меньше "~"
+        conditions.append("username >= ? COLLATE NOCASE AND username < ? COLLATE NOCASE")
+        params += [username_prefix, username_prefix + "~"]
+    return " AND ".join(conditions) or "1", tuple(params)
+
+
+class SQLiteRepository(BaseRepository):
+    def __init__(self, path: str, pool_size: int = 4, cached_statements: int = 256):
+        self.path = path
+        self.pool_size = pool_size
+        self.cached_statements = cached_statements
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        # (вид, параметры...) -> COUNT(*)
+        self._counts: TTLCache = TTLCache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL)
+
+    async def _open(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path, cached_statements=self.cached_statements)
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._writer = await self._open()
+        await self._writer.executescript(SCHEMA)
+        await self._migrate()
+        await self._writer.commit()
+
+        for _ in range(self.pool_size):
+            conn = await self._open()
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+
+    async def _migrate(self) -> None:
+        """Добавляет колонки, появившиеся после создания базы."""
+        async with self._writer.execute("PRAGMA table_info(orders)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if "version" not in columns:
+            await self._writer.execute("ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        if "change_seq" not in columns:
+            await self._writer.execute("ALTER TABLE orders ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+        await self._writer.execute("CREATE INDEX IF NOT EXISTS idx_orders_change ON orders (change_seq)")
+
+    async def close(self) -> None:
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers.clear()
+        self._readers = asyncio.Queue()
+        if self._writer:
+            await self._writer.close()
+            self._writer = None
+
+    @asynccontextmanager
+    async def _read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Берет соединение для чтения из пула."""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def _write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Выдает соединение для записи и фиксирует транзакцию."""
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except Exception:
+                await self._writer.rollback()
+                raise
+
+    async def _fetchone(self, sql: str, params: tuple = ()) -> Optional[aiosqlite.Row]:
+        async with self._read() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def _fetchall(self, sql: str, params: tuple = ()) -> list[aiosqlite.Row]:
+        async with self._read() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return list(await cursor.fetchall())
+
+    async def _count(self, key: tuple, sql: str, params: tuple = ()) -> int:
+        """COUNT(*) через кеш счетчиков."""
+        count = self._counts.get(key)
+        if count is None:
+            row = await self._fetchone(sql, params)
+            count = self._counts[key] = row[0]
+        return count
+
+    def _drop_counts(self, kind: str) -> None:
+        """Сбрасывает все счетчики вида kind (фильтров немного)."""
+        for key in [key for key in self._counts if key[0] == kind]:
+            self._counts.pop(key, None)
+
+    # --- Служебные данные ---
+
+    async def init_meta(self, key: str, value: str) -> str:
+        async with self._write() as conn:
+            await conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            async with conn.execute("SELECT value FROM meta WHERE key = ?", (key,)) as cursor:
+                row = await cursor.fetchone()
+        return row[0]
+
+    async def next_sequence(self, name: str) -> int:
+        # UPDATE и SELECT выполняются в одной транзакции записи, поэтому
+        # счетчик атомарен и между несколькими процессами.
+        async with self._write() as conn:
+            await conn.execute("INSERT OR IGNORE INTO sequences (name, value) VALUES (?, 0)", (name,))
+            await conn.execute("UPDATE sequences SET value = value + 1 WHERE name = ?", (name,))
+            async with conn.execute("SELECT value FROM sequences WHERE name = ?", (name,)) as cursor:
+                row = await cursor.fetchone()
+        return row[0]
+
+    async def _next_change(self, conn: aiosqlite.Connection) -> int:
+        """Выдает номер изменения заказов в текущей транзакции записи."""
+        await conn.execute("INSERT OR IGNORE INTO sequences (name, value) VALUES (?, 0)", (CHANGE_SEQUENCE,))
+        async with conn.execute(
+            "UPDATE sequences SET value = value + 1 WHERE name = ? RETURNING value", (CHANGE_SEQUENCE,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    # --- Пользователи ---
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        row = await self._fetchone(f"SELECT {USER_COLUMNS} FROM users WHERE user_id = ?", (user_id,))
+        return _user_from_row(row) if row else None
+
+    async def add_user(self, user: User) -> None:
+        async with self._write() as conn:
+            await conn.execute(
+                "INSERT OR IGNORE INTO users (user_id, username, role, referrer_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user.user_id, user.username, user.role, user.referrer_id, time.time())
+            )
+        self._drop_counts("users")
+        self._counts.pop(("referrals", user.referrer_id), None)
+
+    async def set_username(self, user_id: int, username: Optional[str]) -> None:
+        async with self._write() as conn:
+            await conn.execute("UPDATE users SET username = ? WHERE user_id = ?", (username, user_id))
+        self._drop_counts("users")
+
+    async def set_role(self, user_id: int, role: str) -> None:
+        async with self._write() as conn:
+            await conn.execute("UPDATE users SET role = ? WHERE user_id = ?", (role, user_id))
+        self._drop_counts("users")
+
+    async def get_users_by_ids(self, user_ids: list[int]) -> list[User]:
+        users = []
+        for start in range(0, len(user_ids), IN_CHUNK_SIZE):
+            chunk = user_ids[start:start + IN_CHUNK_SIZE]
+            rows = await self._fetchall(
+                f"SELECT {USER_COLUMNS} FROM users WHERE user_id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+            )
+            users.extend(_user_from_row(row) for row in rows)
+        return users
+
+    async def count_referrals(self, referrer_id: int) -> int:
+        return await self._count(
+            ("referrals", referrer_id), "SELECT COUNT(*) FROM users WHERE referrer_id = ?", (referrer_id,)
+        )
+
+    async def get_referrals(self, referrer_id: int, cursor: Optional[int], backward: bool, limit: int) -> list[User]:
+        # Порядок регистрации - (created_at, user_id) по индексу idx_users_referrer
+        # (user_id - rowid, он входит в индекс неявно). Курсор - граничный реферал.
+        if cursor is None:
+            rows = await self._fetchall(
+                f"SELECT {USER_COLUMNS} FROM users WHERE referrer_id = ? ORDER BY created_at, user_id LIMIT ?",
+                (referrer_id, limit)
+            )
+        else:
+            rows = await self._fetchall(
+                f"SELECT {USER_COLUMNS} FROM users WHERE referrer_id = ? "
+                f"AND (created_at, user_id) {'<' if backward else '>'} "
+                f"(SELECT created_at, user_id FROM users WHERE user_id = ?) "
+                f"ORDER BY created_at {'DESC' if backward else 'ASC'}, user_id {'DESC' if backward else 'ASC'} LIMIT ?",
+                (referrer_id, cursor, limit)
+            )
+            if backward:
+                rows.reverse()
+        return [_user_from_row(row) for row in rows]
+
+    async def count_users(self, role: Optional[str] = None, username_prefix: Optional[str] = None) -> int:
+        condition, params = _user_filter(role, username_prefix)
+        return await self._count(("users", role, username_prefix), f"SELECT COUNT(*) FROM users WHERE {condition}", params)
+
+    async def get_users(
+        self, role: Optional[str], username_prefix: Optional[str], cursor: Optional[int], backward: bool, limit: int
+    ) -> list[User]:
+        condition, params = _user_filter(role, username_prefix)
+        rows = await self._fetch_page(
+            condition, params, cursor, backward, limit, descending=False,
+            table="users", columns=USER_COLUMNS, key="user_id"
+        )
+        return [_user_from_row(row) for row in rows]
+
+    async def get_user_ids(self, after: Optional[int], limit: int) -> list[int]:
+        if after is None:
+            rows = await self._fetchall("SELECT user_id FROM users ORDER BY user_id LIMIT ?", (limit,))
+        else:
+            rows = await self._fetchall(
+                "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?", (after, limit)
+            )
+        return [row[0] for row in rows]
+
+    # --- Заказы ---
+
+    async def add_order(self, order: Order) -> None:
+        async with self._write() as conn:
+            await conn.execute(
+                f"INSERT INTO orders ({ORDER_COLUMNS}, change_seq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    order.order_id, order.user_id, order.status, order.name,
+                    json.dumps(order.details, ensure_ascii=False), order.version, await self._next_change(conn)
+                )
+            )
+        self._drop_counts("orders")
+        self._counts.pop(("user_orders", order.user_id), None)
+
+    async def get_order(self, order_id: str) -> Optional[Order]:
+        row = await self._fetchone(f"SELECT {ORDER_COLUMNS} FROM orders WHERE order_id = ?", (order_id,))
+        return _order_from_row(row) if row else None
+
+    async def get_orders_by_ids(self, order_ids: list[str]) -> list[Order]:
+        orders = []
+        for start in range(0, len(order_ids), IN_CHUNK_SIZE):
+            chunk = order_ids[start:start + IN_CHUNK_SIZE]
+            rows = await self._fetchall(
+                f"SELECT {ORDER_COLUMNS} FROM orders WHERE order_id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+            )
+            orders.extend(_order_from_row(row) for row in rows)
+        return orders
+
+    async def count_user_orders(self, user_id: int) -> int:
+        return await self._count(("user_orders", user_id), "SELECT COUNT(*) FROM orders WHERE user_id = ?", (user_id,))
+
+    async def get_user_orders(self, user_id: int, cursor: Optional[str], backward: bool, limit: int) -> list:
+        rows = await self._fetch_page("user_id = ?", (user_id,), cursor, backward, limit, descending=False)
+        return [_order_from_row(row) for row in rows]
+
+    async def count_orders(self, status: Optional[str]) -> int:
+        if status:
+            return await self._count(("orders", status), "SELECT COUNT(*) FROM orders WHERE status = ?", (status,))
+        return await self._count(("orders", None), "SELECT COUNT(*) FROM orders")
+
+    async def get_orders(self, status: Optional[str], cursor: Optional[str], backward: bool, limit: int) -> list:
+        if status:
+            rows = await self._fetch_page("status = ?", (status,), cursor, backward, limit, descending=True)
+        else:
+            rows = await self._fetch_page("1", (), cursor, backward, limit, descending=True)
+        return [_order_from_row(row) for row in rows]
+
+    async def iter_orders(self, batch_size: int = 1000) -> AsyncIterator[list[Order]]:
+        cursor = None
+        while True:
+            rows = await self._fetch_page("1", (), cursor, False, batch_size, descending=False)
+            if not rows:
+                return
+            yield [_order_from_row(row) for row in rows]
+            cursor = rows[-1][0]
+
+    async def get_change_mark(self) -> int:
+        row = await self._fetchone("SELECT value FROM sequences WHERE name = ?", (CHANGE_SEQUENCE,))
+        return row[0] if row else 0
+
+    async def get_changed_orders(self, after: int, limit: int) -> list[tuple[int, Order]]:
+        rows = await self._fetchall(
+            f"SELECT {ORDER_COLUMNS}, change_seq FROM orders WHERE change_seq > ? ORDER BY change_seq LIMIT ?",
+            (after, limit)
+        )
+        return [(row[6], _order_from_row(row)) for row in rows]
+
+    async def _fetch_page(
+        self, condition: str, params: tuple, cursor: Optional[str | int], backward: bool, limit: int, descending: bool,
+        table: str = "orders", columns: str = ORDER_COLUMNS, key: str = "order_id"
+    ) -> list[aiosqlite.Row]:
+        """
+        Постраничная выборка по курсору (keyset pagination).
+        Использует индексы (user_id, order_id) / (status, order_id) / (role, user_id) вместо OFFSET.
+        Строки возвращаются в порядке отображения.
+        """
+        if cursor is None:
+            to_higher = not descending
+            sql = f"SELECT {columns} FROM {table} WHERE {condition} ORDER BY {key} {'ASC' if to_higher else 'DESC'} LIMIT ?"
+            query_params = (*params, limit)
+        else:
+            to_higher = backward == descending
+            sql = (
+                f"SELECT {columns} FROM {table} WHERE {condition} AND {key} {'>' if to_higher else '<'} ? "
+                f"ORDER BY {key} {'ASC' if to_higher else 'DESC'} LIMIT ?"
+            )
+            query_params = (*params, cursor, limit)
+
+        rows = await self._fetchall(sql, query_params)
+        # Выборка идет от курсора; разворачиваем, если порядок отображения обратный
+        if to_higher == descending:
+            rows.reverse()
+        return rows
+
+    async def set_order_status(self, order_id: str, status: str) -> bool:
+        async with self._write() as conn:
+            cursor = await conn.execute(
+                "UPDATE orders SET status = ?, version = version + 1 WHERE order_id = ?", (status, order_id)
+            )
+        self._drop_counts("orders")
+        return cursor.rowcount > 0
+
+    async def set_orders_status(self, order_ids: list[str], status: str) -> list[str]:
+        updated = []
+        # Все пачки - в одной транзакции
+        async with self._write() as conn:
+            for start in range(0, len(order_ids), IN_CHUNK_SIZE):
+                chunk = order_ids[start:start + IN_CHUNK_SIZE]
+                cursor = await conn.execute(
+                    f"UPDATE orders SET status = ?, version = version + 1 "
+                    f"WHERE order_id IN ({', '.join('?' * len(chunk))}) RETURNING order_id",
+                    (status, *chunk)
+                )
+                updated.extend(row[0] for row in await cursor.fetchall())
+        self._drop_counts("orders")
+        return updated
+
+    async def set_order_name(self, order_id: str, name: str) -> bool:
+        async with self._write() as conn:
+            cursor = await conn.execute(
+                "UPDATE orders SET name = ?, version = version + 1, change_seq = ? WHERE order_id = ?",
+                (name, await self._next_change(conn), order_id)
+            )
+            return cursor.rowcount > 0
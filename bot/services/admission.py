@@ -0,0 +1,71 @@
+from enum import IntEnum
+from typing import Any, Dict
+
+from aiogram.types import Update
+
+from bot.models.data_store import get_user_role
+from bot.services.metrics import metrics
+
+# Допуск апдейтов в очередь обработки при перегрузке.
+#
+# Каждому апдейту назначается класс приоритета (меньше - важнее):
+#   admin       - любые действия администраторов;
+#   fsm         - ответы пользователя посреди анкеты (есть состояние FSM);
+#   new_session - сообщения и команды (/start, в том числе по реферальной ссылке);
+#   navigation  - нажатия кнопок меню и пагинации.
+# ChatOrderedUpdateProcessor отдает воркерам чаты в порядке приоритета, а по
+# задержке в очереди (queue_delay - сколько ждет самый старый апдейт)
+# решает, что делать с апдейтом:
+# - задержка >= delay_threshold: навигация отбрасывается при приеме, а из
+#   нескольких нажатий одного чата в очереди выполняется только последнее;
+# - задержка >= 2 * delay_threshold: отбрасываются и новые сессии.
+# Админов и анкеты не отбрасываем никогда - они и так составляют малую долю.
+# Счетчики: updates_shed_<класс>_total, updates_collapsed_total.
+
+
+class Priority(IntEnum):
+    admin = 0
+    fsm = 1
+    new_session = 2
+    navigation = 3
+
+
+class AdmissionController:
+    def __init__(self, delay_threshold: float = 2.0):
+        # 0 - апдейты не отбрасываются, остается только порядок по приоритету
+        self.delay_threshold = delay_threshold
+        for priority in Priority:
+            metrics.inc(f"updates_shed_{priority.name}_total", 0)
+        metrics.inc("updates_collapsed_total", 0)
+
+    async def classify(self, event: Update, data: Dict[str, Any]) -> Priority:
+        """Определяет класс приоритета апдейта."""
+        user = data.get("event_from_user")
+        # Роль берется из кеша ролей data_store - запрос к хранилищу не на каждый апдейт
+        if user is not None and await get_user_role(user.id) in ("admin", "main_admin"):
+            return Priority.admin
+        if data.get("raw_state") is not None:
+            return Priority.fsm
+        if event.callback_query is not None:
+            return Priority.navigation
+        return Priority.new_session
+
+    def _overload_level(self, queue_delay: float) -> int:
+        if not self.delay_threshold:
+            return 0
+        return int(queue_delay // self.delay_threshold)
+
+    def should_shed(self, priority: Priority, queue_delay: float) -> bool:
+        """Апдейт не ставится в очередь (считается в метриках)."""
+        level = self._overload_level(queue_delay)
+        shed = (
+            (priority == Priority.navigation and level >= 1)
+            or (priority == Priority.new_session and level >= 2)
+        )
+        if shed:
+            metrics.inc(f"updates_shed_{priority.name}_total")
+        return shed
+
+    def should_collapse(self, priority: Priority, queue_delay: float) -> bool:
+        """Апдейт можно пропустить, если за ним в очереди чата есть апдейт того же класса."""
+        return priority == Priority.navigation and self._overload_level(queue_delay) >= 1
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+
+from bot.keyboards.menu_keyboards import create_broadcast_progress_keyboard
+from bot.lexicon.lexicon_ru import LEXICON
+from bot.models.data_store import iter_user_ids, count_users
+from bot.services.metrics import metrics
+from bot.services.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+# Рассылка сообщения всем пользователям.
+#
+# Получатели читаются из data_store пачками по возрастанию user_id, сообщения
+# отправляются через outbox (с его лимитами) окном не больше window штук -
+# поэтому в памяти нет ни полного списка пользователей, ни всех результатов,
+# а обычные уведомления не ждут окончания рассылки.
+#
+# Прогресс (последний user_id, все сообщения до которого обработаны, и
+# счетчики) периодически сохраняется в файл. После перезапуска рассылка
+# продолжается с этого места. При остановке и отмене еще не отправленные
+# сообщения окна снимаются с очереди outbox; повторно после перезапуска
+# могут уйти только те, что отправлялись в момент остановки.
+
+# Как часто сохранять прогресс и обновлять сообщение с ним (сек.)
+CHECKPOINT_INTERVAL = 2
+PROGRESS_INTERVAL = 3
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        # Файл прогресса остается - рассылка продолжится после перезапуска
+        logger.error("Broadcast failed", exc_info=task.exception())
+
+
+@dataclass(slots=True)
+class BroadcastState:
+    text: str
+    admin_chat_id: int
+    status_message_id: Optional[int]
+    total: int = 0
+    last_user_id: Optional[int] = None
+    delivered: int = 0
+    blocked: int = 0
+    failed: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.delivered + self.blocked + self.failed
+
+
+class Broadcaster:
+    def __init__(self, bot: Bot, outbox: Outbox, checkpoint_path: str, window: int = 50, batch_size: int = 500):
+        self.bot = bot
+        self.outbox = outbox
+        self.checkpoint_path = checkpoint_path
+        self.window = window
+        self.batch_size = batch_size
+        self.state: Optional[BroadcastState] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, text: str, admin_chat_id: int, status_message_id: Optional[int]) -> bool:
+        """Запускает новую рассылку. Возвращает False, если рассылка уже идет."""
+        if self.is_running:
+            return False
+        self.state = BroadcastState(
+            text=text, admin_chat_id=admin_chat_id, status_message_id=status_message_id, total=await count_users()
+        )
+        await self._save_checkpoint()
+        self._spawn()
+        return True
+
+    async def resume(self) -> None:
+        """Продолжает незавершенную рассылку из файла прогресса (при старте бота)."""
+        if self.is_running or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as file:
+                self.state = BroadcastState(**json.load(file))
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Cannot read broadcast checkpoint {self.checkpoint_path}: {e}")
+            return
+        logger.info(f"Resuming broadcast after user {self.state.last_user_id}")
+        self._spawn()
+
+    async def cancel(self) -> bool:
+        """Отменяет рассылку. Возвращает False, если отменять нечего."""
+        if not self.is_running:
+            return False
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._remove_checkpoint()
+        await self._update_progress(LEXICON["broadcast_status_cancelled"], final=True)
+        return True
+
+    async def stop(self) -> None:
+        """Останавливает рассылку при выключении бота, сохраняя прогресс."""
+        if not self.is_running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self._save_checkpoint()
+
+    def _spawn(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(_log_failure)
+
+    def progress_text(self, status: str) -> str:
+        state = self.state
+        return LEXICON["broadcast_progress"].format(
+            status=status,
+            processed=state.processed,
+            total=state.total,
+            delivered=state.delivered,
+            blocked=state.blocked,
+            failed=state.failed,
+        )
+
+    async def _run(self) -> None:
+        state = self.state
+        # Отправленные сообщения в порядке user_id: (user_id, Future)
+        in_flight: deque[tuple[int, asyncio.Future]] = deque()
+        last_checkpoint = last_progress = time.monotonic()
+
+        async def complete_oldest() -> None:
+            user_id, future = in_flight.popleft()
+            try:
+                await future
+                state.delivered += 1
+                metrics.inc("broadcast_delivered_total")
+            except TelegramForbiddenError:
+                state.blocked += 1
+                metrics.inc("broadcast_blocked_total")
+            except Exception:
+                state.failed += 1
+                metrics.inc("broadcast_failed_total")
+            # Окно обрабатывается по порядку, поэтому все ID до этого уже обработаны
+            state.last_user_id = user_id
+
+        try:
+            async for user_ids in iter_user_ids(after=state.last_user_id, batch_size=self.batch_size):
+                for user_id in user_ids:
+                    while len(in_flight) >= self.window or (in_flight and in_flight[0][1].done()):
+                        await complete_oldest()
+                    in_flight.append(
+                        (user_id, self.outbox.send_message(user_id, state.text, parse_mode="HTML", dead_letter=False))
+                    )
+
+                    now = time.monotonic()
+                    if now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                        await self._save_checkpoint()
+                        last_checkpoint = now
+                    if now - last_progress >= PROGRESS_INTERVAL:
+                        await self._update_progress(LEXICON["broadcast_status_running"])
+                        last_progress = now
+
+            while in_flight:
+                await complete_oldest()
+        finally:
+            # Рассылка остановлена или отменена: outbox пропустит сообщения
+            # окна, которые еще не успел отправить
+            for _, future in in_flight:
+                future.cancel()
+
+        self._remove_checkpoint()
+        logger.info(
+            f"Broadcast finished: delivered={state.delivered}, blocked={state.blocked}, failed={state.failed}"
+        )
+        await self._update_progress(LEXICON["broadcast_status_finished"], final=True)
+
+    async def _update_progress(self, status: str, final: bool = False) -> None:
+        state = self.state
+        if state.status_message_id is None:
+            return
+        try:
+            await self.bot.edit_message_text(
+                self.progress_text(status),
+                chat_id=state.admin_chat_id,
+                message_id=state.status_message_id,
+                reply_markup=create_broadcast_progress_keyboard(running=not final),
+                parse_mode="HTML",
+            )
+        except TelegramBadRequest:
+            # Текст не изменился или сообщение удалено - прогресс не критичен
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to update broadcast progress: {e}")
+
+    async def _save_checkpoint(self) -> None:
+        data = json.dumps(asdict(self.state), ensure_ascii=False)
+        await asyncio.to_thread(self._write_checkpoint, data)
+
+    def _write_checkpoint(self, data: str) -> None:
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _remove_checkpoint(self) -> None:
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
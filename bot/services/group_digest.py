@@ -0,0 +1,173 @@
+import asyncio
+import html
+import logging
+import re
+import time
+from functools import partial
+from typing import Any, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+
+from bot.lexicon.lexicon_ru import LEXICON
+from bot.services.metrics import metrics
+from bot.services.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+# Сводки о новых заявках для группового чата.
+#
+# Telegram разрешает боту ~20 сообщений в минуту в группу. Если за последние
+# window секунд в группу ничего не отправлялось, сводка уходит сразу. Иначе
+# она копится, и через window секунд все накопленное отправляется одним
+# дайджестом (или несколькими сообщениями, если не влезает в лимит длины).
+#
+# Сводки - HTML, пользовательский текст в них экранирован. Сообщения
+# собираются только из целых сводок, чтобы разметка не рвалась между
+# сообщениями. Если Telegram все же не принял дайджест (ошибка разметки,
+# слишком длинная сводка), сводки отправляются по одной, а не принятая
+# сводка - простым текстом без разметки.
+
+# Лимит длины сообщения Telegram (в UTF-16 code units)
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖➖➖➖\n\n"
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _text_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _split_long(text: str, limit: int) -> list[str]:
+    """
+    Режет слишком длинный текст по строкам (строку длиннее лимита - по символам).
+    Только для простого текста: разметка при разрезании может сломаться.
+    """
+    parts, current = [], ""
+    for line in text.split("\n"):
+        while _text_length(line) > limit:
+            cut = limit
+            while _text_length(line[:cut]) > limit:
+                cut -= 1
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:cut])
+            line = line[cut:]
+        candidate = f"{current}\n{line}" if current else line
+        if _text_length(candidate) > limit:
+            parts.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def pack_groups(items: list[str], separator: str = DIGEST_SEPARATOR, limit: int = MESSAGE_LIMIT) -> list[list[str]]:
+    """
+    Раскладывает тексты по минимальному числу сообщений не длиннее limit.
+    Тексты не разрываются: текст длиннее limit уходит отдельным сообщением.
+    """
+    groups, current, current_length = [], [], 0
+    separator_length = _text_length(separator)
+    for item in items:
+        length = _text_length(item)
+        if current and current_length + separator_length + length > limit:
+            groups.append(current)
+            current, current_length = [], 0
+        current_length += separator_length + length if current else length
+        current.append(item)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def pack_messages(items: list[str], separator: str = DIGEST_SEPARATOR, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Собирает тексты в минимальное число сообщений не длиннее limit, не разрывая тексты."""
+    return [separator.join(group) for group in pack_groups(items, separator, limit)]
+
+
+def html_to_text(text: str) -> str:
+    """Убирает HTML-разметку (для отправки простым текстом)."""
+    return html.unescape(HTML_TAG_RE.sub("", text))
+
+
+class GroupDigest:
+    def __init__(self, outbox: Outbox, chat_id: Optional[int], window: float, **send_kwargs: Any):
+        self.outbox = outbox
+        self.chat_id = chat_id
+        self.window = window
+        self.send_kwargs = send_kwargs
+        self._pending: list[str] = []
+        self._last_sent = float("-inf")
+        self._flush_task: Optional[asyncio.Task] = None
+
+        metrics.set_gauge("group_digest_pending", lambda: len(self._pending))
+
+    def add(self, text: str) -> None:
+        """Отправляет сводку сразу или откладывает ее в ближайший дайджест."""
+        if self.chat_id is None:
+            return
+        now = time.monotonic()
+        if not self._pending and now - self._last_sent >= self.window:
+            # Нагрузка низкая - отправляем без задержки
+            self._send([text])
+            return
+        self._pending.append(text)
+        if self._flush_task is None:
+            delay = max(0.0, self._last_sent + self.window - now)
+            self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        self.flush()
+
+    def flush(self) -> None:
+        """Отправляет накопленные сводки одним дайджестом."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if not self._pending:
+            return
+        items, self._pending = self._pending, []
+        metrics.inc("group_digest_batches_total")
+        self._send(items)
+
+    async def stop(self) -> None:
+        """Отправляет остаток при выключении бота (до остановки outbox)."""
+        self.flush()
+
+    def _send(self, items: list[str]) -> None:
+        self._last_sent = time.monotonic()
+        metrics.inc("group_digest_items_total", len(items))
+        if len(items) > 1:
+            items = [LEXICON["new_applications_digest_header"].format(count=len(items))] + items
+        for group in pack_groups(items):
+            self._send_group(group)
+
+    def _send_group(self, items: list[str]) -> None:
+        # Ошибку отправки обрабатывает _on_sent, поэтому без dead letters
+        future = self.outbox.send_message(
+            self.chat_id, DIGEST_SEPARATOR.join(items), dead_letter=False, **self.send_kwargs
+        )
+        future.add_done_callback(partial(self._on_sent, items))
+
+    def _on_sent(self, items: list[str], future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        if not isinstance(error, TelegramBadRequest):
+            logger.warning(f"Failed to send group digest: {error}")
+            return
+        metrics.inc("group_digest_fallbacks_total")
+        if len(items) > 1:
+            # Одна сводка не должна лишать группу всего дайджеста
+            logger.warning(f"Group digest rejected ({error}), sending {len(items)} items one by one")
+            for item in items:
+                self._send_group([item])
+            return
+        logger.warning(f"Group digest item rejected ({error}), sending as plain text")
+        kwargs = {key: value for key, value in self.send_kwargs.items() if key != "parse_mode"}
+        for part in _split_long(html_to_text(items[0]), MESSAGE_LIMIT):
+            self.outbox.send_message(self.chat_id, part, **kwargs)
@@ -0,0 +1,61 @@
+from typing import Any, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+from cachetools import LRUCache
+
+from bot.services.metrics import metrics
+
+# Редактирование сообщений без лишних запросов к Bot API.
+#
+# Кнопки "Назад", обновление страницы и повторные нажатия часто приводят к
+# edit_text с тем же текстом и клавиатурой - Telegram отвечает ошибкой
+# "message is not modified", а запрос тратит лимит. Для каждого сообщения
+# (чат, ID) запоминается хеш последнего отправленного текста и разметки.
+#
+# Хешу доверяем, только если сообщение с тех пор не менялось: вместе с ним
+# хранится текст и edit_date сообщения после нашей правки, а callback
+# приносит актуальные значения. Правки в обход этой функции (рассылка,
+# другой экземпляр бота) меняют edit_date - и запрос уйдет как обычно.
+
+EDIT_CACHE_SIZE = 10_000
+
+# (chat_id, message_id) -> (хеш содержимого, текст сообщения, edit_date)
+_last_edits: LRUCache = LRUCache(maxsize=EDIT_CACHE_SIZE)
+
+
+def _content_hash(text: str, reply_markup: Optional[InlineKeyboardMarkup], kwargs: dict[str, Any]) -> int:
+    markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup is not None else None
+    return hash((text, markup, repr(sorted(kwargs.items()))))
+
+
+async def edit_text(
+    message: Message,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    **kwargs: Any
+) -> bool:
+    """
+    Редактирует сообщение, если текст или разметка изменились.
+    Возвращает False, если сообщение уже в нужном виде (запрос не отправлялся
+    или Telegram ответил "message is not modified").
+    """
+    key = (message.chat.id, message.message_id)
+    content_hash = _content_hash(text, reply_markup, kwargs)
+    entry = _last_edits.get(key)
+    if entry is not None and entry == (content_hash, message.text, message.edit_date):
+        metrics.inc("message_edits_skipped_total")
+        return False
+
+    try:
+        result = await message.edit_text(text, reply_markup=reply_markup, **kwargs)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in e.message:
+            raise
+        metrics.inc("message_edits_not_modified_total")
+        _last_edits[key] = (content_hash, message.text, message.edit_date)
+        return False
+
+    if isinstance(result, Message):
+        _last_edits[key] = (content_hash, result.text, result.edit_date)
+    return True
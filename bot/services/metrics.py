@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Простейший реестр метрик процесса: счетчики и показатели (gauge).
+# Показатель может быть функцией - тогда значение вычисляется при чтении.
+
+
+class Metrics:
+    def __init__(self):
+        self.counters: dict[str, float] = {}
+        self.gauges: dict[str, float | Callable[[], float]] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float | Callable[[], float]) -> None:
+        self.gauges[name] = value
+
+    def snapshot(self) -> dict[str, float]:
+        """Возвращает текущие значения всех метрик."""
+        result = dict(self.counters)
+        for name, value in self.gauges.items():
+            result[name] = value() if callable(value) else value
+        return result
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        for name in sorted(self.gauges):
+            value = self.gauges[name]
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value() if callable(value) else value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+async def log_metrics_periodically(interval: float) -> None:
+    """Фоновая задача: периодически пишет метрики в лог."""
+    while True:
+        await asyncio.sleep(interval)
+        values = metrics.snapshot()
+        if values:
+            logger.info("Metrics: " + ", ".join(f"{name}={value:g}" for name, value in sorted(values.items())))
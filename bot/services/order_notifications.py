@@ -0,0 +1,131 @@
+import asyncio
+import html
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from bot.lexicon.lexicon_ru import LEXICON, ORDER_STATUSES
+from bot.models.records import Order
+from bot.services.group_digest import pack_messages
+from bot.services.metrics import metrics
+from bot.services.outbox import Outbox
+
+# Уведомления клиента об изменении заказа с задержкой (debounce).
+#
+# Админ может прощелкать несколько статусов или переименовать заказ
+# несколько раз подряд. Изменения одного заказа копятся window секунд после
+# последнего из них (но не дольше max_delay), затем клиент получает одно
+# сообщение с итоговым состоянием. Если заказ вернулся в исходное состояние,
+# уведомление не отправляется.
+#
+# Массовые изменения (bulk_status_changed) отправляются сразу: одно сообщение
+# на клиента со всеми его заказами, включая отложенные изменения этих заказов.
+
+
+@dataclass(slots=True)
+class PendingNotice:
+    client_id: int
+    initial_status: str
+    initial_name: Optional[str]
+    status: str
+    name: Optional[str]
+    first_change: float
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class OrderNotificationDebouncer:
+    def __init__(self, outbox: Outbox, window: float, max_delay: Optional[float] = None):
+        self.outbox = outbox
+        self.window = window
+        self.max_delay = max_delay if max_delay is not None else window * 3
+        self._pending: dict[str, PendingNotice] = {}
+
+        metrics.set_gauge("order_notifications_pending", lambda: len(self._pending))
+
+    def status_changed(self, order_id: str, client_id: int, old_status: str, new_status: str, name: Optional[str]) -> None:
+        notice = self._notice(order_id, client_id, old_status, name)
+        notice.status = new_status
+        self._schedule(order_id, notice)
+
+    def name_changed(self, order_id: str, client_id: int, old_name: Optional[str], new_name: str, status: str) -> None:
+        notice = self._notice(order_id, client_id, status, old_name)
+        notice.name = new_name
+        self._schedule(order_id, notice)
+
+    def _notice(self, order_id: str, client_id: int, status: str, name: Optional[str]) -> PendingNotice:
+        notice = self._pending.get(order_id)
+        if notice is None:
+            notice = self._pending[order_id] = PendingNotice(
+                client_id=client_id, initial_status=status, initial_name=name,
+                status=status, name=name, first_change=time.monotonic()
+            )
+        else:
+            metrics.inc("order_notifications_coalesced_total")
+        return notice
+
+    def _schedule(self, order_id: str, notice: PendingNotice) -> None:
+        if notice.timer is not None:
+            notice.timer.cancel()
+        # Каждое изменение откладывает отправку, но не дальше max_delay от первого
+        delay = min(self.window, notice.first_change + self.max_delay - time.monotonic())
+        notice.timer = asyncio.get_running_loop().call_later(max(0.0, delay), self._send, order_id)
+
+    def _send(self, order_id: str) -> None:
+        notice = self._pending.pop(order_id, None)
+        if notice is None:
+            return
+        if notice.timer is not None:
+            notice.timer.cancel()
+
+        status_changed = notice.status != notice.initial_status
+        name_changed = notice.name != notice.initial_name
+        if status_changed and name_changed:
+            text = LEXICON["notification_order_updated"].format(
+                order_id=order_id,
+                name=html.escape(notice.name or ""),
+                status=ORDER_STATUSES.get(notice.status, notice.status)
+            )
+        elif status_changed:
+            text = LEXICON["notification_status_changed"].format(
+                order_id=order_id, status=ORDER_STATUSES.get(notice.status, notice.status)
+            )
+        elif name_changed:
+            text = LEXICON["notification_name_changed"].format(
+                order_id=order_id, name=html.escape(notice.name or "")
+            )
+        else:
+            # Итоговое состояние совпадает с исходным - клиенту сообщать нечего
+            metrics.inc("order_notifications_skipped_total")
+            return
+        self.outbox.send_message(notice.client_id, text, parse_mode="HTML")
+
+    def bulk_status_changed(self, new_status: str, changes: list[tuple[Order, str]]) -> None:
+        """Уведомляет клиентов о массовой смене статуса: по одному сообщению на клиента."""
+        status_display = ORDER_STATUSES.get(new_status, new_status)
+        lines_by_client: dict[int, list[str]] = {}
+        for order, old_status in changes:
+            notice = self._pending.pop(order.order_id, None)
+            if notice is not None:
+                # Отложенное уведомление по этому заказу уходит в общее сообщение
+                if notice.timer is not None:
+                    notice.timer.cancel()
+                initial_status, initial_name = notice.initial_status, notice.initial_name
+            else:
+                initial_status, initial_name = old_status, order.name
+
+            name_changed = order.name != initial_name
+            if new_status == initial_status and not name_changed:
+                continue
+            line = LEXICON["notification_order_line"].format(order_id=order.order_id, status=status_display)
+            if name_changed:
+                line += LEXICON["notification_order_line_name"].format(name=html.escape(order.name or ""))
+            lines_by_client.setdefault(order.user_id, []).append(line)
+
+        for client_id, lines in lines_by_client.items():
+            for text in pack_messages([LEXICON["notification_orders_updated"], *lines], separator="\n"):
+                self.outbox.send_message(client_id, text, parse_mode="HTML")
+
+    async def stop(self) -> None:
+        """Отправляет все отложенные уведомления (при выключении бота, до остановки outbox)."""
+        for order_id in list(self._pending):
+            self._send(order_id)
@@ -0,0 +1,64 @@
+import html
+from typing import Optional
+
+from cachetools import LRUCache
+
+from bot.lexicon.lexicon_ru import LEXICON, ORDER_STATUSES, FSM_QUESTIONS
+from bot.models.records import Order, User
+
+# Кеш HTML-карточек заказов для админ-панели.
+#
+# Карточка зависит от заказа и username клиента. Запись кеша хранит версию
+# заказа (Order.version растет при каждом изменении), поэтому измененный
+# заказ - в том числе другим процессом - просто не совпадет с кешем.
+# data_store дополнительно сбрасывает записи при изменении заказа или
+# username клиента.
+
+RENDER_CACHE_SIZE = 2048
+
+# order_id -> (версия заказа, ID клиента, HTML)
+_rendered: LRUCache = LRUCache(maxsize=RENDER_CACHE_SIZE)
+
+
+def get_cached_order_details(order: Order) -> Optional[str]:
+    """Возвращает готовую карточку заказа, если она актуальна."""
+    entry = _rendered.get(order.order_id)
+    if entry is not None and entry[0] == order.version:
+        return entry[2]
+    return None
+
+
+def render_order_details(order: Order, user: Optional[User]) -> str:
+    """Формирует карточку заказа и сохраняет ее в кеш."""
+    if user and user.username:
+        user_info = f"@{user.username} (<code>{order.user_id}</code>)"
+    else:
+        user_info = f"ID: <code>{order.user_id}</code>"
+
+    details = order.details or {}
+    q_and_a = []
+    for q in FSM_QUESTIONS.get(details.get('questions_key'), []):
+        answer = html.escape(details.get(q['key'], 'N/A'))
+        q_and_a.append(f"<b>{html.escape(q['text'])}</b>\n&gt; {answer}")
+
+    text = LEXICON["admin_order_details"].format(
+        order_id=order.order_id,
+        name=html.escape(order.name or "Без названия"),
+        status=ORDER_STATUSES.get(order.status, order.status),
+        user_info=user_info,
+        service=html.escape(details.get('service_category', 'N/A')),
+        sub_service=html.escape(details.get('sub_service_category', 'N/A')),
+        questions_answers="\n\n".join(q_and_a)
+    )
+    _rendered[order.order_id] = (order.version, order.user_id, text)
+    return text
+
+
+def invalidate_order(order_id: str) -> None:
+    _rendered.pop(order_id, None)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Сбрасывает карточки заказов клиента (после смены username)."""
+    for order_id in [order_id for order_id, entry in _rendered.items() if entry[1] == user_id]:
+        del _rendered[order_id]
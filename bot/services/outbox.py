@@ -0,0 +1,276 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramMigrateToChat,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramUnauthorizedError,
+)
+
+from bot.services.metrics import metrics
+from bot.services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Очередь исходящих уведомлений с учетом лимитов Telegram.
+#
+# Хэндлеры вызывают outbox.send_message(...) и сразу продолжают работу:
+# сообщение ставится в очередь своего чата, а планировщик отправляет его,
+# когда позволяют token bucket'ы - общий (сообщений в секунду на бота) и
+# бакет чата (1/сек. для личных чатов, 20/мин. для групп). Сообщения одного
+# чата уходят строго по порядку.
+#
+# RetryAfter откладывает чат на указанное Telegram время; сетевые ошибки и
+# ошибки сервера повторяются с экспоненциальной задержкой. Если группа стала
+# супергруппой (MigrateToChat), сообщения чата один раз переотправляются в
+# новый чат, и последующие сообщения для старого ID тоже уходят туда.
+# Сообщения, которые доставить нельзя (бот заблокирован, чат не найден,
+# исчерпаны повторы), попадают в dead_letters.
+
+# Ошибки, при которых повторять отправку бессмысленно
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramUnauthorizedError)
+
+# Как часто удалять заполненные бакеты неактивных чатов (сек.)
+BUCKETS_SWEEP_INTERVAL = 60
+
+
+def _retrieve_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+@dataclass(slots=True)
+class OutboxMessage:
+    chat_id: int
+    text: str
+    kwargs: dict[str, Any]
+    future: asyncio.Future
+    dead_letter: bool = True
+    migrated: bool = False
+    attempts: int = 0
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+
+
+class Outbox:
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 30,
+        private_rate: float = 1,
+        group_rate: float = 20 / 60,
+        max_retries: int = 5,
+        retry_delay: float = 1,
+        dead_letters_limit: int = 1000,
+    ):
+        self.bot = bot
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        # Чат -> неотправленные сообщения. Пока ключ есть, чат либо ждет
+        # в расписании, либо его сообщение отправляется прямо сейчас.
+        self._queues: dict[int, deque[OutboxMessage]] = {}
+        self._buckets: dict[int, TokenBucket] = {}
+        # Старый ID группы -> ID супергруппы, в которую она перенесена
+        self._migrations: dict[int, int] = {}
+        # Куча (время готовности, порядковый номер, chat_id)
+        self._schedule: list[tuple[float, int, int]] = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._scheduler: asyncio.Task | None = None
+        self._deliveries: set[asyncio.Task] = set()
+        self.dead_letters: deque[OutboxMessage] = deque(maxlen=dead_letters_limit)
+        self.pending = 0
+
+        metrics.set_gauge("outbox_pending", lambda: self.pending)
+        metrics.set_gauge("outbox_chats_pending", lambda: len(self._queues))
+        metrics.set_gauge("outbox_dead_letters", lambda: len(self.dead_letters))
+
+    def start(self) -> None:
+        """Запускает планировщик отправки (вызывается при старте диспетчера)."""
+        if self._scheduler is None:
+            self._scheduler = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Пытается отправить оставшиеся сообщения (не дольше timeout) и останавливает планировщик."""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.pending:
+            logger.warning(f"Outbox stopped with {self.pending} undelivered messages")
+        if self._scheduler:
+            self._scheduler.cancel()
+            self._scheduler = None
+        for task in list(self._deliveries):
+            task.cancel()
+
+    def send_message(self, chat_id: int, text: str, dead_letter: bool = True, **kwargs: Any) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь и сразу возвращает Future.
+        Future получит отправленное Message или исключение, из-за которого
+        сообщение не доставлено. Ждать Future не обязательно.
+        dead_letter=False - не сохранять и не логировать недоставленное
+        сообщение (ошибку обрабатывает вызывающий код, например рассылка).
+        Если отменить Future до отправки, сообщение не будет отправлено.
+        """
+        future = asyncio.get_running_loop().create_future()
+        # Помечаем исключение как полученное, чтобы не было предупреждений
+        # для уведомлений, результат которых никто не ждет
+        future.add_done_callback(_retrieve_exception)
+        chat_id = self._migrations.get(chat_id, chat_id)
+        message = OutboxMessage(chat_id=chat_id, text=text, kwargs=kwargs, future=future, dead_letter=dead_letter)
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            self._schedule_chat(chat_id, 0)
+        queue.append(message)
+        self.pending += 1
+        return future
+
+    def _schedule_chat(self, chat_id: int, delay: float) -> None:
+        heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._sequence), chat_id))
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            # У личных чатов положительные ID, у групп и каналов - отрицательные
+            rate = self.private_rate if chat_id > 0 else self.group_rate
+            bucket = self._buckets[chat_id] = TokenBucket(rate)
+        return bucket
+
+    def _sweep_buckets(self) -> None:
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._buckets.items() if bucket.is_full(now)]:
+            if chat_id not in self._queues:
+                del self._buckets[chat_id]
+
+    async def _run(self) -> None:
+        next_sweep = time.monotonic() + BUCKETS_SWEEP_INTERVAL
+        while True:
+            now = time.monotonic()
+            if now >= next_sweep:
+                self._sweep_buckets()
+                next_sweep = now + BUCKETS_SWEEP_INTERVAL
+
+            if not self._schedule:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            ready_at, _, chat_id = self._schedule[0]
+            if ready_at > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), ready_at - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if self._drop_cancelled(chat_id):
+                # Все сообщения чата отменены - лимиты не расходуем
+                heapq.heappop(self._schedule)
+                continue
+
+            bucket = self._chat_bucket(chat_id)
+            wait = bucket.delay(now=now)
+            if wait:
+                # Лимит чата исчерпан - возвращаем чат в расписание
+                heapq.heapreplace(self._schedule, (now + wait, next(self._sequence), chat_id))
+                continue
+            wait = self.global_bucket.delay(now=now)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+
+            heapq.heappop(self._schedule)
+            bucket.consume(now=now)
+            self.global_bucket.consume(now=now)
+            task = asyncio.create_task(self._deliver(chat_id))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    def _drop_cancelled(self, chat_id: int) -> bool:
+        """Убирает из начала очереди чата отмененные сообщения. True - очередь опустела."""
+        queue = self._queues[chat_id]
+        while queue and queue[0].future.cancelled():
+            queue.popleft()
+            self.pending -= 1
+            metrics.inc("outbox_cancelled_total")
+        if queue:
+            return False
+        del self._queues[chat_id]
+        return True
+
+    async def _deliver(self, chat_id: int) -> None:
+        queue = self._queues[chat_id]
+        message = queue[0]
+        delay = 0.0
+        try:
+            result = await self.bot.send_message(message.chat_id, message.text, **message.kwargs)
+        except TelegramRetryAfter as e:
+            metrics.inc("outbox_retry_after_total")
+            delay = e.retry_after
+        except TelegramMigrateToChat as e:
+            if message.migrated:
+                self._dead_letter(queue.popleft(), e)
+            else:
+                self._migrate_chat(chat_id, e.migrate_to_chat_id)
+        except PERMANENT_ERRORS as e:
+            self._dead_letter(queue.popleft(), e)
+        except Exception as e:
+            message.attempts += 1
+            if message.attempts > self.max_retries:
+                self._dead_letter(queue.popleft(), e)
+            else:
+                metrics.inc("outbox_retries_total")
+                delay = self.retry_delay * 2 ** (message.attempts - 1)
+        else:
+            queue.popleft()
+            self.pending -= 1
+            metrics.inc("outbox_sent_total")
+            if not message.future.done():
+                message.future.set_result(result)
+        finally:
+            if queue:
+                self._schedule_chat(chat_id, delay)
+            else:
+                del self._queues[chat_id]
+
+    def _migrate_chat(self, chat_id: int, new_chat_id: int) -> None:
+        """Переносит очередь группы в супергруппу, в которую группа преобразована."""
+        logger.warning(f"Chat {chat_id} migrated to {new_chat_id}, update the chat ID in the configuration")
+        metrics.inc("outbox_migrated_total")
+        self._migrations[chat_id] = new_chat_id
+        queue = self._queues[chat_id]
+        new_queue = self._queues.get(new_chat_id)
+        if new_queue is None:
+            new_queue = self._queues[new_chat_id] = deque()
+            self._schedule_chat(new_chat_id, 0)
+        while queue:
+            message = queue.popleft()
+            message.chat_id = new_chat_id
+            message.migrated = True
+            new_queue.append(message)
+
+    def _dead_letter(self, message: OutboxMessage, error: Exception) -> None:
+        self.pending -= 1
+        message.error = f"{type(error).__name__}: {error}"
+        if message.dead_letter:
+            self.dead_letters.append(message)
+            metrics.inc("outbox_dead_letters_total")
+            logger.warning(f"Failed to deliver message to chat {message.chat_id}: {message.error}")
+        if not message.future.done():
+            message.future.set_exception(error)
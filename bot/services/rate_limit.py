@@ -0,0 +1,43 @@
+import time
+
+# Token bucket: емкость capacity токенов, пополнение rate токенов в секунду.
+# Бакет не ждет сам - он сообщает, через сколько секунд появится токен,
+# а планировщик решает, что делать с этим временем.
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, amount: float = 1, now: float | None = None) -> float:
+        """Через сколько секунд в бакете будет amount токенов (0 - уже есть)."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float = 1, now: float | None = None) -> bool:
+        """Списывает amount токенов, если они есть."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+    def is_full(self, now: float | None = None) -> bool:
+        """Бакет полон - его можно удалить без потери информации."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return self.tokens >= self.capacity
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import aiosqlite
+
+from bot.models.sqlite_repository import PRAGMAS
+from bot.services.metrics import metrics
+from bot.services.rate_limit import TokenBucket
+
+# Хранилища token bucket для антифлуда (ThrottlingMiddleware).
+# - MemoryThrottleStore - бакеты в памяти процесса (один процесс бота).
+# - SQLiteThrottleStore - бакеты в общем файле SQLite (WAL): лимит пользователя
+#   один на все процессы. Пополнение и списание выполняются одним UPSERT, поэтому
+#   одновременные апдейты из разных процессов не списывают одни и те же токены.
+#   Время - time.time(): monotonic у каждого процесса свой.
+
+
+class ThrottleStore(ABC):
+    """Базовый класс хранилища бакетов антифлуда."""
+
+    async def connect(self) -> None:
+        """Открывает соединения с хранилищем (если нужно)."""
+
+    async def close(self) -> None:
+        """Закрывает соединения с хранилищем (если нужно)."""
+
+    @abstractmethod
+    async def consume(self, key: int, cost: float, rate: float, burst: float) -> bool:
+        """Списывает cost токенов из бакета key (создается полным). False - токенов не хватает."""
+
+    @abstractmethod
+    async def sweep(self, rate: float, burst: float) -> None:
+        """Удаляет полные бакеты - они не хранят ничего, кроме значения по умолчанию."""
+
+
+class MemoryThrottleStore(ThrottleStore):
+    def __init__(self):
+        self._buckets: dict[int, TokenBucket] = {}
+        metrics.set_gauge("throttling_buckets", lambda: len(self._buckets))
+
+    async def consume(self, key: int, cost: float, rate: float, burst: float) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, capacity=burst)
+        return bucket.consume(cost)
+
+    async def sweep(self, rate: float, burst: float) -> None:
+        now = time.monotonic()
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[key]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS throttle (
+    key        INTEGER PRIMARY KEY,
+    tokens     REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Новый бакет создается полным; существующий пополняется за прошедшее время.
+# Если токенов не хватает, условие WHERE не дает обновить строку (rowcount = 0).
+CONSUME_SQL = """
+INSERT INTO throttle (key, tokens, updated_at) VALUES (:key, :burst - :cost, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:burst, tokens + max(:now - updated_at, 0) * :rate) - :cost,
+    updated_at = max(updated_at, :now)
+WHERE min(:burst, tokens + max(:now - updated_at, 0) * :rate) >= :cost
+"""
+
+
+class SQLiteThrottleStore(ThrottleStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = await aiosqlite.connect(self.path, isolation_level=None)
+        for pragma in PRAGMAS:
+            await self._conn.execute(pragma)
+        await self._conn.executescript(SCHEMA)
+
+    async def close(self) -> None:
+        if self._conn:
+            await self._conn.close()
+            self._conn = None
+
+    async def consume(self, key: int, cost: float, rate: float, burst: float) -> bool:
+        params = {"key": key, "cost": cost, "rate": rate, "burst": burst, "now": time.time()}
+        async with self._lock:
+            async with self._conn.execute(CONSUME_SQL, params) as cursor:
+                return cursor.rowcount > 0
+
+    async def sweep(self, rate: float, burst: float) -> None:
+        async with self._lock:
+            await self._conn.execute(
+                "DELETE FROM throttle WHERE tokens + (? - updated_at) * ? >= ?", (time.time(), rate, burst)
+            )
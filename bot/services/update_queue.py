@@ -0,0 +1,197 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Any, Awaitable, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Update, ErrorEvent
+
+from bot.services.admission import AdmissionController, Priority
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Параллельная обработка апдейтов с сохранением порядка внутри чата.
+#
+# Middleware регистрируется как outer middleware на dp.update (после
+# встроенных UserContext/FSM middleware) и не выполняет хэндлер сразу, а
+# ставит его в очередь своего чата. Фиксированный пул воркеров берет чаты
+# из очереди готовых: апдейты разных чатов обрабатываются параллельно,
+# а апдейты одного чата - строго по очереди (FSM-диалоги не гоняются).
+#
+# С AdmissionController (bot/services/admission.py) готовые чаты выдаются
+# воркерам по приоритету первого апдейта в очереди чата, а при большой
+# задержке в очереди апдейты низких классов отбрасываются или схлопываются.
+# Задержка (queue_delay) - сколько ждет самый старый апдейт в очереди прямо
+# сейчас: как только очередь разобрана, она равна 0 и отбрасывание
+# прекращается. Отброшенные нажатия кнопок получают пустой ответ, чтобы
+# кнопка у пользователя не "висела".
+
+Handler = Callable[[Update, Dict[str, Any]], Awaitable[Any]]
+# Элемент очереди чата: (хэндлер, апдейт, данные, номер в очереди, приоритет)
+QueueItem = tuple[Handler, Update, Dict[str, Any], int, Priority]
+
+
+class ChatOrderedUpdateProcessor(BaseMiddleware):
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        concurrency: int = 32,
+        max_pending: int = 10_000,
+        admission: Optional[AdmissionController] = None,
+    ):
+        self.dispatcher = dispatcher
+        self.concurrency = concurrency
+        self.admission = admission
+        # Ограничение числа апдейтов в очередях: при переполнении получение
+        # новых апдейтов (polling/webhook) ждет, пока очередь не разгрузится
+        self._capacity = asyncio.Semaphore(max_pending)
+        # Чат -> его необработанные апдейты. Ключ есть, пока у чата есть
+        # апдейты в очереди или один из них обрабатывается.
+        self._chats: dict[Any, deque[QueueItem]] = {}
+        # Чаты, готовые к обработке (не обрабатываются прямо сейчас):
+        # (приоритет первого апдейта, порядковый номер, чат)
+        self._ready: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        # Номер апдейта в очереди -> время постановки, в порядке постановки.
+        # Первый элемент - самый старый ожидающий апдейт (для queue_delay).
+        self._waiting: OrderedDict[int, float] = OrderedDict()
+        self._workers: list[asyncio.Task] = []
+        # Ответы на отброшенные нажатия кнопок (не задерживают прием апдейтов)
+        self._answers: set[asyncio.Task] = set()
+        self.pending = 0
+        self.in_progress = 0
+
+        metrics.set_gauge("updates_pending", lambda: self.pending)
+        metrics.set_gauge("updates_in_progress", lambda: self.in_progress)
+        metrics.set_gauge("updates_chats_pending", lambda: len(self._chats))
+        metrics.set_gauge("updates_queue_delay_seconds", lambda: round(self.queue_delay, 4))
+
+    @property
+    def queue_delay(self) -> float:
+        """Сколько ждет в очереди самый старый апдейт (сек., 0 - очередь пуста)."""
+        if not self._waiting:
+            return 0.0
+        return time.monotonic() - next(iter(self._waiting.values()))
+
+    def start(self) -> None:
+        """Запускает воркеры (вызывается при старте диспетчера)."""
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Дожидается обработки очереди (не дольше timeout) и останавливает воркеры."""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    @staticmethod
+    def _chat_key(data: Dict[str, Any]) -> Optional[Any]:
+        chat = data.get("event_chat")
+        if chat is not None:
+            return chat.id
+        user = data.get("event_from_user")
+        if user is not None:
+            return ("user", user.id)
+        return None
+
+    async def __call__(self, handler: Handler, event: Update, data: Dict[str, Any]) -> Any:
+        key = self._chat_key(data)
+        if key is None:
+            # Апдейты без чата и пользователя (опросы и т.п.) порядок не требуют
+            return await handler(event, data)
+
+        priority = Priority.admin
+        if self.admission is not None:
+            priority = await self.admission.classify(event, data)
+            if self.admission.should_shed(priority, self.queue_delay):
+                self._answer_dropped(event, data)
+                return None
+
+        await self._capacity.acquire()
+        self.pending += 1
+        queue = self._chats.get(key)
+        if queue is None:
+            queue = self._chats[key] = deque()
+            self._put_ready(key, priority)
+        number = next(self._sequence)
+        self._waiting[number] = time.monotonic()
+        queue.append((handler, event, data, number, priority))
+        return None
+
+    def _put_ready(self, key: Any, priority: Priority) -> None:
+        self._ready.put_nowait((priority, next(self._sequence), key))
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, key = await self._ready.get()
+            queue = self._chats[key]
+            handler, event, data, number, priority = queue.popleft()
+            del self._waiting[number]
+
+            # При перегрузке из нескольких нажатий чата выполняется только последнее
+            collapse = (
+                self.admission is not None and self.admission.should_collapse(priority, self.queue_delay)
+                and any(item[4] == priority for item in queue)
+            )
+            self.in_progress += 1
+            try:
+                if collapse:
+                    metrics.inc("updates_collapsed_total")
+                    self._answer_dropped(event, data)
+                else:
+                    await self._process(handler, event, data)
+            finally:
+                self.in_progress -= 1
+                self.pending -= 1
+                self._capacity.release()
+                if queue:
+                    self._put_ready(key, queue[0][4])
+                else:
+                    del self._chats[key]
+
+    def _answer_dropped(self, event: Update, data: Dict[str, Any]) -> None:
+        """Отвечает на отброшенное нажатие кнопки в фоне."""
+        bot: Optional[Bot] = data.get("bot")
+        if event.callback_query is None or bot is None:
+            return
+        task = asyncio.create_task(self._answer_callback(bot, event.callback_query.id))
+        self._answers.add(task)
+        task.add_done_callback(self._answers.discard)
+
+    @staticmethod
+    async def _answer_callback(bot: Bot, callback_query_id: str) -> None:
+        try:
+            await bot.answer_callback_query(callback_query_id)
+        except TelegramAPIError as e:
+            logger.warning(f"Failed to answer dropped callback query: {e}")
+
+    async def _process(self, handler: Handler, event: Update, data: Dict[str, Any]) -> None:
+        state = data.get("state")
+        if state is not None:
+            # Состояние FSM было прочитано при постановке в очередь;
+            # предыдущие апдейты этого чата могли его изменить
+            data["raw_state"] = await state.get_state()
+        try:
+            await handler(event, data)
+            metrics.inc("updates_processed_total")
+        except Exception as e:
+            metrics.inc("updates_failed_total")
+            # Встроенный ErrorsMiddleware снаружи этой очереди, поэтому
+            # передаем ошибку в обработчики ошибок диспетчера сами
+            try:
+                response = await self.dispatcher.propagate_event(
+                    update_type="error", event=ErrorEvent(update=event, exception=e), **data
+                )
+            except Exception:
+                logger.exception(f"Error handler failed for update id={event.update_id}")
+                return
+            if response is UNHANDLED:
+                logger.exception(f"Unhandled exception in update id={event.update_id}", exc_info=e)
@@ -0,0 +1,25 @@
+import asyncio
+import csv
+from typing import Optional
+
+from bot.models.data_store import iter_users
+
+# Выгрузка списка пользователей в CSV для админ-панели.
+# Пользователи читаются из хранилища пачками и сразу пишутся в файл,
+# поэтому в памяти одновременно только одна пачка (подходит и для 100k+).
+
+CSV_COLUMNS = ("user_id", "username", "role", "referrer_id")
+
+
+async def export_users_csv(path: str, role: Optional[str] = None, username_prefix: Optional[str] = None) -> int:
+    """Записывает пользователей (с фильтрами) в CSV-файл. Возвращает число записей."""
+    count = 0
+    # utf-8-sig - чтобы Excel правильно определил кодировку
+    with open(path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        async for users in iter_users(role, username_prefix):
+            rows = [(user.user_id, user.username or "", str(user.role), user.referrer_id or "") for user in users]
+            await asyncio.to_thread(writer.writerows, rows)
+            count += len(rows)
+    return count
@@ -9,6 +9,9 @@ class ApplicationStates(StatesGroup):
 # Состояния для админских действий
 class AdminStates(StatesGroup):
     waiting_for_user_id_to_grant = State() # Ожидание ввода ID для выдачи прав
+    waiting_for_broadcast_text = State()   # Ожидание текста рассылки
+    confirming_broadcast = State()         # Подтверждение рассылки
+    waiting_for_username_prefix = State()  # Ожидание начала ника для поиска пользователей
 
 # Состояния для управления заказами в админ-панели
 class AdminOrderStates(StatesGroup):
@@ -16,3 +19,4 @@ class AdminOrderStates(StatesGroup):
     viewing_order = State()         # Просмотр конкретного заказа
     changing_status = State()       # Выбор нового статуса
     setting_name = State()          # Ожидание ввода нового названия
+    searching = State()             # Ожидание поискового запроса
@@ -0,0 +1,5 @@
+import os
+
+# bot.config читает обязательные переменные окружения при импорте
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("MAIN_ADMIN_ID", "1")
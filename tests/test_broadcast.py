@@ -0,0 +1,127 @@
+import asyncio
+import json
+from dataclasses import asdict
+from unittest.mock import MagicMock
+
+from bot.models import data_store
+from bot.models.memory_repository import MemoryRepository
+from bot.models.records import User
+from bot.services.broadcast import Broadcaster, BroadcastState
+from bot.services.outbox import Outbox
+
+USERS = list(range(1, 21))
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent: list[int] = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(chat_id)
+        return chat_id
+
+
+async def _repository() -> MemoryRepository:
+    repository = MemoryRepository()
+    await repository.connect()
+    for user_id in USERS:
+        await repository.add_user(User(user_id=user_id, username=None, role="client", referrer_id=None))
+    return repository
+
+
+def _broadcaster(bot: RecordingBot, path, global_rate: float) -> Broadcaster:
+    outbox = Outbox(MagicMock(send_message=bot.send_message), global_rate=global_rate, private_rate=1000)
+    return Broadcaster(MagicMock(), outbox, str(path), window=5, batch_size=3)
+
+
+async def _finish(broadcaster: Broadcaster) -> None:
+    await asyncio.wait_for(broadcaster._task, timeout=2)
+    await broadcaster.outbox.stop(timeout=0)
+
+
+def test_cancel_drops_queued_messages_of_the_window(monkeypatch, tmp_path):
+    async def scenario():
+        monkeypatch.setattr(data_store, "repository", await _repository())
+        bot = RecordingBot()
+        # 2 сообщения сразу, дальше по одному в 0.5 сек.
+        broadcaster = _broadcaster(bot, tmp_path / "broadcast.json", global_rate=2)
+        broadcaster.outbox.start()
+        await broadcaster.start("hello", admin_chat_id=1, status_message_id=None)
+        await asyncio.sleep(0.05)
+
+        assert await broadcaster.cancel()
+        sent = list(bot.sent)
+        await asyncio.sleep(0.3)
+        await broadcaster.outbox.stop(timeout=1)
+        return broadcaster, bot, sent
+
+    broadcaster, bot, sent = asyncio.run(scenario())
+
+    assert bot.sent == sent
+    assert len(sent) < len(USERS)
+    assert broadcaster.outbox.pending == 0
+    assert not (tmp_path / "broadcast.json").exists()
+
+
+def test_resume_continues_after_the_checkpoint(monkeypatch, tmp_path):
+    path = tmp_path / "broadcast.json"
+    state = BroadcastState(
+        text="hello", admin_chat_id=1, status_message_id=None, total=20, last_user_id=12, delivered=11, blocked=1
+    )
+    path.write_text(json.dumps(asdict(state)), encoding="utf-8")
+
+    async def scenario():
+        monkeypatch.setattr(data_store, "repository", await _repository())
+        bot = RecordingBot()
+        broadcaster = _broadcaster(bot, path, global_rate=1000)
+        broadcaster.outbox.start()
+        await broadcaster.resume()
+        await _finish(broadcaster)
+        return broadcaster, bot
+
+    broadcaster, bot = asyncio.run(scenario())
+
+    assert bot.sent == USERS[12:]
+    assert broadcaster.state.delivered == 19
+    assert broadcaster.state.blocked == 1
+    assert broadcaster.state.processed == 20
+    assert not path.exists()
+
+
+def test_stopped_broadcast_resumes_in_a_new_process(monkeypatch, tmp_path):
+    path = tmp_path / "broadcast.json"
+
+    async def first_run():
+        monkeypatch.setattr(data_store, "repository", await _repository())
+        bot = RecordingBot()
+        # 5 сообщений сразу, дальше по одному в 0.2 сек.
+        broadcaster = _broadcaster(bot, path, global_rate=5)
+        broadcaster.outbox.start()
+        await broadcaster.start("hello", admin_chat_id=1, status_message_id=None)
+        await asyncio.sleep(0.3)
+        await broadcaster.stop()
+        await broadcaster.outbox.stop(timeout=1)
+        return bot.sent
+
+    async def second_run():
+        monkeypatch.setattr(data_store, "repository", await _repository())
+        bot = RecordingBot()
+        broadcaster = _broadcaster(bot, path, global_rate=1000)
+        broadcaster.outbox.start()
+        await broadcaster.resume()
+        await _finish(broadcaster)
+        return broadcaster, bot.sent
+
+    first = asyncio.run(first_run())
+    checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    second_broadcaster, second = asyncio.run(second_run())
+
+    # Сообщения окна, не отправленные до остановки, уходят только после перезапуска
+    assert 0 < len(first) < len(USERS)
+    assert first == USERS[:len(first)]
+    assert second == USERS[checkpoint["last_user_id"]:]
+    assert set(first) | set(second) == set(USERS)
+    # Повторно может уйти только сообщение, отправленное в момент остановки
+    assert len(set(first) & set(second)) <= 1
+    assert second_broadcaster.state.delivered == len(USERS)
+    assert not path.exists()
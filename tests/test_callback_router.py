@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from aiogram import Dispatcher, F, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from bot.keyboards.callbacks import AdminOrder, MyOrdersPage, OrderAction
+from bot.middlewares.callback_router import CallbackRouter
+
+ADMIN_ID = 1
+CLIENT_ID = 2
+
+
+def _build_dispatcher(indexed: bool) -> Dispatcher:
+    dp = Dispatcher(storage=MemoryStorage())
+    admin = Router(name="admin")
+    admin.callback_query.filter(F.from_user.id == ADMIN_ID)
+    client = Router(name="client")
+
+    @admin.callback_query(F.data == "menu")
+    async def admin_menu(callback: CallbackQuery):
+        return "admin_menu"
+
+    @admin.callback_query(AdminOrder.filter(F.action == OrderAction.view))
+    async def admin_order(callback: CallbackQuery, callback_data: AdminOrder):
+        return f"admin_order:{callback_data.order_id}"
+
+    @admin.callback_query(F.data.startswith("service_"))
+    async def admin_service(callback: CallbackQuery):
+        return "admin_service"
+
+    @client.callback_query(F.data == "menu")
+    async def client_menu(callback: CallbackQuery):
+        return "client_menu"
+
+    @client.callback_query(MyOrdersPage.filter(F.page > 1))
+    async def orders_page(callback: CallbackQuery, callback_data: MyOrdersPage):
+        return f"page:{callback_data.page}"
+
+    @client.callback_query(F.data == "skip")
+    async def skipped(callback: CallbackQuery):
+        raise SkipHandler()
+
+    # Фильтр, который не попадает в индекс: проверяется для любого нажатия
+    @client.callback_query(lambda callback: callback.data.endswith("!") or callback.data == "skip")
+    async def unindexed(callback: CallbackQuery):
+        return "unindexed"
+
+    async def tag(handler, event, data):
+        return f"{await handler(event, data)}+inner"
+
+    client.callback_query.middleware(tag)
+    dp.include_router(admin)
+    dp.include_router(client)
+    if indexed:
+        dp.callback_query.outer_middleware(CallbackRouter(dp))
+    return dp
+
+
+def _dispatch(dp: Dispatcher, user_id: int, data: str):
+    chat = Chat(id=user_id, type="private")
+    callback = CallbackQuery(
+        id="1", from_user=User(id=user_id, is_bot=False, first_name="user"), chat_instance="1",
+        message=Message(message_id=1, date=datetime.now(), chat=chat, text="menu"), data=data
+    )
+    return asyncio.run(dp.propagate_event(
+        update_type="callback_query", event=callback,
+        event_from_user=callback.from_user, event_chat=chat, state=None, raw_state=None
+    ))
+
+
+@pytest.mark.parametrize("user_id", [ADMIN_ID, CLIENT_ID])
+@pytest.mark.parametrize("data", [
+    "menu",
+    AdminOrder(action=OrderAction.view, order_id="A1B2C3").pack(),
+    AdminOrder(action=OrderAction.set_name, order_id="A1B2C3").pack(),
+    "service_audit",
+    MyOrdersPage(page=2, backward=False, cursor="A1B2C3").pack(),
+    MyOrdersPage(page=1, backward=False, cursor="A1B2C3").pack(),
+    "skip",
+    "menu!",
+    "unknown",
+])
+def test_index_picks_the_same_handler_as_aiogram(user_id, data):
+    expected = _dispatch(_build_dispatcher(indexed=False), user_id, data)
+    assert _dispatch(_build_dispatcher(indexed=True), user_id, data) == expected
+
+
+def test_expected_handlers():
+    dp = _build_dispatcher(indexed=True)
+    assert _dispatch(dp, ADMIN_ID, "menu") == "admin_menu"
+    # Фильтр роутера не пропустил клиента - следующий подходящий хэндлер
+    assert _dispatch(dp, CLIENT_ID, "menu") == "client_menu+inner"
+    assert _dispatch(dp, CLIENT_ID, MyOrdersPage(page=3, backward=True, cursor="X").pack()) == "page:3+inner"
+    assert _dispatch(dp, CLIENT_ID, "skip") == "unindexed+inner"
+    assert _dispatch(dp, CLIENT_ID, "unknown") is UNHANDLED
+
+
+def test_candidates_are_looked_up_by_key():
+    dp = _build_dispatcher(indexed=True)
+    index = next(m for m in dp.callback_query.outer_middleware if isinstance(m, CallbackRouter))
+
+    def names(data: str) -> list[str]:
+        return [route.handler.callback.__name__ for route in index.candidates(data)]
+
+    assert names("menu") == ["admin_menu", "client_menu", "unindexed"]
+    assert names(MyOrdersPage(page=2, backward=False, cursor="X").pack()) == ["orders_page", "unindexed"]
+    assert names("service_x") == ["admin_service", "unindexed"]
+    assert names("other") == ["unindexed"]
+
+
+def test_index_is_disabled_for_routers_with_outer_middleware():
+    dp = Dispatcher(storage=MemoryStorage())
+    router = Router()
+
+    async def outer(handler, event, data):
+        return await handler(event, data)
+
+    router.callback_query.outer_middleware(outer)
+    dp.include_router(router)
+    assert not CallbackRouter(dp).enabled
@@ -0,0 +1,51 @@
+import pytest
+from aiogram.filters.callback_data import CallbackData
+
+from bot.keyboards import callbacks
+from bot.keyboards.callbacks import (
+    AdminOrder, AdminOrdersPage, MyOrdersPage, OrderAction, OrderFilter, ReferralsPage, SetOrderStatus,
+)
+from bot.lexicon.lexicon_ru import ORDER_STATUSES
+
+# Лимит Telegram на callback_data
+CALLBACK_DATA_LIMIT = 64
+RETIRED_PREFIXES = {"3"}
+
+FACTORIES = [
+    value for value in vars(callbacks).values()
+    if isinstance(value, type) and issubclass(value, CallbackData) and value is not CallbackData
+]
+
+
+def test_prefixes_are_unique_and_not_reused():
+    prefixes = [factory.__prefix__ for factory in FACTORIES]
+    assert len(prefixes) == len(set(prefixes))
+    assert not RETIRED_PREFIXES & set(prefixes)
+
+
+@pytest.mark.parametrize("data", [
+    MyOrdersPage(page=12, backward=True, cursor="ZZZZZZ"),
+    ReferralsPage(page=3, backward=False, cursor=9_999_999_999),
+    AdminOrdersPage(page=1, backward=False, cursor="A1B2C3"),
+    AdminOrder(action=OrderAction.change_status, order_id="A1B2C3"),
+    OrderFilter(status=None),
+    OrderFilter(status="in_progress"),
+])
+def test_pack_round_trip(data):
+    packed = data.pack()
+    assert len(packed.encode()) <= CALLBACK_DATA_LIMIT
+    assert type(data).unpack(packed) == data
+
+
+def test_longest_status_fits_the_limit():
+    longest = max(ORDER_STATUSES, key=len)
+    assert len(SetOrderStatus(order_id="ZZZZZZ", status=longest).pack().encode()) <= CALLBACK_DATA_LIMIT
+
+
+def test_foreign_payload_does_not_unpack():
+    packed = MyOrdersPage(page=1, backward=False, cursor="AAAAAA").pack()
+    with pytest.raises((TypeError, ValueError)):
+        AdminOrdersPage.unpack(packed)
+    # Кнопка со старым кодом страницы рефералов
+    with pytest.raises((TypeError, ValueError)):
+        ReferralsPage.unpack("3:2")
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from aiogram.types import Chat, Message, Update, User
+
+from bot.services.update_queue import ChatOrderedUpdateProcessor
+
+
+def _message_update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(id=chat_id, type="private")
+    user = User(id=chat_id, is_bot=False, first_name="Test")
+    return Update(
+        update_id=update_id,
+        message=Message(message_id=update_id, date=datetime.now(), chat=chat, from_user=user, text="hi"),
+    )
+
+
+def _data(update: Update, **extra) -> dict:
+    return {"event_chat": update.message.chat, "event_from_user": update.message.from_user, "bot": MagicMock(), **extra}
+
+
+class FakeState:
+    def __init__(self):
+        self.state = None
+
+    async def get_state(self):
+        return self.state
+
+
+async def _process(processor: ChatOrderedUpdateProcessor, handler, updates: list[tuple[Update, dict]]) -> None:
+    processor.start()
+    for update, data in updates:
+        await processor(handler, update, data)
+    await processor.stop(timeout=1)
+
+
+def test_updates_of_one_chat_are_processed_in_order():
+    seen = []
+
+    async def handler(event, data):
+        # Первый апдейт дольше остальных: без очереди чата порядок бы нарушился
+        await asyncio.sleep(0.02 if event.update_id == 1 else 0)
+        seen.append(event.update_id)
+
+    updates = [_message_update(update_id, chat_id=10) for update_id in range(1, 6)]
+    processor = ChatOrderedUpdateProcessor(MagicMock(), concurrency=4)
+    asyncio.run(_process(processor, handler, [(update, _data(update)) for update in updates]))
+
+    assert seen == [1, 2, 3, 4, 5]
+
+
+def test_different_chats_are_processed_concurrently():
+    running = 0
+    max_running = 0
+
+    async def handler(event, data):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+
+    updates = [_message_update(update_id, chat_id=update_id) for update_id in range(1, 5)]
+    processor = ChatOrderedUpdateProcessor(MagicMock(), concurrency=2)
+    asyncio.run(_process(processor, handler, [(update, _data(update)) for update in updates]))
+
+    # Не больше воркеров, но и не по одному
+    assert max_running == 2
+
+
+def test_fsm_state_is_reread_before_processing():
+    state = FakeState()
+    seen = []
+
+    async def handler(event, data):
+        seen.append(data["raw_state"])
+        state.state = f"step{event.update_id}"
+
+    # Оба апдейта поставлены в очередь до обработки первого
+    updates = [_message_update(update_id, chat_id=10) for update_id in (1, 2)]
+    processor = ChatOrderedUpdateProcessor(MagicMock(), concurrency=2)
+    items = [(update, _data(update, state=state, raw_state=None)) for update in updates]
+    asyncio.run(_process(processor, handler, items))
+
+    assert seen == [None, "step1"]
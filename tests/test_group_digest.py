@@ -0,0 +1,58 @@
+import asyncio
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendMessage
+
+from bot.services.group_digest import DIGEST_SEPARATOR, GroupDigest, html_to_text, pack_groups, pack_messages
+
+
+class FakeOutbox:
+    """Принимает сообщения; HTML с "BROKEN" или длиннее лимита Telegram отклоняет."""
+
+    def __init__(self):
+        self.sent: list[tuple[str, dict]] = []
+
+    def send_message(self, chat_id: int, text: str, dead_letter: bool = True, **kwargs) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.sent.append((text, kwargs))
+        if kwargs.get("parse_mode") == "HTML" and ("BROKEN" in text or len(text) > 4096):
+            future.set_exception(TelegramBadRequest(SendMessage(chat_id=chat_id, text=""), "can't parse entities"))
+        else:
+            future.set_result(None)
+        return future
+
+
+def _send(items: list[str]) -> list[tuple[str, dict]]:
+    async def scenario():
+        outbox = FakeOutbox()
+        GroupDigest(outbox, -100, window=10, parse_mode="HTML")._send(items)
+        await asyncio.sleep(0)
+        return outbox.sent
+
+    return asyncio.run(scenario())
+
+
+def test_items_are_never_split():
+    items = ["a" * 3000, "b" * 3000, "c" * 10, "d" * 5000, "e"]
+    assert [len(group) for group in pack_groups(items, limit=4096)] == [1, 2, 1, 1]
+    assert pack_messages(["x", "y"], separator="|") == ["x|y"]
+
+
+def test_rejected_digest_is_resent_item_by_item():
+    sent = _send(["<b>one</b>", "<b>BROKEN</b> &lt;x&gt;", "<b>three</b>"])
+    texts = [text for text, _ in sent]
+    # Дайджест, затем заголовок и сводки по одной, затем отклоненная сводка - простым текстом
+    assert DIGEST_SEPARATOR in texts[0]
+    assert texts[2:5] == ["<b>one</b>", "<b>BROKEN</b> &lt;x&gt;", "<b>three</b>"]
+    assert sent[-1] == ("BROKEN <x>", {})
+
+
+def test_oversized_item_goes_out_as_plain_text_parts():
+    sent = _send(["<b>long</b>\n" + "y" * 5000])
+    plain = [text for text, kwargs in sent if "parse_mode" not in kwargs]
+    assert "".join(plain).replace("\n", "") == "long" + "y" * 5000
+    assert all(len(text) <= 4096 for text in plain)
+
+
+def test_html_to_text():
+    assert html_to_text("<b>Клиент:</b> @a&amp;b [<code>1</code>]") == "Клиент: @a&b [1]"
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+from bot.models.journal import Journal
+from bot.models.journal_repository import JournaledMemoryRepository
+from bot.models.records import Order, User
+
+
+def _order(order_id: str) -> Order:
+    return Order(order_id=order_id, user_id=1, status="new", name=None, details={})
+
+
+async def _crash(repository: JournaledMemoryRepository) -> None:
+    """Останавливает хранилище без финального снимка (как при сбое процесса)."""
+    repository._snapshot_task.cancel()
+    await repository.journal.close()
+
+
+async def _reopen(directory: str) -> JournaledMemoryRepository:
+    repository = JournaledMemoryRepository(directory, flush_interval=0)
+    await repository.connect()
+    return repository
+
+
+def test_journal_is_replayed_after_crash(tmp_path):
+    async def scenario():
+        repository = await _reopen(str(tmp_path))
+        await repository.add_user(User(user_id=1, username="alice", role="client", referrer_id=None))
+        await repository.add_order(_order("AAAAA1"))
+        await repository.set_order_status("AAAAA1", "completed")
+        await repository.set_order_name("AAAAA1", "Аудит")
+        await repository.next_sequence("order_id")
+        await _crash(repository)
+
+        restored = await _reopen(str(tmp_path))
+        try:
+            return (
+                await restored.get_user(1), await restored.get_order("AAAAA1"),
+                await restored.count_orders("completed"), await restored.next_sequence("order_id"),
+            )
+        finally:
+            await restored.close()
+
+    user, order, completed, sequence = asyncio.run(scenario())
+    assert user.username == "alice"
+    assert (order.status, order.name) == ("completed", "Аудит")
+    # Индексы перестроены после восстановления
+    assert completed == 1
+    assert sequence == 2
+
+
+def test_snapshot_plus_journal_tail(tmp_path):
+    async def scenario():
+        repository = await _reopen(str(tmp_path))
+        await repository.add_order(_order("AAAAA1"))
+        await repository.snapshot()
+        await repository.add_order(_order("AAAAA2"))
+        await _crash(repository)
+        segments = len(Journal(str(tmp_path)).segments())
+
+        restored = await _reopen(str(tmp_path))
+        try:
+            return segments, sorted(restored.orders)
+        finally:
+            await restored.close()
+
+    segments, orders = asyncio.run(scenario())
+    # Сегменты до снимка удалены
+    assert segments == 1
+    assert orders == ["AAAAA1", "AAAAA2"]
+
+
+def test_torn_record_is_skipped(tmp_path):
+    async def scenario():
+        repository = await _reopen(str(tmp_path))
+        await repository.add_order(_order("AAAAA1"))
+        await _crash(repository)
+        _, path = Journal(str(tmp_path)).segments()[-1]
+        with open(path, "a", encoding="utf-8") as file:
+            file.write('[2,"order",{"order_id":"AAA')
+
+        restored = await _reopen(str(tmp_path))
+        try:
+            await restored.add_order(_order("AAAAA2"))
+            return sorted(restored.orders)
+        finally:
+            await restored.close()
+
+    assert asyncio.run(scenario()) == ["AAAAA1", "AAAAA2"]
+
+
+def test_close_resolves_appends_of_an_interrupted_flush(tmp_path):
+    async def scenario():
+        journal = Journal(str(tmp_path), flush_interval=0)
+        journal.open()
+        write = journal._write
+
+        def slow_write(data: str) -> None:
+            time.sleep(0.1)
+            write(data)
+
+        journal._write = slow_write
+        first = asyncio.create_task(journal.append("meta", "a", "1"))
+        await asyncio.sleep(0.03)
+        # Сброс прерван посреди записи (например, при остановке цикла событий)
+        journal._flush_task.cancel()
+        await asyncio.sleep(0)
+        second = asyncio.create_task(journal.append("meta", "b", "2"))
+        await asyncio.sleep(0)
+        await journal.close()
+        results = await asyncio.wait_for(asyncio.gather(first, second), timeout=1)
+        return results, [record[0] for record in Journal(str(tmp_path)).read(1)]
+
+    results, records = asyncio.run(scenario())
+    assert results == [None, None]
+    assert records == [1, 2]
+
+
+def test_replay_of_changes_in_the_snapshot_keeps_versions(tmp_path):
+    async def scenario():
+        repository = await _reopen(str(tmp_path))
+        for order_id in ("AAAAA1", "AAAAA2"):
+            await repository.add_order(_order(order_id))
+
+        rotate = repository.journal.rotate
+
+        async def rotate_during_changes():
+            # Изменения после начала снимка попадают и в снимок, и в хвост журнала
+            start = await rotate()
+            await repository.set_order_status("AAAAA1", "completed")
+            await repository.set_order_name("AAAAA1", "Аудит")
+            await repository.set_orders_status(["AAAAA1", "AAAAA2"], "archived")
+            return start
+
+        repository.journal.rotate = rotate_during_changes
+        await repository.snapshot()
+        versions = {order_id: order.version for order_id, order in repository.orders.items()}
+        await _crash(repository)
+
+        restored = await _reopen(str(tmp_path))
+        try:
+            return versions, {order_id: order.version for order_id, order in restored.orders.items()}
+        finally:
+            await restored.close()
+
+    versions, restored = asyncio.run(scenario())
+    assert versions == {"AAAAA1": 3, "AAAAA2": 1}
+    assert restored == versions
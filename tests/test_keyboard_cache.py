@@ -0,0 +1,38 @@
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from cachetools import LRUCache
+
+from bot.keyboards import cache
+
+TEXTS = {"menu": "Меню"}
+
+
+def _markup(text: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=text, callback_data="menu")]])
+
+
+def test_invalidate_rebuilds_keyboards_with_new_texts(monkeypatch):
+    monkeypatch.setattr(cache, "_static_builders", [])
+    monkeypatch.setattr(cache, "_static_markups", {})
+    monkeypatch.setattr(cache, "_markups", LRUCache(maxsize=10))
+
+    @cache.static_keyboard
+    def main_menu():
+        return _markup(TEXTS["menu"])
+
+    @cache.cached_keyboard
+    def order_menu(order_id):
+        return _markup(f"{TEXTS['menu']} {order_id}")
+
+    cache.warm_keyboard_cache()
+    static, cached = main_menu(), order_menu("AAAAA1")
+    assert main_menu() is static
+    assert order_menu("AAAAA1") is cached
+
+    monkeypatch.setitem(TEXTS, "menu", "Главное меню")
+    cache.invalidate_keyboard_cache()
+
+    # Статическая клавиатура пересобрана сразу, параметризованная - при запросе
+    assert len(cache._static_markups) == 1
+    assert len(cache._markups) == 0
+    assert main_menu().inline_keyboard[0][0].text == "Главное меню"
+    assert order_menu("AAAAA1").inline_keyboard[0][0].text == "Главное меню AAAAA1"
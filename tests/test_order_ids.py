@@ -0,0 +1,35 @@
+import re
+
+import pytest
+
+from bot.models.order_ids import ID_SPACE, OrderIdAllocator
+
+KEY = bytes(range(16))
+
+
+def test_ids_are_unique_and_well_formed():
+    allocator = OrderIdAllocator(KEY)
+    ids = [allocator.encode(seq) for seq in range(20_000)]
+    assert len(set(ids)) == len(ids)
+    assert all(re.fullmatch(r"[0-9A-Z]{6}", order_id) for order_id in ids)
+
+
+def test_ids_depend_on_key_only():
+    assert OrderIdAllocator(KEY).encode(42) == OrderIdAllocator(KEY).encode(42)
+    assert OrderIdAllocator(KEY).encode(42) != OrderIdAllocator(bytes(16)).encode(42)
+
+
+def test_consecutive_numbers_do_not_give_neighbouring_ids():
+    allocator = OrderIdAllocator(KEY)
+    ids = [allocator.encode(seq) for seq in range(100)]
+    assert ids != sorted(ids)
+
+
+def test_whole_space_is_addressable():
+    allocator = OrderIdAllocator(KEY)
+    assert len(allocator.encode(ID_SPACE - 1)) == 6
+    with pytest.raises(ValueError):
+        allocator.encode(ID_SPACE)
+    with pytest.raises(ValueError):
+        allocator.encode(-1)
+
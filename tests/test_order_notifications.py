@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+from bot.lexicon.lexicon_ru import LEXICON, ORDER_STATUSES
+from bot.models.records import Order
+from bot.services.order_notifications import OrderNotificationDebouncer
+
+WINDOW = 0.05
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.sent: list[tuple[int, str, float]] = []
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def _run(scenario, window: float = WINDOW, max_delay: float | None = None) -> list[tuple[int, str, float]]:
+    async def main():
+        outbox = FakeOutbox()
+        await scenario(OrderNotificationDebouncer(outbox, window, max_delay))
+        return outbox.sent
+
+    return asyncio.run(main())
+
+
+def _status_text(order_id: str, status: str) -> str:
+    return LEXICON["notification_status_changed"].format(order_id=order_id, status=ORDER_STATUSES[status])
+
+
+def test_status_clicks_give_one_message_with_final_state():
+    async def scenario(debouncer):
+        debouncer.status_changed("AAAAA1", 10, "new", "in_progress", None)
+        debouncer.status_changed("AAAAA1", 10, "in_progress", "completed", None)
+        debouncer.status_changed("AAAAA1", 10, "completed", "cancelled", None)
+        await asyncio.sleep(WINDOW * 2)
+
+    assert [(chat_id, text) for chat_id, text, _ in _run(scenario)] == [(10, _status_text("AAAAA1", "cancelled"))]
+
+
+def test_status_and_name_changes_are_combined():
+    async def scenario(debouncer):
+        debouncer.status_changed("AAAAA1", 10, "new", "in_progress", None)
+        debouncer.name_changed("AAAAA1", 10, None, "Аудит <ООО>", "in_progress")
+        await asyncio.sleep(WINDOW * 2)
+
+    expected = LEXICON["notification_order_updated"].format(
+        order_id="AAAAA1", name="Аудит &lt;ООО&gt;", status=ORDER_STATUSES["in_progress"]
+    )
+    assert [text for _, text, _ in _run(scenario)] == [expected]
+
+
+def test_return_to_initial_state_sends_nothing():
+    async def scenario(debouncer):
+        debouncer.status_changed("AAAAA1", 10, "new", "in_progress", "Аудит")
+        debouncer.name_changed("AAAAA1", 10, "Аудит", "Другое", "in_progress")
+        debouncer.status_changed("AAAAA1", 10, "in_progress", "new", "Другое")
+        debouncer.name_changed("AAAAA1", 10, "Другое", "Аудит", "new")
+        await asyncio.sleep(WINDOW * 2)
+
+    assert _run(scenario) == []
+
+
+def test_max_delay_caps_steady_changes():
+    max_delay = WINDOW * 2
+    started = time.monotonic()
+
+    async def scenario(debouncer):
+        statuses = ["in_progress", "completed"]
+        # Изменения чаще окна: без ограничения отправка откладывалась бы, пока они идут
+        for index in range(12):
+            debouncer.status_changed("AAAAA1", 10, "new", statuses[index % 2], None)
+            await asyncio.sleep(WINDOW / 2)
+
+    sent = _run(scenario, max_delay=max_delay)
+    assert sent
+    assert sent[0][2] - started < max_delay + WINDOW
+
+
+def test_bulk_change_folds_pending_notices_per_client():
+    async def scenario(debouncer):
+        debouncer.name_changed("AAAAA1", 10, None, "Аудит", "new")
+        orders = [
+            (Order(order_id="AAAAA1", user_id=10, status="archived", name="Аудит", details={}), "new"),
+            (Order(order_id="AAAAA2", user_id=10, status="archived", name=None, details={}), "completed"),
+            (Order(order_id="AAAAA3", user_id=20, status="archived", name=None, details={}), "new"),
+            # Статус не изменился - строки нет
+            (Order(order_id="AAAAA4", user_id=20, status="archived", name=None, details={}), "archived"),
+        ]
+        debouncer.bulk_status_changed("archived", orders)
+        await asyncio.sleep(WINDOW * 2)
+
+    def line(order_id: str) -> str:
+        return LEXICON["notification_order_line"].format(order_id=order_id, status=ORDER_STATUSES["archived"])
+
+    sent = {chat_id: text for chat_id, text, _ in _run(scenario)}
+    assert len(sent) == 2
+    # Отложенное переименование ушло вместе с массовым изменением, отдельно не отправлено
+    assert sent[10] == "\n".join([
+        LEXICON["notification_orders_updated"],
+        line("AAAAA1") + LEXICON["notification_order_line_name"].format(name="Аудит"),
+        line("AAAAA2"),
+    ])
+    assert sent[20] == "\n".join([LEXICON["notification_orders_updated"], line("AAAAA3")])
+
+
+def test_stop_sends_pending_notices():
+    async def scenario(debouncer):
+        debouncer.status_changed("AAAAA1", 10, "new", "completed", None)
+        debouncer.status_changed("AAAAA2", 20, "new", "in_progress", None)
+        await debouncer.stop()
+
+    sent = _run(scenario, window=60)
+    assert sorted((chat_id, text) for chat_id, text, _ in sent) == [
+        (10, _status_text("AAAAA1", "completed")), (20, _status_text("AAAAA2", "in_progress"))
+    ]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from bot.models import data_store
+from bot.models.memory_repository import MemoryRepository
+from bot.models.records import Order
+from bot.models.search import OrderSearchIndex
+from bot.services import order_render
+from bot.services.order_render import get_cached_order_details, render_order_details
+
+
+@pytest.fixture(autouse=True)
+def rendered(monkeypatch):
+    monkeypatch.setattr(order_render, "_rendered", order_render.LRUCache(maxsize=10))
+
+
+def _order() -> Order:
+    return Order(order_id="AAAAA1", user_id=1, status="new", name="Аудит", details={"service_category": "Аудит"})
+
+
+def _change(monkeypatch, change) -> tuple:
+    async def scenario():
+        repository = MemoryRepository()
+        await repository.connect()
+        monkeypatch.setattr(data_store, "repository", repository)
+        monkeypatch.setattr(data_store, "search_index", OrderSearchIndex())
+        await repository.add_order(_order())
+        order = await data_store.get_order_by_id("AAAAA1")
+        version = order.version
+        render_order_details(order, None)
+        cached = get_cached_order_details(order)
+
+        await change()
+        return order, version, cached
+
+    return asyncio.run(scenario())
+
+
+def test_rename_bumps_version_and_evicts_the_card(monkeypatch):
+    order, version, cached = _change(monkeypatch, lambda: data_store.update_order_name("aaaaa1", "Проверка"))
+
+    assert "Аудит" in cached
+    assert order.version == version + 1
+    assert "AAAAA1" not in order_render._rendered
+    assert get_cached_order_details(order) is None
+    assert "Проверка" in render_order_details(order, None)
+
+
+def test_status_change_bumps_version_and_evicts_the_card(monkeypatch):
+    order, version, cached = _change(monkeypatch, lambda: data_store.update_orders_status(["AAAAA1"], "completed"))
+
+    assert cached is not None
+    assert order.version == version + 1
+    assert "AAAAA1" not in order_render._rendered
+    assert get_cached_order_details(order) is None
+
+
+def test_stale_version_is_not_served_without_eviction():
+    order = _order()
+    text = render_order_details(order, None)
+    # Заказ изменен другим процессом: data_store этого процесса кеш не сбрасывал
+    order.version += 1
+    assert get_cached_order_details(order) is None
+    order.version -= 1
+    assert get_cached_order_details(order) == text
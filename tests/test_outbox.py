@@ -0,0 +1,126 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramMigrateToChat,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.methods import SendMessage
+
+from bot.services.outbox import Outbox
+
+METHOD = SendMessage(chat_id=1, text="")
+
+
+def _outbox(send_message: AsyncMock, **kwargs) -> Outbox:
+    bot = MagicMock(send_message=send_message)
+    return Outbox(bot, global_rate=1000, private_rate=1000, retry_delay=0.01, **kwargs)
+
+
+async def _deliver(outbox: Outbox, *messages: tuple[int, str]) -> list:
+    outbox.start()
+    futures = [outbox.send_message(chat_id, text) for chat_id, text in messages]
+    try:
+        return await asyncio.wait_for(asyncio.gather(*futures, return_exceptions=True), timeout=2)
+    finally:
+        await outbox.stop(timeout=0)
+
+
+def test_network_errors_are_retried():
+    timeout = TelegramNetworkError(METHOD, "timeout")
+    send_message = AsyncMock(side_effect=[timeout, timeout, "sent"])
+    outbox = _outbox(send_message)
+
+    assert asyncio.run(_deliver(outbox, (1, "hello"))) == ["sent"]
+    assert send_message.await_count == 3
+    assert outbox.pending == 0
+    assert not outbox.dead_letters
+
+
+def test_retry_after_delays_the_chat_without_using_attempts():
+    send_message = AsyncMock(side_effect=[TelegramRetryAfter(METHOD, "flood", retry_after=0), "sent"])
+    outbox = _outbox(send_message, max_retries=0)
+
+    assert asyncio.run(_deliver(outbox, (1, "hello"))) == ["sent"]
+
+
+def test_exhausted_retries_go_to_dead_letters():
+    error = TelegramNetworkError(METHOD, "down")
+    send_message = AsyncMock(side_effect=error)
+    outbox = _outbox(send_message, max_retries=2)
+
+    assert asyncio.run(_deliver(outbox, (1, "hello"))) == [error]
+    assert send_message.await_count == 3
+    assert [message.text for message in outbox.dead_letters] == ["hello"]
+    assert outbox.pending == 0
+
+
+@pytest.mark.parametrize("dead_letter", [True, False])
+def test_permanent_errors_are_not_retried(dead_letter):
+    error = TelegramForbiddenError(METHOD, "bot was blocked by the user")
+    send_message = AsyncMock(side_effect=[error, "sent"])
+    outbox = _outbox(send_message)
+
+    async def scenario():
+        outbox.start()
+        failed = outbox.send_message(1, "blocked", dead_letter=dead_letter)
+        delivered = outbox.send_message(1, "next")
+        try:
+            return await asyncio.wait_for(asyncio.gather(failed, delivered, return_exceptions=True), timeout=2)
+        finally:
+            await outbox.stop(timeout=0)
+
+    # Следующее сообщение того же чата не застревает за недоставленным
+    assert asyncio.run(scenario()) == [error, "sent"]
+    assert len(outbox.dead_letters) == int(dead_letter)
+
+
+def test_messages_of_one_chat_keep_order():
+    sent = []
+
+    async def send_message(chat_id, text, **kwargs):
+        if text == "first" and "failed" not in sent:
+            sent.append("failed")
+            raise TelegramNetworkError(METHOD, "timeout")
+        sent.append(text)
+        return text
+
+    outbox = _outbox(AsyncMock(side_effect=send_message))
+    asyncio.run(_deliver(outbox, (1, "first"), (1, "second"), (2, "other")))
+    assert [text for text in sent if text != "other"] == ["failed", "first", "second"]
+
+
+def test_group_migrated_to_supergroup_is_resent_to_the_new_chat():
+    sent = []
+
+    async def send_message(chat_id, text, **kwargs):
+        if chat_id == -1:
+            raise TelegramMigrateToChat(METHOD, "group upgraded", migrate_to_chat_id=-100)
+        sent.append((chat_id, text))
+        return text
+
+    outbox = _outbox(AsyncMock(side_effect=send_message), group_rate=1000)
+
+    async def scenario():
+        result = await _deliver(outbox, (-1, "first"), (-1, "second"))
+        # Следующие сообщения для старого ID сразу уходят в новый чат
+        result += await _deliver(outbox, (-1, "third"))
+        return result
+
+    assert asyncio.run(scenario()) == ["first", "second", "third"]
+    assert sent == [(-100, "first"), (-100, "second"), (-100, "third")]
+    assert not outbox.dead_letters
+
+
+def test_migration_is_followed_only_once():
+    error = TelegramMigrateToChat(METHOD, "group upgraded", migrate_to_chat_id=-100)
+    send_message = AsyncMock(side_effect=error)
+    outbox = _outbox(send_message, group_rate=1000)
+
+    assert asyncio.run(_deliver(outbox, (-1, "hello"))) == [error]
+    assert send_message.await_count == 2
+    assert [message.chat_id for message in outbox.dead_letters] == [-100]
+    assert outbox.pending == 0
@@ -0,0 +1,216 @@
+import asyncio
+import os
+
+import pytest
+
+from bot.models import data_store
+from bot.models.journal_repository import JournaledMemoryRepository
+from bot.models.memory_repository import MemoryRepository
+from bot.models.records import Order, User
+from bot.models.sqlite_repository import SQLiteRepository
+
+# Одни и те же сценарии на всех хранилищах: результаты должны совпадать.
+
+BACKENDS = ["memory", "journal", "sqlite"]
+
+
+def _make_repository(backend: str, tmp_path):
+    if backend == "sqlite":
+        return SQLiteRepository(os.path.join(tmp_path, "bot.sqlite3"), pool_size=2)
+    if backend == "journal":
+        return JournaledMemoryRepository(os.path.join(tmp_path, "journal"), flush_interval=0)
+    return MemoryRepository()
+
+
+def _run(backend: str, tmp_path, scenario):
+    async def main():
+        repository = _make_repository(backend, tmp_path)
+        await repository.connect()
+        try:
+            return await scenario(repository)
+        finally:
+            await repository.close()
+
+    return asyncio.run(main())
+
+
+def _order(order_id: str, user_id: int, status: str = "new", name: str | None = None) -> Order:
+    return Order(order_id=order_id, user_id=user_id, status=status, name=name, details={"service_category": "Аудит"})
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    return request.param
+
+
+def test_users(backend, tmp_path):
+    async def scenario(repository):
+        await repository.add_user(User(user_id=1, username="Alice", role="client", referrer_id=None))
+        await repository.add_user(User(user_id=2, username=None, role="client", referrer_id=1))
+        await repository.set_username(2, "bob")
+        await repository.set_role(1, "admin")
+        return (
+            await repository.get_user(1),
+            await repository.get_user(2),
+            await repository.get_user(3),
+            sorted(user.user_id for user in await repository.get_users_by_ids([1, 2, 3])),
+            await repository.count_users(),
+            await repository.count_users(role="admin"),
+            [user.user_id for user in await repository.get_users(None, "bo", None, False, 10)],
+            await repository.get_user_ids(after=1, limit=10),
+        )
+
+    user, referral, missing, found, total, admins, by_prefix, ids_after = _run(backend, tmp_path, scenario)
+    assert (user.username, user.role) == ("Alice", "admin")
+    assert (referral.username, referral.referrer_id) == ("bob", 1)
+    assert missing is None
+    assert found == [1, 2]
+    assert (total, admins) == (2, 1)
+    assert by_prefix == [2]
+    assert ids_after == [2]
+
+
+def test_orders(backend, tmp_path):
+    async def scenario(repository):
+        await repository.add_user(User(user_id=1, username=None, role="client", referrer_id=None))
+        for order_id in ("AAAAA1", "AAAAA2", "AAAAA3"):
+            await repository.add_order(_order(order_id, 1))
+        assert await repository.set_order_status("AAAAA1", "completed")
+        assert not await repository.set_order_status("ZZZZZZ", "completed")
+        assert await repository.set_order_name("AAAAA2", "Проверка")
+        updated = await repository.set_orders_status(["AAAAA2", "AAAAA3", "ZZZZZZ"], "archived")
+        batches = [batch async for batch in repository.iter_orders(batch_size=2)]
+        return (
+            await repository.get_order("AAAAA2"),
+            sorted(updated),
+            await repository.count_user_orders(1),
+            await repository.count_orders(None),
+            await repository.count_orders("archived"),
+            await repository.count_orders("new"),
+            [[order.order_id for order in batch] for batch in batches],
+        )
+
+    order, updated, user_orders, total, archived, new, batches = _run(backend, tmp_path, scenario)
+    assert (order.name, order.status, order.version) == ("Проверка", "archived", 2)
+    assert order.details == {"service_category": "Аудит"}
+    assert updated == ["AAAAA2", "AAAAA3"]
+    assert (user_orders, total, archived, new) == (3, 3, 2, 0)
+    assert batches == [["AAAAA1", "AAAAA2"], ["AAAAA3"]]
+
+
+def test_meta_and_sequences(backend, tmp_path):
+    async def scenario(repository):
+        first = await repository.init_meta("key", "one")
+        second = await repository.init_meta("key", "two")
+        return first, second, [await repository.next_sequence("order_id") for _ in range(3)]
+
+    assert _run(backend, tmp_path, scenario) == ("one", "one", [1, 2, 3])
+
+
+def test_data_survives_restart(backend, tmp_path):
+    if backend == "memory":
+        pytest.skip("хранилище в памяти не сохраняет данные")
+
+    async def write(repository):
+        await repository.add_user(User(user_id=1, username="alice", role="client", referrer_id=None))
+        await repository.add_order(_order("AAAAA1", 1))
+        await repository.set_order_status("AAAAA1", "in_progress")
+
+    async def read(repository):
+        return await repository.get_user(1), await repository.get_order("AAAAA1"), await repository.count_orders(None)
+
+    _run(backend, tmp_path, write)
+    user, order, total = _run(backend, tmp_path, read)
+    assert user.username == "alice"
+    assert (order.status, total) == ("in_progress", 1)
+
+
+def test_order_pages_by_cursor(backend, tmp_path):
+    order_ids = [f"AAAA{index:02d}" for index in range(7)]
+
+    async def scenario(repository):
+        for order_id in order_ids:
+            await repository.add_order(_order(order_id, 1))
+        first = await repository.get_user_orders(1, None, False, 3)
+        second = await repository.get_user_orders(1, first[-1].order_id, False, 3)
+        back = await repository.get_user_orders(1, second[0].order_id, True, 3)
+        newest = await repository.get_orders(None, None, False, 3)
+        older = await repository.get_orders(None, newest[-1].order_id, False, 3)
+        return [[order.order_id for order in page] for page in (first, second, back, newest, older)]
+
+    first, second, back, newest, older = _run(backend, tmp_path, scenario)
+    assert first == order_ids[:3]
+    assert second == order_ids[3:6]
+    assert back == first
+    # Общий список - по убыванию ID
+    assert newest == order_ids[:-4:-1]
+    assert older == order_ids[3:0:-1]
+
+
+def test_referral_pages_by_cursor(backend, tmp_path):
+    async def scenario(repository):
+        await repository.add_user(User(user_id=1000, username=None, role="client", referrer_id=None))
+        # ID не по возрастанию: рефералы идут в порядке регистрации
+        for user_id in (50, 10, 40, 20, 30):
+            await repository.add_user(User(user_id=user_id, username=None, role="client", referrer_id=1000))
+        first = await repository.get_referrals(1000, None, False, 2)
+        second = await repository.get_referrals(1000, first[-1].user_id, False, 2)
+        last = await repository.get_referrals(1000, second[-1].user_id, False, 2)
+        back = await repository.get_referrals(1000, second[0].user_id, True, 2)
+        pages = [[user.user_id for user in page] for page in (first, second, last, back)]
+        return pages, await repository.count_referrals(1000), await repository.count_referrals(50)
+
+    pages, count, empty = _run(backend, tmp_path, scenario)
+    assert pages == [[50, 10], [40, 20], [30], [50, 10]]
+    assert (count, empty) == (5, 0)
+
+
+def test_counts_follow_writes(backend, tmp_path):
+    async def scenario(repository):
+        counts = [await repository.count_orders("new"), await repository.count_user_orders(1)]
+        await repository.add_order(_order("AAAAA1", 1))
+        counts += [await repository.count_orders("new"), await repository.count_user_orders(1)]
+        await repository.set_order_status("AAAAA1", "completed")
+        counts += [await repository.count_orders("new"), await repository.count_orders("completed")]
+        return counts
+
+    assert _run(backend, tmp_path, scenario) == [0, 0, 1, 1, 0, 1]
+
+
+def test_bulk_status_change(backend, tmp_path, monkeypatch):
+    async def scenario(repository):
+        monkeypatch.setattr(data_store, "repository", repository)
+        await repository.add_order(_order("AAAAA1", 1))
+        await repository.add_order(_order("AAAAA2", 1, status="in_progress"))
+        await repository.add_order(_order("AAAAA3", 1, status="archived"))
+        await repository.add_order(_order("AAAAA4", 1))
+
+        async def listed(status):
+            return [order.order_id for order in await repository.get_orders(status, None, False, 10)]
+
+        async def counts():
+            return [await repository.count_orders(status) for status in ("new", "in_progress", "archived", None)]
+
+        before = await counts()
+        # Повторы, регистр и несуществующий ID; AAAAA3 уже в архиве
+        archived = await data_store.update_orders_status(["aaaaa1", "AAAAA2", "AAAAA3", "AAAAA1", "ZZZZZZ"], "archived")
+        after_archive = (await counts(), await listed("archived"), await listed("new"))
+        # Из архива заказ возвращается как из любого другого статуса
+        restored = await data_store.update_orders_status(["AAAAA3"], "new")
+        after_restore = (await counts(), await listed("archived"), await listed("new"))
+        return (
+            before,
+            [(order.order_id, old_status) for order, old_status in archived],
+            after_archive,
+            [(order.order_id, old_status) for order, old_status in restored],
+            after_restore,
+            (await repository.get_order("AAAAA1")).version,
+        )
+
+    before, archived, after_archive, restored, after_restore, version = _run(backend, tmp_path, scenario)
+    assert before == [2, 1, 1, 4]
+    assert archived == [("AAAAA1", "new"), ("AAAAA2", "in_progress")]
+    assert after_archive == ([1, 0, 3, 4], ["AAAAA3", "AAAAA2", "AAAAA1"], ["AAAAA4"])
+    assert restored == [("AAAAA3", "archived")]
+    assert after_restore == ([2, 0, 2, 4], ["AAAAA2", "AAAAA1"], ["AAAAA4", "AAAAA3"])
+    assert version == 1
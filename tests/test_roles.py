@@ -0,0 +1,93 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from cachetools import TTLCache
+
+from bot.filters.roles import IsAdmin, IsMainAdmin
+from bot.middlewares.user_context import UserContextMiddleware
+from bot.models import data_store
+from bot.models.memory_repository import MemoryRepository
+from bot.models.records import User
+
+
+class CountingRepository(MemoryRepository):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def get_user(self, user_id):
+        self.reads += 1
+        return await super().get_user(user_id)
+
+
+@pytest.fixture
+def repository(monkeypatch):
+    repository = CountingRepository()
+    monkeypatch.setattr(data_store, "repository", repository)
+    monkeypatch.setattr(data_store, "_user_cache", TTLCache(maxsize=10, ttl=60))
+
+    async def fill():
+        await repository.connect()
+        await repository.add_user(User(user_id=1, username=None, role="main_admin", referrer_id=None))
+        await repository.add_user(User(user_id=5, username=None, role="client", referrer_id=None))
+
+    asyncio.run(fill())
+    return repository
+
+
+def _event(user_id: int) -> MagicMock:
+    return MagicMock(from_user=MagicMock(id=user_id))
+
+
+def test_grant_admin_role_invalidates_cached_role(repository):
+    async def scenario():
+        roles = [await data_store.get_user_role(5), await data_store.get_user_role(5)]
+        granted = [await data_store.grant_admin_role(5), await data_store.grant_admin_role(1)]
+        roles += [await data_store.get_user_role(5), await data_store.get_user_role(1)]
+        return roles, granted
+
+    roles, granted = asyncio.run(scenario())
+    assert roles == ["client", "client", "admin", "main_admin"]
+    # Главного администратора понизить нельзя
+    assert granted == [True, False]
+
+
+def test_filters_use_db_user_without_storage_reads(repository):
+    admin = User(user_id=5, username=None, role="admin", referrer_id=None)
+    main_admin = User(user_id=1, username=None, role="main_admin", referrer_id=None)
+
+    async def scenario():
+        return [
+            await IsAdmin()(_event(5), db_user=admin),
+            await IsMainAdmin()(_event(5), db_user=admin),
+            await IsAdmin()(_event(1), db_user=main_admin),
+            await IsMainAdmin()(_event(1), db_user=main_admin),
+            # Незарегистрированный пользователь - клиент
+            await IsAdmin()(_event(7), db_user=None),
+        ]
+
+    assert asyncio.run(scenario()) == [True, False, True, True, False]
+    assert repository.reads == 0
+
+
+def test_filters_fall_back_to_the_role_cache(repository):
+    async def scenario():
+        return [await IsAdmin()(_event(5)), await IsMainAdmin()(_event(5)), await IsMainAdmin()(_event(1))]
+
+    assert asyncio.run(scenario()) == [False, False, True]
+    assert repository.reads == 2
+
+
+def test_user_is_loaded_once_per_update(repository):
+    async def handler(event, data):
+        db_user = data["db_user"]
+        return [await IsAdmin()(event, db_user=db_user), await IsMainAdmin()(event, db_user=db_user), db_user.user_id]
+
+    async def scenario():
+        event = _event(1)
+        data = {"event_from_user": event.from_user}
+        return await UserContextMiddleware()(handler, event, data)
+
+    assert asyncio.run(scenario()) == [True, True, 1]
+    assert repository.reads == 1
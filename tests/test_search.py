@@ -0,0 +1,106 @@
+import asyncio
+
+from bot.models import data_store
+from bot.models.memory_repository import MemoryRepository
+from bot.models.records import Order
+from bot.models.search import OrderSearchIndex, tokenize
+from bot.models.sqlite_repository import SQLiteRepository
+
+
+def _order(order_id: str, name: str | None = None, objective: str | None = None) -> Order:
+    details = {"questions_key": "sub_basic_dossier", "service_category": "Проверка"}
+    if objective:
+        details["objective"] = objective
+    return Order(order_id=order_id, user_id=1, status="new", name=name, details=details)
+
+
+def test_stems_match_word_forms():
+    assert tokenize("Логистика") == tokenize("логистической") == tokenize("логистику")
+    assert tokenize("Ёлка и ель") == ["елка", "ель"]
+
+
+def test_name_match_outranks_answer_match():
+    index = OrderSearchIndex()
+    index.add(_order("AAAAA1", objective="нужна проверка логистической компании"))
+    index.add(_order("AAAAA2", name="Логистика"))
+    index.add(_order("AAAAA3", name="Другое"))
+    assert index.search("логистика") == ["AAAAA2", "AAAAA1"]
+    assert index.search("несуществующее") == []
+    assert index.search("") == []
+
+
+def test_reindex_on_rename_and_remove():
+    index = OrderSearchIndex()
+    index.add(_order("AAAAA1", name="Логистика"))
+    index.add(_order("AAAAA1", name="Аудит"))
+    assert index.search("логистика") == []
+    assert index.search("аудит") == ["AAAAA1"]
+    assert len(index) == 1
+
+    index.remove("AAAAA1")
+    assert index.search("аудит") == []
+    assert (index.postings, index.total_length) == ({}, 0)
+
+
+class ChangingRepository(MemoryRepository):
+    """Хранилище, в которое пишет "другой процесс": изменения видны по номерам."""
+
+    def __init__(self):
+        super().__init__()
+        self.changes: list[tuple[int, Order]] = []
+
+    async def get_change_mark(self) -> int:
+        return len(self.changes)
+
+    async def get_changed_orders(self, after: int, limit: int) -> list[tuple[int, Order]]:
+        return self.changes[after:after + limit]
+
+
+def test_search_refresh_picks_up_orders_of_other_processes(monkeypatch):
+    async def scenario():
+        repository = ChangingRepository()
+        monkeypatch.setattr(data_store, "repository", repository)
+        monkeypatch.setattr(data_store, "search_index", OrderSearchIndex())
+        monkeypatch.setattr(data_store, "_search_mark", 0)
+        monkeypatch.setattr(data_store, "SEARCH_REFRESH_BATCH", 2)
+
+        for number, order in enumerate([_order("AAAAA1", name="Аудит"), _order("AAAAA2", name="Аудит склада")], 1):
+            await repository.add_order(order)
+            repository.changes.append((number, order))
+        renamed = _order("AAAAA1", name="Логистика")
+        await repository.add_order(renamed)
+        repository.changes.append((3, renamed))
+
+        audit = await data_store.search_orders("аудит")
+        logistics = await data_store.search_orders("логистика")
+        return audit, logistics, data_store._search_mark
+
+    (audit, _, audit_total), (logistics, _, _), mark = asyncio.run(scenario())
+    assert [order.order_id for order in audit] == ["AAAAA2"] and audit_total == 1
+    assert [order.order_id for order in logistics] == ["AAAAA1"]
+    # Изменения прочитаны в несколько пачек, номер последнего запомнен
+    assert mark == 3
+
+
+def test_sqlite_reports_changes_of_other_connections(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "bot.sqlite3")
+        reader, writer = SQLiteRepository(path, pool_size=1), SQLiteRepository(path, pool_size=1)
+        await reader.connect()
+        await writer.connect()
+        try:
+            mark = await reader.get_change_mark()
+            await writer.add_order(_order("AAAAA1", name="Аудит"))
+            await writer.add_order(_order("AAAAA2"))
+            # Смена статуса не меняет индексируемые поля
+            await writer.set_order_status("AAAAA2", "completed")
+            await writer.set_order_name("AAAAA1", "Логистика")
+            changes = await reader.get_changed_orders(mark, 10)
+            return mark, [(number, order.order_id, order.name) for number, order in changes]
+        finally:
+            await reader.close()
+            await writer.close()
+
+    mark, changes = asyncio.run(scenario())
+    assert mark == 0
+    assert changes == [(2, "AAAAA2", None), (3, "AAAAA1", "Логистика")]
@@ -0,0 +1,109 @@
+import asyncio
+import os
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from bot import config as config_module
+from bot.models.fsm_storage import SQLiteStorage
+from bot.services.throttle_store import MemoryThrottleStore, SQLiteThrottleStore
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+def _path(tmp_path) -> str:
+    return os.path.join(tmp_path, "state.sqlite3")
+
+
+def test_fsm_state_is_shared_between_connections(tmp_path):
+    async def scenario():
+        first, second = SQLiteStorage(_path(tmp_path)), SQLiteStorage(_path(tmp_path))
+        await first.connect()
+        await second.connect()
+        try:
+            await first.set_state(KEY, "Application:answering")
+            await first.set_data(KEY, {"question_index": 1})
+            # Второй процесс видит состояние и дополняет данные, не теряя чужие
+            await asyncio.gather(
+                second.update_data(KEY, {"a": "ответ"}),
+                first.update_data(KEY, {"b": 2}),
+            )
+            shared = await second.get_state(KEY), await second.get_data(KEY)
+            await second.set_state(KEY, None)
+            await second.set_data(KEY, {})
+            cleared = await first.get_state(KEY), await first.get_data(KEY)
+            async with first._conn.execute("SELECT COUNT(*) FROM fsm") as cursor:
+                rows = (await cursor.fetchone())[0]
+            return shared, cleared, rows
+        finally:
+            await first.close()
+            await second.close()
+
+    shared, cleared, rows = asyncio.run(scenario())
+    assert shared == ("Application:answering", {"question_index": 1, "a": "ответ", "b": 2})
+    assert cleared == (None, {})
+    # После state.clear() пустая запись удаляется
+    assert rows == 0
+
+
+@pytest.mark.parametrize("store_type", ["memory", "sqlite"])
+def test_throttle_bucket(store_type, tmp_path):
+    async def scenario():
+        store = SQLiteThrottleStore(_path(tmp_path)) if store_type == "sqlite" else MemoryThrottleStore()
+        await store.connect()
+        try:
+            # burst 2 токена, пополнение практически нулевое
+            allowed = [await store.consume(1, 1, 0.001, 2) for _ in range(3)]
+            other_user = await store.consume(2, 1, 0.001, 2)
+            cheap = await store.consume(3, 0.5, 0.001, 1)
+            return allowed, other_user, cheap
+        finally:
+            await store.close()
+
+    allowed, other_user, cheap = asyncio.run(scenario())
+    assert allowed == [True, True, False]
+    assert other_user is True
+    assert cheap is True
+
+
+def test_sqlite_bucket_is_shared_and_refills(tmp_path):
+    async def scenario():
+        first, second = SQLiteThrottleStore(_path(tmp_path)), SQLiteThrottleStore(_path(tmp_path))
+        await first.connect()
+        await second.connect()
+        try:
+            spent = [await first.consume(1, 1, 20, 2), await second.consume(1, 1, 20, 2)]
+            exhausted = await first.consume(1, 1, 20, 2)
+            await asyncio.sleep(0.1)  # 20 токенов в секунду - бакет снова полон
+            refilled = await second.consume(1, 1, 20, 2)
+            await asyncio.sleep(0.1)
+            await first.sweep(20, 2)
+            async with first._conn.execute("SELECT COUNT(*) FROM throttle") as cursor:
+                rows = (await cursor.fetchone())[0]
+            return spent, exhausted, refilled, rows
+        finally:
+            await first.close()
+            await second.close()
+
+    spent, exhausted, refilled, rows = asyncio.run(scenario())
+    assert spent == [True, True]
+    assert exhausted is False
+    assert refilled is True
+    assert rows == 0
+
+
+def test_multi_process_mode_requires_shared_state(monkeypatch):
+    monkeypatch.setenv("WEBAPP_REUSE_PORT", "1")
+    monkeypatch.setenv("RUN_MODE", "webhook")
+    monkeypatch.setenv("WEBHOOK_URL", "https://bot.example.com")
+    monkeypatch.setenv("WEBHOOK_SECRET", "secret")
+    with pytest.raises(ValueError, match="STATE_STORAGE=sqlite"):
+        config_module.load_config()
+
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("STATE_STORAGE", "sqlite")
+    monkeypatch.setenv("UPDATE_CONCURRENCY", "0")
+    monkeypatch.setenv("ORDER_NOTIFY_DELAY", "0")
+    monkeypatch.setenv("GROUP_DIGEST_WINDOW", "0")
+    loaded = config_module.load_config()
+    assert loaded.WEBAPP_REUSE_PORT and loaded.UPDATE_CONCURRENCY == 0
@@ -0,0 +1,41 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.types import CallbackQuery, Message
+
+from bot.lexicon.lexicon_ru import LEXICON
+from bot.middlewares.throttling import ThrottlingMiddleware
+
+USER = MagicMock(id=5)
+
+
+def _event(event_type: type) -> MagicMock:
+    event = MagicMock(spec=event_type)
+    event.answer = AsyncMock()
+    return event
+
+
+def _call(middleware: ThrottlingMiddleware, event, **data):
+    handler = AsyncMock(return_value="handled")
+    return asyncio.run(middleware(handler, event, {"event_from_user": USER, **data}))
+
+
+@pytest.mark.parametrize("notify", [True, False])
+def test_throttled_callbacks_are_always_answered(notify):
+    middleware = ThrottlingMiddleware(rate=0.001, burst=1, notify=notify)
+    callback = _event(CallbackQuery)
+    results = [_call(middleware, callback) for _ in range(3)]
+
+    assert results == ["handled", None, None]
+    answers = [call.args[0] if call.args else None for call in callback.answer.await_args_list]
+    # Предупреждение один раз, дальше - пустой ответ, чтобы кнопка не "висела"
+    assert answers == ([LEXICON["throttling_warning"], None] if notify else [None, None])
+
+
+def test_messages_in_fsm_state_are_not_dropped():
+    middleware = ThrottlingMiddleware(rate=0.001, burst=1)
+    message = _event(Message)
+    assert _call(middleware, message) == "handled"
+    assert _call(middleware, message) is None
+    assert _call(middleware, message, raw_state="ApplicationStates:answering_questions") == "handled"
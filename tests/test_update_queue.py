@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from bot.services.admission import AdmissionController, Priority
+from bot.services.update_queue import ChatOrderedUpdateProcessor
+
+THRESHOLD = 0.05
+
+
+def _message_update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(id=chat_id, type="private")
+    user = User(id=chat_id, is_bot=False, first_name="Test")
+    return Update(
+        update_id=update_id,
+        message=Message(message_id=update_id, date=datetime.now(), chat=chat, from_user=user, text="hi"),
+    )
+
+
+def _callback_update(update_id: int, chat_id: int) -> Update:
+    user = User(id=chat_id, is_bot=False, first_name="Test")
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(id=str(update_id), from_user=user, chat_instance="test", data="menu"),
+    )
+
+
+def _data(update: Update, bot: MagicMock) -> dict:
+    user = (update.message or update.callback_query).from_user
+    return {"event_chat": Chat(id=user.id, type="private"), "event_from_user": user, "bot": bot}
+
+
+def _processor(concurrency: int = 1) -> ChatOrderedUpdateProcessor:
+    return ChatOrderedUpdateProcessor(
+        MagicMock(), concurrency=concurrency, admission=AdmissionController(delay_threshold=THRESHOLD)
+    )
+
+
+def test_queue_delay_returns_to_zero_after_drain():
+    async def scenario():
+        processor = _processor()
+        processor.start()
+        bot = MagicMock(answer_callback_query=AsyncMock())
+        handled = []
+
+        async def handler(event, data):
+            await asyncio.sleep(THRESHOLD)
+            handled.append(event.update_id)
+
+        # Перегрузка: один воркер, несколько медленных апдейтов в разных чатах
+        for update_id in range(1, 5):
+            update = _message_update(update_id, chat_id=100 + update_id)
+            await processor(handler, update, _data(update, bot))
+        await asyncio.sleep(THRESHOLD * 1.5)
+        assert processor.queue_delay >= THRESHOLD
+
+        shed = _callback_update(10, chat_id=200)
+        await processor(handler, shed, _data(shed, bot))
+
+        # Очередь разобрана, бот простаивает - отбрасывать больше нечего
+        while processor.pending:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(THRESHOLD)
+        assert processor.queue_delay == 0
+
+        accepted = _callback_update(11, chat_id=200)
+        await processor(handler, accepted, _data(accepted, bot))
+        await processor.stop(timeout=1)
+        return handled, bot
+
+    handled, bot = asyncio.run(scenario())
+    assert 10 not in handled
+    assert 11 in handled
+    # Отброшенное нажатие кнопки получило пустой ответ
+    bot.answer_callback_query.assert_awaited_once_with("10")
+
+
+def test_collapsed_callbacks_are_answered():
+    async def scenario():
+        processor = _processor()
+        bot = MagicMock(answer_callback_query=AsyncMock())
+        handled = []
+
+        async def handler(event, data):
+            handled.append(event.update_id)
+
+        # Два нажатия одного чата ждут в очереди дольше порога
+        for update_id in (1, 2):
+            update = _callback_update(update_id, chat_id=300)
+            await processor(handler, update, _data(update, bot))
+        await asyncio.sleep(THRESHOLD * 1.5)
+        processor.start()
+        await processor.stop(timeout=1)
+        await asyncio.sleep(0)
+        return handled, bot
+
+    handled, bot = asyncio.run(scenario())
+    assert handled == [2]
+    bot.answer_callback_query.assert_awaited_once_with("1")
+
+
+def test_admission_levels():
+    admission = AdmissionController(delay_threshold=1)
+    assert not admission.should_shed(Priority.navigation, 0.5)
+    assert admission.should_shed(Priority.navigation, 1)
+    assert not admission.should_shed(Priority.new_session, 1.5)
+    assert admission.should_shed(Priority.new_session, 2)
+    assert not admission.should_shed(Priority.fsm, 100)
+    assert not admission.should_shed(Priority.admin, 100)
+    assert admission.should_collapse(Priority.navigation, 1)
+    assert not admission.should_collapse(Priority.new_session, 5)
+    # Порог 0 - только порядок по приоритету, без отбрасывания
+    assert not AdmissionController(delay_threshold=0).should_shed(Priority.navigation, 100)